@@ -3,7 +3,13 @@ from langchain_community.llms import Ollama
 from langchain.tools import Tool
 from langchain import hub
 
-def build_agent(qa_chain):
+from memory.llm_cache import get_llm_cache
+from memory.multi_source import build_multi_source_tool
+from memory.structured import build_structured_tools
+from memory.warmup import OLLAMA_KEEP_ALIVE
+from telemetry import MetricsCallbackHandler
+
+def build_agent(qa_chain, structured_index=None):
     tools = [
         Tool(
             name="Ask_Personal_Assistant",
@@ -11,8 +17,19 @@ def build_agent(qa_chain):
             description="Answer questions about your memory using documents, emails, and calendar data."
         )
     ]
+    if structured_index is not None:
+        # Exact lookups come first so the agent tries them before fuzzy retrieval
+        tools = build_structured_tools(structured_index) + [
+            build_multi_source_tool(structured_index, getattr(qa_chain, "retriever", None))
+        ] + tools
     
-    llm = Ollama(model="llama3.2", temperature=0)
+    llm = Ollama(
+        model="llama3.2",
+        temperature=0,
+        callbacks=[MetricsCallbackHandler("llama3.2")],
+        cache=get_llm_cache("llama3.2"),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
     prompt = hub.pull("hwchase17/react")
     agent = create_react_agent(llm, tools, prompt)
     agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
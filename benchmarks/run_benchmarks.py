@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Retrieval and end-to-end benchmark suite for the Personal Memory AI project.
+
+Runs fully offline against a synthetic corpus, using deterministic stubs in
+place of the embedding model and Ollama by default.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000 --compare bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000 --embeddings huggingface
+    python benchmarks/run_benchmarks.py --sizes 1000 --embeddings onnx
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HashingEmbeddings, StubLLM
+from benchmarks.synthetic import generate_corpus, generate_queries
+from memory.context import count_tokens
+from memory.embeddings import load_backend
+from memory.rag_chain import build_qa_chain, build_retriever
+from memory.time_index import parse_time_range
+from memory.vectorstore import create_faiss_store, document_ids, to_document
+
+# Metrics where a larger value is an improvement; everything else is a cost
+HIGHER_IS_BETTER = {"ingest_docs_per_s", "embed_docs_per_s", "recall_at_k"}
+
+
+def _rss_mb():
+    """Current resident set size in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _percentiles(samples_s, prefix):
+    values = np.asarray(samples_s) * 1000.0
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(values, 50)),
+        f"{prefix}_p95_ms": float(np.percentile(values, 95)),
+        f"{prefix}_p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def _get_embeddings(name):
+    if name == "hashing":
+        return HashingEmbeddings()
+    return load_backend(name)
+
+
+def exact_hits(matrix, query_vector, found_rows, k, candidates=None):
+    """Count found rows that belong to the exact squared-L2 top-k.
+
+    Rows tied with the k-th exact distance count as hits, since the
+    synthetic corpus contains duplicate texts that any index may order
+    arbitrarily. candidates, a boolean row mask, restricts the exact search
+    to the rows a question's constraints allow.
+    """
+    distances = ((matrix - query_vector) ** 2).sum(axis=1)
+    if candidates is not None and candidates.any():
+        distances = np.where(candidates, distances, np.inf)
+        k = min(k, int(candidates.sum()))
+    kth = np.partition(distances, min(k, len(distances)) - 1)[min(k, len(distances)) - 1]
+    return sum(1 for row in found_rows if distances[row] <= kth + 1e-5)
+
+
+def run_size(size, queries, embeddings, k=4, end_to_end=True, seed=0, docstore_path=None):
+    """Benchmark one corpus size and return a flat dict of metrics"""
+    results = {"size": size}
+    # Never touch the application's own docstore under MEMORY_DATA_DIR
+    docstore_path = docstore_path or os.path.join(tempfile.mkdtemp(prefix="memory-bench-"), "docstore.sqlite")
+
+    start = time.perf_counter()
+    records = generate_corpus(size, seed=seed)
+    documents = [to_document(record) for record in records]
+    results["ingest_docs_per_s"] = size / max(time.perf_counter() - start, 1e-9)
+
+    texts = [doc.page_content for doc in documents]
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    results["embed_docs_per_s"] = size / max(time.perf_counter() - start, 1e-9)
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    vectorstore = create_faiss_store(embeddings, len(vectors[0]), docstore_path)
+    vectorstore.add_embeddings(
+        list(zip(texts, vectors)), metadatas=[doc.metadata for doc in documents], ids=document_ids(documents)
+    )
+    results["index_build_s"] = time.perf_counter() - start
+    results["index_rss_mb"] = max(_rss_mb() - rss_before, 0.0)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    row_of_id = {doc.metadata["id"]: row for row, doc in enumerate(documents)}
+    timestamps = np.asarray([doc.metadata.get("timestamp") or np.nan for doc in documents], dtype=np.float64)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        vectorstore.similarity_search(query, k=k)
+        latencies.append(time.perf_counter() - start)
+    results.update(_percentiles(latencies, "search"))
+
+    # Recall of the app's own retrieval path (time slices, per-source
+    # partitions) against exact search over the rows the question allows
+    retriever = build_retriever(vectorstore, k)
+    hits = expected = 0
+    for query in queries:
+        found = retriever.invoke(query)[:k]
+        time_range = parse_time_range(query)
+        candidates = None
+        if time_range is not None:
+            candidates = (timestamps >= time_range[0]) & (timestamps < time_range[1])
+        query_vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        hits += exact_hits(matrix, query_vector, [row_of_id[doc.metadata["id"]] for doc in found], k, candidates)
+        # A question whose range holds fewer than k rows can only find that many
+        expected += min(k, int(candidates.sum())) if candidates is not None and candidates.any() else k
+    results["recall_at_k"] = hits / float(max(expected, 1))
+
+    if end_to_end:
+        qa = build_qa_chain(vectorstore, llm=StubLLM(), rerank=False)
+        retrieval_latencies = []
+        context_tokens = []
+        answer_latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            context = qa.retriever.invoke(query)
+            retrieval_latencies.append(time.perf_counter() - start)
+            context_tokens.append(sum(count_tokens(doc.page_content) for doc in context))
+            start = time.perf_counter()
+            qa.invoke({"query": query})
+            answer_latencies.append(time.perf_counter() - start)
+        results.update(_percentiles(retrieval_latencies, "retriever"))
+        results.update(_percentiles(answer_latencies, "answer"))
+        results["context_tokens_mean"] = float(np.mean(context_tokens))
+
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """List metrics that regressed by more than tolerance against the baseline"""
+    regressions = []
+    baseline_runs = {run["size"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        previous = baseline_runs.get(run["size"])
+        if not previous:
+            continue
+        for metric, value in run.items():
+            old = previous.get(metric)
+            if metric == "size" or not isinstance(old, (int, float)) or old == 0:
+                continue
+            change = (value - old) / abs(old)
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append({"size": run["size"], "metric": metric, "baseline": old, "current": value})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Personal Memory AI benchmarks")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per size")
+    parser.add_argument("--k", type=int, default=4, help="Top-k for retrieval and recall")
+    parser.add_argument("--embeddings", choices=["hashing", "huggingface", "onnx"], default="hashing")
+    parser.add_argument("--no-end-to-end", action="store_true", help="Skip the QA chain benchmark")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    # Includes importing the backend (torch or onnxruntime) and loading weights
+    load_start = time.perf_counter()
+    embeddings = _get_embeddings(args.embeddings)
+    embeddings_load_s = time.perf_counter() - load_start
+    queries = generate_queries(args.queries)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "embeddings": args.embeddings,
+        "embeddings_load_s": embeddings_load_s,
+        "k": args.k,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="memory-bench-") as workdir:
+        for size in [int(s) for s in args.sizes.split(",") if s]:
+            print(f"Benchmarking {size} documents...", file=sys.stderr)
+            report["runs"].append(run_size(
+                size, queries, embeddings, k=args.k, end_to_end=not args.no_end_to_end,
+                docstore_path=os.path.join(workdir, f"docstore-{size}.sqlite"),
+            ))
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
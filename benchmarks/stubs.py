@@ -0,0 +1,49 @@
+"""
+Deterministic offline stand-ins for the embedding model and Ollama.
+
+HashingEmbeddings hashes words into a fixed number of signed buckets, so
+texts sharing words land close together and retrieval quality is still
+meaningful, without loading torch or a model. StubLLM answers instantly
+with a digest of the prompt so chains run end to end without a server.
+"""
+
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Signed feature-hashing bag of words, L2-normalized"""
+
+    def __init__(self, size=384):
+        self.size = size
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vector[h % self.size] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class StubLLM(LLM):
+    """LLM that returns a fixed-format answer derived from the prompt"""
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return f"Stub answer ({len(prompt)} prompt chars, crc {zlib.crc32(prompt.encode('utf-8')):08x})"
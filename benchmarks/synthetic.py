@@ -0,0 +1,85 @@
+"""
+Synthetic personal corpus for benchmarks.
+
+Generates loader-shaped records (see loaders/records.py) for emails, calendar
+events and Notion pages, deterministically from a seed, so runs at any scale
+are comparable across commits.
+"""
+
+import random
+import time
+
+from loaders.records import make_record
+
+PEOPLE = [
+    "Priya Shah", "Alex Kim", "Maria Garcia", "Tom Becker", "Wei Chen",
+    "Sara Novak", "David Okafor", "Lena Fischer", "Ravi Menon", "Julia Costa",
+]
+TOPICS = [
+    "quarterly budget", "product launch", "hiring plan", "design review",
+    "customer escalation", "offsite logistics", "security audit", "roadmap",
+    "invoice", "performance review", "conference travel", "data migration",
+]
+EVENT_KINDS = ["Sync", "1:1", "Review", "Planning", "Standup", "Retro", "Demo"]
+FILLER = [
+    "Please take a look when you get a chance.",
+    "Let me know if anything is unclear.",
+    "I have attached the latest numbers.",
+    "We should align on next steps before Friday.",
+    "Thanks again for the quick turnaround.",
+    "The draft is in the shared folder.",
+]
+
+DAY = 86400
+
+
+def _email(rng, i, now):
+    person = rng.choice(PEOPLE)
+    topic = rng.choice(TOPICS)
+    subject = f"{topic.title()} update"
+    body = " ".join(rng.sample(FILLER, 3))
+    text = f"From: {person}\nSubject: {subject}\nContent: Notes on the {topic}. {body}"
+    timestamp = now - rng.uniform(0, 90) * DAY
+    return make_record("gmail", f"msg-{i}", text, timestamp=timestamp, sender=person, subject=subject)
+
+
+def _event(rng, i, now):
+    title = f"{rng.choice(TOPICS).title()} {rng.choice(EVENT_KINDS)}"
+    timestamp = now + rng.uniform(-30, 30) * DAY
+    start = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp))
+    return make_record("calendar", f"event-{i}", f"Event: {title}\nStart: {start}", timestamp=timestamp, title=title)
+
+
+def _page(rng, i, now):
+    topic = rng.choice(TOPICS)
+    owner = rng.choice(PEOPLE)
+    title = f"{topic.title()} notes ({owner})"
+    timestamp = now - rng.uniform(0, 180) * DAY
+    return make_record("notion", f"page-{i}", title, timestamp=timestamp, title=title)
+
+
+def generate_corpus(size, seed=0, now=None):
+    """Generate size records: half emails, a quarter events, a quarter pages"""
+    rng = random.Random(seed)
+    now = now or time.time()
+    makers = [_email, _email, _event, _page]
+    return [makers[i % 4](rng, i, now) for i in range(size)]
+
+
+def generate_queries(count, seed=1):
+    """Generate a mix of entity, topic and temporal questions"""
+    rng = random.Random(seed)
+    templates = [
+        "What did {person} send me about the {topic}?",
+        "When is the {topic} {kind}?",
+        "Find my notes on the {topic}",
+        "Any emails about the {topic} last week?",
+        "What meetings do I have tomorrow?",
+    ]
+    queries = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        queries.append(template.format(
+            person=rng.choice(PEOPLE), topic=rng.choice(TOPICS), kind=rng.choice(EVENT_KINDS)
+        ))
+    return queries
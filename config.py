@@ -7,3 +7,9 @@ def load_api_keys():
     os.environ["NOTION_DB_ID"] = os.getenv("NOTION_DB_ID")
     os.environ["GOOGLE_CLIENT_SECRET_FILE"] = os.getenv("GOOGLE_CLIENT_SECRET_FILE")
     os.environ["OLLAMA_BASE_URL"] = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+def get_data_dir(*parts):
+    """Local directory for indexes, caches and mirrors (MEMORY_DATA_DIR, default memory_data)"""
+    path = os.path.join(os.getenv("MEMORY_DATA_DIR", "memory_data"), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -6,8 +6,18 @@ from google.oauth2.credentials import Credentials
 import os
 import datetime
 
+from loaders.mirror import mirrored
+from loaders.records import format_mailbox, make_record, parse_timestamp
+from telemetry import timed
+
 def load_calendar_events():
     """Load calendar events with proper error handling"""
+    return [record["metadata"]["title"] for record in load_calendar_records()]
+
+@mirrored
+@timed("loader", source="calendar")
+def load_calendar_records():
+    """Load upcoming calendar events as records keyed on their start time"""
     
     # Check if Google credentials are configured
     client_secret_file = os.getenv("GOOGLE_CLIENT_SECRET_FILE")
@@ -44,10 +54,35 @@ def load_calendar_events():
         ).execute()
         
         events = events_result.get('items', [])
-        summaries = [event.get('summary', 'No title') for event in events]
+        records = []
+        for event in events:
+            title = event.get('summary', 'No title')
+            start = event.get('start', {})
+            end = event.get('end', {})
+            start_value = start.get('dateTime') or start.get('date')
+            end_value = end.get('dateTime') or end.get('date')
+            text = f"Event: {title}"
+            if start_value:
+                text += f"\nStart: {start_value}"
+            if end_value:
+                text += f"\nEnd: {end_value}"
+            records.append(make_record(
+                "calendar",
+                event.get('id', f"event-{len(records)}"),
+                text,
+                timestamp=parse_timestamp(start_value),
+                title=title,
+                end_timestamp=parse_timestamp(end_value),
+                attendees=[
+                    format_mailbox(a.get('displayName'), a.get('email')) for a in event.get('attendees', [])
+                    if a.get('displayName') or a.get('email')
+                ],
+                organizer=format_mailbox(event.get('organizer', {}).get('displayName'),
+                                         event.get('organizer', {}).get('email')),
+            ))
         
-        print(f"Successfully loaded {len(summaries)} calendar events")
-        return summaries
+        print(f"Successfully loaded {len(records)} calendar events")
+        return records
         
     except HttpError as e:
         if "Calendar API has not been used" in str(e) or "accessNotConfigured" in str(e):
@@ -3,9 +3,164 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
+from loaders.mime import (
+    MAX_ATTACHMENT_BYTES, attachment_text, attachments, decode_data, message_body, walk_parts,
+)
+from loaders.mirror import mirrored
+from loaders.records import make_record, parse_timestamp
+from telemetry import timed
+
+# Each message keeps its first MESSAGE_CHARS; a thread keeps its first
+# message plus the newest ones that fit in THREAD_CHARS
+MESSAGE_CHARS = 2000
+THREAD_CHARS = 8000
+# Threads are parsed in worker processes; 0 parses in the loading process
+PARSE_WORKERS = int(os.getenv("GMAIL_PARSE_WORKERS", "2"))
+ATTACHMENTS = os.getenv("GMAIL_ATTACHMENTS", "true").lower() != "false"
+
+_REPLY_HEADER = re.compile(r"^(On .+wrote:|-+ ?Original Message ?-+|-+ ?Forwarded message ?-+)\s*$", re.IGNORECASE)
+_REPLY_HEADER_START = re.compile(r"^On .+", re.IGNORECASE)
+
+def strip_quoted(text):
+    """Drop quoted reply text, reply headers and signatures from a message body"""
+    lines = text.replace("\r\n", "\n").split("\n")
+    kept = []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        # "On <date>, <name> wrote:" is often wrapped over two lines
+        joined = f"{stripped} {lines[i + 1].strip()}" if i + 1 < len(lines) else stripped
+        if _REPLY_HEADER.match(stripped) or (_REPLY_HEADER_START.match(stripped) and _REPLY_HEADER.match(joined)):
+            break
+        if stripped == "--":
+            break
+        if stripped.startswith(">"):
+            continue
+        kept.append(line.rstrip())
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+def _header(message, name, default):
+    headers = message.get("payload", {}).get("headers", [])
+    return next((h['value'] for h in headers if h['name'] == name), default)
+
+def thread_record(thread):
+    """One record for a whole Gmail thread, with quoted text removed.
+
+    The thread's historyId is the record version, so an unchanged thread is
+    never re-embedded and a new reply replaces the thread's document.
+    """
+    messages = thread.get("messages", [])
+    parts = []
+    for msg in messages:
+        payload = msg.get("payload", {})
+        body = message_body(payload)
+        body = strip_quoted(body)[:MESSAGE_CHARS] if body else msg.get("snippet", "")
+        for attachment in attachments(payload):
+            if attachment["data"]:
+                text = attachment_text(attachment, decode_data(attachment["data"]))
+                if text:
+                    body += f"\n{text}"
+        parts.append(f"From: {_header(msg, 'From', 'Unknown Sender')}\n{body}")
+    kept = parts[-1:]
+    used = len(kept[0]) if kept else 0
+    for part in reversed(parts[1:-1]):
+        if used + len(part) > THREAD_CHARS:
+            break
+        kept.insert(0, part)
+        used += len(part)
+    if len(parts) > 1:
+        if len(kept) < len(parts) - 1:
+            kept.insert(0, f"[{len(parts) - len(kept) - 1} earlier messages omitted]")
+        kept.insert(0, parts[0])
+    first, last = messages[0], messages[-1]
+    subject = _header(first, 'Subject', 'No Subject')
+    participants = []
+    for msg in messages:
+        for name in ('From', 'To', 'Cc'):
+            value = _header(msg, name, None)
+            if value and value not in participants:
+                participants.append(value)
+    return make_record(
+        "gmail",
+        thread.get("id"),
+        f"Subject: {subject}\n\n" + "\n\n".join(kept),
+        timestamp=parse_timestamp(last.get('internalDate')),
+        sender=_header(last, 'From', 'Unknown Sender'),
+        subject=subject,
+        thread_id=thread.get("id"),
+        message_count=len(messages),
+        participants=participants,
+        version=thread.get("historyId"),
+    )
+
+def fetch_attachments(service, thread, max_bytes=MAX_ATTACHMENT_BYTES):
+    """Download the thread's extractable attachments under max_bytes into their payload parts"""
+    for msg in thread.get("messages", []):
+        for attachment in attachments(msg.get("payload", {}), max_bytes):
+            if attachment["data"] or not attachment["id"]:
+                continue
+            data = service.users().messages().attachments().get(
+                userId='me', messageId=msg['id'], id=attachment["id"]
+            ).execute().get("data")
+            # attachments() returns copies, so find the part again to fill it in
+            for part in walk_parts(msg.get("payload", {})):
+                if part.get("body", {}).get("attachmentId") == attachment["id"]:
+                    part["body"]["data"] = data
+    return thread
+
+def iter_thread_records(service, thread_ids, workers=PARSE_WORKERS):
+    """Fetch threads and yield their records as parsing finishes.
+
+    Fetching stays in this process (the API client cannot be shared), while
+    MIME decoding, HTML conversion and PDF extraction run in a process pool,
+    overlapping with the next fetch.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    pending = set()
+    try:
+        for thread_id in thread_ids:
+            try:
+                thread = service.users().threads().get(userId='me', id=thread_id, format='full').execute()
+                if not thread.get('messages'):
+                    continue
+                if ATTACHMENTS:
+                    fetch_attachments(service, thread)
+            except Exception as e:
+                print(f"Error processing email thread: {e}")
+                continue
+            if pool is None:
+                yield thread_record(thread)
+                continue
+            pending.add(pool.submit(thread_record, thread))
+            done = {future for future in pending if future.done()}
+            pending -= done
+            yield from _results(done)
+        yield from _results(as_completed(pending))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def _results(futures):
+    for future in futures:
+        try:
+            yield future.result()
+        except Exception as e:
+            print(f"Error processing email thread: {e}")
+
 def load_gmail_emails():
+    return [record["text"] for record in load_gmail_records()]
+
+@mirrored
+@timed("loader", source="gmail")
+def load_gmail_records():
+    """Yield last week's email threads as one record each, carrying sender, subject and timestamp.
+
+    Records are yielded as threads finish parsing, so a caller can index a
+    large mailbox in batches without holding all of it in memory.
+    """
     SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
     creds = None
     if os.path.exists('token.json'):
@@ -25,32 +180,20 @@ def load_gmail_emails():
     one_week_ago = datetime.now() - timedelta(days=7)
     query = f'after:{one_week_ago.strftime("%Y/%m/%d")}'
     
-    results = service.users().messages().list(
+    # One document per thread keeps long reply chains from crowding the top-k
+    results = service.users().threads().list(
         userId='me', 
         q=query,
         maxResults=50 
     ).execute()
     
-    messages = results.get('messages', [])
-    emails = []
+    threads = results.get('threads', [])
     
-    print(f"Loading {len(messages)} emails from the last week...")
+    print(f"Loading {len(threads)} email threads from the last week...")
     
-    for message in messages:
-        try:
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-            
-            headers = msg.get('payload', {}).get('headers', [])
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
-            snippet = msg.get('snippet', '')
-            
-            email_content = f"From: {sender}\nSubject: {subject}\nContent: {snippet}"
-            emails.append(email_content)
-            
-        except Exception as e:
-            print(f"Error processing email: {e}")
-            continue
+    count = 0
+    for record in iter_thread_records(service, [summary['id'] for summary in threads]):
+        count += 1
+        yield record
     
-    print(f"Successfully loaded {len(emails)} emails from the last week")
-    return emails
+    print(f"Successfully loaded {count} email threads from the last week")
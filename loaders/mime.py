@@ -0,0 +1,144 @@
+"""
+Text extraction from Gmail API message payloads.
+
+Bodies are read from the decoded MIME tree: text/plain is preferred, and
+text/html is converted to text when it is the only body. PDF attachments
+are extracted with PyMuPDF. Everything is capped, covering body and
+attachment bytes, PDF pages and extracted characters, so one huge
+newsletter or attachment cannot stall ingestion. Bodies are cut before they
+are decoded or parsed as HTML. The functions are pure so they can run in worker
+processes.
+"""
+
+import base64
+import html
+import os
+import re
+from html.parser import HTMLParser
+
+MAX_ATTACHMENT_BYTES = int(os.getenv("GMAIL_MAX_ATTACHMENT_BYTES", str(5 * 1024 * 1024)))
+MAX_ATTACHMENT_CHARS = 2000
+# Bytes of a text/plain or text/html body that are decoded; HTML is mostly
+# markup, so this leaves far more text than a message keeps
+MAX_BODY_BYTES = int(os.getenv("GMAIL_MAX_BODY_BYTES", str(256 * 1024)))
+MAX_PDF_PAGES = 20
+
+_BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote"}
+_SKIP_TAGS = {"script", "style", "head", "title"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS and self._skipping:
+            self._skipping -= 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(markup):
+    """Readable text from an HTML body, without scripts, styles or markup"""
+    parser = _TextExtractor()
+    parser.feed(markup)
+    parser.close()
+    text = html.unescape("".join(parser.parts)).replace("\xa0", " ")
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def decode_data(data, max_bytes=None):
+    """Bytes from Gmail's unpadded base64url encoding, only the first max_bytes if given"""
+    if max_bytes is not None:
+        # Every 4 characters encode 3 bytes, so a cut on a multiple of 4 still decodes
+        data = data[:4 * -(-max_bytes // 3)]
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))[:max_bytes]
+
+
+def walk_parts(payload):
+    """A payload and all its nested MIME parts, depth first"""
+    yield payload
+    for part in payload.get("parts", []) or []:
+        yield from walk_parts(part)
+
+
+def message_body(payload, max_bytes=MAX_BODY_BYTES):
+    """Text of a message payload: text/plain if present, else text/html converted, else None.
+
+    Only the first max_bytes of a body are decoded and converted.
+    """
+    bodies = {}
+    for part in walk_parts(payload):
+        mime_type = part.get("mimeType", "")
+        data = part.get("body", {}).get("data")
+        if data and not part.get("filename") and mime_type in ("text/plain", "text/html") and mime_type not in bodies:
+            bodies[mime_type] = decode_data(data, max_bytes).decode("utf-8", errors="replace")
+    if "text/plain" in bodies:
+        return bodies["text/plain"]
+    if "text/html" in bodies:
+        return html_to_text(bodies["text/html"])
+    return None
+
+
+def attachments(payload, max_bytes=MAX_ATTACHMENT_BYTES):
+    """Extractable attachment parts under max_bytes, as dicts with filename, mime_type, size and id or data"""
+    found = []
+    for part in walk_parts(payload):
+        filename = part.get("filename")
+        body = part.get("body", {})
+        if not filename or part.get("mimeType") != "application/pdf":
+            continue
+        if body.get("size", 0) > max_bytes:
+            continue
+        found.append({
+            "filename": filename,
+            "mime_type": part["mimeType"],
+            "size": body.get("size", 0),
+            "id": body.get("attachmentId"),
+            "data": body.get("data"),
+        })
+    return found
+
+
+def pdf_text(data, max_pages=MAX_PDF_PAGES, max_chars=MAX_ATTACHMENT_CHARS):
+    """Text from the first pages of a PDF, or "" if it cannot be read"""
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf
+        except ImportError:
+            return ""
+    try:
+        with pymupdf.open(stream=data, filetype="pdf") as document:
+            text = []
+            used = 0
+            for page in document.pages(0, min(max_pages, document.page_count)):
+                text.append(page.get_text())
+                used += len(text[-1])
+                if used >= max_chars:
+                    break
+    except Exception:
+        return ""
+    return re.sub(r"\s+", " ", "".join(text)).strip()[:max_chars]
+
+
+def attachment_text(attachment, data):
+    """Extracted text for a fetched attachment, labelled with its file name"""
+    if attachment["mime_type"] == "application/pdf":
+        text = pdf_text(data)
+        return f"Attachment {attachment['filename']}: {text}" if text else ""
+    return ""
@@ -0,0 +1,124 @@
+"""
+Local mirror of every record the loaders fetch.
+
+Each load_*_records call upserts its normalized records into a SQLite file
+under the data directory, keyed by (source, id). `python main.py --rebuild`
+re-derives the whole index from this mirror alone, so changing chunking, the
+embedding model or the index type never needs the Gmail, Calendar or Notion
+APIs. Set RAW_MIRROR=false to disable mirroring. Loaders that yield their
+records are mirrored MIRROR_BATCH records at a time as they are consumed.
+Chat turns and remembered facts are mirrored by the memory writer under
+the "chat" source, so a rebuild keeps them too.
+"""
+
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import time
+
+from config import get_data_dir
+
+MIRROR_BATCH = 256
+
+
+def default_mirror_path():
+    return os.path.join(get_data_dir("mirror"), "raw.sqlite")
+
+
+class RawMirror:
+    """SQLite table of loader records, upserted by (source, id)"""
+
+    def __init__(self, path=None):
+        self.path = path or default_mirror_path()
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "source TEXT NOT NULL, id TEXT NOT NULL, timestamp REAL, text TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (source, id))"
+        )
+        self._conn.commit()
+
+    def put(self, records):
+        """Insert or refresh records; returns how many were written"""
+        fetched_at = time.time()
+        rows = []
+        for record in records:
+            metadata = record.get("metadata", {})
+            if not metadata.get("source") or metadata.get("id") is None:
+                continue
+            rows.append((
+                metadata["source"], str(metadata["id"]), metadata.get("timestamp"),
+                record["text"], json.dumps(metadata, default=str), fetched_at,
+            ))
+        self._conn.executemany(
+            "INSERT INTO records (source, id, timestamp, text, metadata, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (source, id) DO UPDATE SET "
+            "timestamp = excluded.timestamp, text = excluded.text, "
+            "metadata = excluded.metadata, fetched_at = excluded.fetched_at",
+            rows,
+        )
+        self._conn.commit()
+        return len(rows)
+
+    def records(self, sources=None, exclude=()):
+        """Yield mirrored records in the loader shape, optionally for some sources only or without some"""
+        query = "SELECT text, metadata FROM records"
+        params = ()
+        if sources:
+            query += f" WHERE source IN ({','.join('?' * len(sources))})"
+            params = tuple(sources)
+        if exclude:
+            query += " AND" if sources else " WHERE"
+            query += f" source NOT IN ({','.join('?' * len(exclude))})"
+            params += tuple(exclude)
+        for text, metadata in self._conn.execute(query + " ORDER BY source, timestamp, id", params):
+            yield {"text": text, "metadata": json.loads(metadata)}
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def mirror_records(records):
+    """Upsert records into the default mirror unless RAW_MIRROR=false; errors only warn"""
+    if records and os.getenv("RAW_MIRROR", "true").lower() != "false":
+        try:
+            mirror = RawMirror()
+            try:
+                mirror.put(records)
+            finally:
+                mirror.close()
+        except (sqlite3.Error, OSError) as e:
+            # The mirror is a copy for rebuilds; a loader never fails because of it
+            print(f"WARNING: Could not update raw data mirror: {e}")
+
+
+def mirrored(func):
+    """Decorator for load_*_records functions that copies their results into the mirror"""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator(*args, **kwargs):
+            batch = []
+            try:
+                for record in func(*args, **kwargs):
+                    batch.append(record)
+                    yield record
+                    if len(batch) >= MIRROR_BATCH:
+                        mirror_records(batch)
+                        batch = []
+            finally:
+                # Whatever the caller consumed is mirrored, even if it stopped early
+                mirror_records(batch)
+        return generator
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        records = func(*args, **kwargs)
+        mirror_records(records)
+        return records
+    return wrapper
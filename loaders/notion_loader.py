@@ -2,8 +2,30 @@ from notion_client import Client
 from notion_client.errors import APIResponseError
 import os
 
+from loaders.mirror import mirrored
+from loaders.records import format_mailbox, make_record, parse_timestamp
+from telemetry import timed
+
+def _people(properties):
+    """Everyone named in a page's people properties, as "Name <address>" strings"""
+    people = []
+    for prop_value in properties.values():
+        if prop_value.get("type") != "people":
+            continue
+        for person in prop_value.get("people", []):
+            mailbox = format_mailbox(person.get("name"), person.get("person", {}).get("email"))
+            if mailbox and mailbox not in people:
+                people.append(mailbox)
+    return people
+
 def load_notion_pages():
     """Load pages from Notion database with proper error handling"""
+    return [record["text"] for record in load_notion_records()]
+
+@mirrored
+@timed("loader", source="notion")
+def load_notion_records():
+    """Load Notion pages as records carrying their last edit time"""
     
     # Check if Notion is configured
     notion_key = os.getenv("NOTION_API_KEY")
@@ -42,10 +64,17 @@ def load_notion_pages():
                                 title = prop_value["title"][0]["plain_text"]
                                 break
                 
-                pages.append(title)
+                pages.append(make_record(
+                    "notion",
+                    page.get("id", f"page-{len(pages)}"),
+                    title,
+                    timestamp=parse_timestamp(page.get("last_edited_time") or page.get("created_time")),
+                    title=title,
+                    people=_people(page["properties"]),
+                ))
             except (KeyError, IndexError, TypeError) as e:
                 print(f"WARNING: Error parsing page data: {e}")
-                pages.append("Error parsing page")
+                pages.append(make_record("notion", f"page-{len(pages)}", "Error parsing page"))
         
         print(f"Successfully loaded {len(pages)} pages from Notion")
         return pages
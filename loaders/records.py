@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+
+def parse_timestamp(value):
+    """Convert an RFC 3339 string, a date string or epoch milliseconds to epoch seconds"""
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            return int(value) / 1000.0
+        text = str(value).replace("Z", "+00:00")
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is None:
+            # All-day dates and naive times are interpreted in local time
+            return parsed.timestamp()
+        return parsed.astimezone(timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def format_mailbox(name, address):
+    """"Name <address>" from whichever parts are known, or None"""
+    if name and address:
+        return f"{name} <{address}>"
+    return address or name or None
+
+
+def make_record(source, record_id, text, timestamp=None, **metadata):
+    """Build the normalized record shape shared by all loaders"""
+    metadata.update({"source": source, "id": record_id, "timestamp": timestamp})
+    return {"text": text, "metadata": metadata}
@@ -1,21 +1,146 @@
-from config import load_api_keys
-from loaders.gmail_loader import load_gmail_emails
-from loaders.notion_loader import load_notion_pages
-from loaders.calendar_loader import load_calendar_events
-from memory.vectorstore import build_vectorstore
+import argparse
+import os
+import shutil
+
+from config import get_data_dir, load_api_keys
+from loaders.gmail_loader import load_gmail_records
+from loaders.notion_loader import load_notion_records
+from loaders.calendar_loader import load_calendar_records
+from loaders.mirror import RawMirror
+from memory.dedupe import NearDuplicateIndex
+from memory.entities import EntityIndex
+from memory.vectorstore import load_embeddings
+from memory.index_store import IndexStore
+from memory.ingest import SegmentFollower, run_ingest, start_ingest_worker
+from memory.lexical import LexicalIndex
 from memory.rag_chain import build_qa_chain
+from memory.structured import StructuredIndex
+from memory.summaries import SummaryIndex, SummaryRouter, ollama_group_summarizer
+from memory.tiered import ColdTier, TieredStore
+from memory.warmup import start_warmup
+from memory.writeback import MemoryWriter
 from agent.memory_agent import build_agent
 from ui.chat_terminal import run_chat
+from telemetry import start_metrics_server
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Personal Memory Assistant")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the index from the local raw-data mirror without contacting any API")
+    parser.add_argument("--ingest", action="store_true",
+                        help="Fetch all sources and publish new index segments for a running chat process, then exit")
+    args = parser.parse_args()
+
+    if args.ingest:
+        run_ingest()
+        raise SystemExit(0)
+
     load_api_keys()
-    local_data = []  # You can add file loaders later
-    gmail_data = load_gmail_emails()
-    notion_data = load_notion_pages()
-    calendar_data = load_calendar_events()
+    start_metrics_server()
+    # RETRIEVAL_MODE=lexical skips the embedding model (and torch) entirely
+    lexical_only = os.getenv("RETRIEVAL_MODE", "vector").lower() == "lexical"
+    # Load Ollama's model and the embedder while the loaders are fetching data
+    warmup = start_warmup(None if lexical_only else load_embeddings)
+    lexical_path = os.path.join(get_data_dir("lexical"), "index.pkl")
+    # Thread/day/week summaries for broad questions, refreshed in the background
+    summaries = SummaryIndex.open(os.path.join(get_data_dir("summaries"), "summaries.json"), ollama_group_summarizer())
+    # Near-duplicates (newsletters, recurring events) are collapsed before embedding
+    dedupe = os.getenv("DEDUP", "true").lower() != "false"
+    dedupe_path = os.path.join(get_data_dir("dedupe"), "minhash.pkl")
+    # Loaders and embedding run in a child process that hands over index segments
+    ingest_worker = os.getenv("INGEST_WORKER", "false").lower() == "true" and not args.rebuild
+
+    if args.rebuild:
+        embeddings = warmup["embeddings"].result() if "embeddings" in warmup else None
+        mirror = RawMirror()
+        print(f"Rebuilding index from {len(mirror)} mirrored records...")
+        # Chat turns are indexed again but, as in a live session, not summarized
+        structured = StructuredIndex(mirror.records(exclude=("chat",)))
+        summaries.add_records(mirror.records(exclude=("chat",)))
+        entities = EntityIndex(mirror.records(exclude=("chat",)))
+        to_index = mirror.records()
+        if dedupe:
+            detector = NearDuplicateIndex(dedupe_path)
+            to_index = detector.collapse(list(to_index))
+            detector.save()
+        if embeddings is None:
+            index = LexicalIndex(lexical_path)
+            index.add_records(to_index)
+            index.save()
+            qa_chain = build_qa_chain(index, entity_index=entities)
+            store = tiers = None
+        else:
+            store = IndexStore.rebuild(get_data_dir("index"), embeddings, to_index)
+            # The rebuilt hot index holds everything again; the archive is re-aged from it
+            shutil.rmtree(get_data_dir("cold"), ignore_errors=True)
+            tiers = TieredStore(store, ColdTier.open(get_data_dir("cold"), embeddings))
+            tiers.start_aging()
+            qa_chain = build_qa_chain(store.vectorstore, entity_index=entities, tiers=tiers)
+        mirror.close()
+    else:
+        if ingest_worker:
+            # Start from what is already mirrored; new data arrives through segments
+            mirror = RawMirror()
+            # Chat records are already in the index; the writer indexed them as they were said
+            all_data = list(mirror.records(exclude=("chat",)))
+            mirror.close()
+        else:
+            local_data = []  # You can add file loaders later
+            gmail_data = list(load_gmail_records())
+            notion_data = load_notion_records()
+            calendar_data = load_calendar_records()
 
-    all_data = local_data + gmail_data + notion_data + calendar_data
-    vectorstore = build_vectorstore(all_data)
-    qa_chain = build_qa_chain(vectorstore)
-    agent = build_agent(qa_chain)
-    run_chat(agent)
+            all_data = local_data + gmail_data + notion_data + calendar_data
+        structured = StructuredIndex(all_data)
+        summaries.add_records(all_data)
+        if os.getenv("RAW_MIRROR", "true").lower() != "false":
+            # The mirror holds every record indexed so far, not just this run's
+            mirror = RawMirror()
+            entities = EntityIndex(mirror.records())
+            mirror.close()
+        else:
+            entities = EntityIndex(all_data)
+        to_index = [] if ingest_worker else all_data
+        if dedupe and not ingest_worker:
+            detector = NearDuplicateIndex.open(dedupe_path)
+            to_index = detector.collapse(all_data)
+            detector.save()
+        embeddings = warmup["embeddings"].result() if "embeddings" in warmup else None
+        if embeddings is None:
+            index = LexicalIndex.open(lexical_path)
+            if index.add_records(to_index):
+                index.save()
+            qa_chain = build_qa_chain(index, entity_index=entities)
+            store = tiers = None
+        else:
+            store = IndexStore.open(get_data_dir("index"), embeddings)
+            tiers = TieredStore(store, ColdTier.open(get_data_dir("cold"), embeddings))
+            if tiers.add_records(to_index):
+                store.snapshot()
+            # Documents older than HOT_TIER_DAYS move to the memory-mapped archive
+            tiers.start_aging()
+            qa_chain = build_qa_chain(store.vectorstore, entity_index=entities, tiers=tiers)
+    agent = build_agent(SummaryRouter(qa_chain, summaries), structured)
+    # Chat turns and "remember that ..." facts are indexed as the session goes
+    writer = MemoryWriter(tiers if tiers is not None else index)
+    if ingest_worker:
+        follower = SegmentFollower(
+            get_data_dir("segments"), tiers if tiers is not None else index, (structured, entities, summaries),
+            use_vectors=tiers is not None,
+        )
+        # Segments a previous worker published after the last session ended
+        follower.poll()
+        follower.start()
+        worker = start_ingest_worker()
+    run_chat(agent, writer=writer)
+    writer.close()
+    if ingest_worker:
+        if worker.is_alive():
+            # Published segments are kept; the next session picks them up
+            worker.terminate()
+        worker.join()
+        follower.close()
+    if tiers is not None:
+        tiers.close()
+    if store is None:
+        index.save()
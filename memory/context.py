@@ -0,0 +1,129 @@
+import os
+import re
+
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+from telemetry import span
+
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9@._-]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "about", "any", "at", "be", "did", "do", "does",
+    "for", "from", "have", "how", "i", "in", "is", "it", "me", "my", "of",
+    "on", "or", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "why", "with", "you", "your",
+}
+
+_encoding = None
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; fall back to a heuristic if unavailable"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"WARNING: tiktoken unavailable ({e}), estimating token counts")
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text):
+    """Count tokens in text, approximating 4 characters per token without tiktoken"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text))
+
+
+def _terms(text):
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def _shingles(text, size=3):
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedupe_documents(documents, threshold=0.9):
+    """Drop documents whose word shingles nearly match an earlier, higher-ranked one"""
+    kept = []
+    kept_shingles = []
+    for doc in documents:
+        shingles = _shingles(doc.page_content)
+        duplicate = False
+        for other in kept_shingles:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(doc)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def trim_to_relevant_sentences(text, query, min_tokens=80):
+    """Keep only the sentences that share terms with the query, in original order"""
+    if count_tokens(text) <= min_tokens:
+        return text
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+    query_terms = _terms(query)
+    relevant = [s for s in sentences if _terms(s) & query_terms]
+    if not relevant:
+        # Nothing matches lexically; the leading sentence is usually the best summary
+        relevant = sentences[:1]
+    return "\n".join(relevant)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to at most max_tokens tokens"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def assemble_context(documents, query, max_tokens=DEFAULT_CONTEXT_TOKENS,
+                     similarity_threshold=0.9, min_trim_tokens=80):
+    """Dedupe, trim and fit retrieved documents into a prompt token budget"""
+    assembled = []
+    remaining = max_tokens
+    for doc in dedupe_documents(documents, similarity_threshold):
+        text = trim_to_relevant_sentences(doc.page_content, query, min_trim_tokens)
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            # Only partially include a document if a useful amount of room is left
+            if remaining < 32:
+                break
+            text = truncate_to_tokens(text, remaining)
+            tokens = remaining
+        assembled.append(Document(page_content=text, metadata=dict(doc.metadata)))
+        remaining -= tokens
+        if remaining <= 0:
+            break
+    return assembled
+
+
+class ContextBudgetCompressor(BaseDocumentCompressor):
+    """Document compressor that applies assemble_context before the stuff chain"""
+
+    max_tokens: int = DEFAULT_CONTEXT_TOKENS
+    similarity_threshold: float = 0.9
+    min_trim_tokens: int = 80
+
+    def compress_documents(self, documents, query, callbacks=None):
+        with span("prompt_assembly"):
+            return assemble_context(
+                documents,
+                query,
+                max_tokens=self.max_tokens,
+                similarity_threshold=self.similarity_threshold,
+                min_trim_tokens=self.min_trim_tokens,
+            )
@@ -0,0 +1,123 @@
+"""
+Bounded session memory for the chat loop.
+
+Recent turns are kept verbatim; once they outgrow their share of
+CONVERSATION_TOKEN_BUDGET the oldest are folded into a rolling summary by a
+background worker, so the summarization call happens between turns rather
+than during one. The rendered history never exceeds the budget, which keeps
+the per-turn prompt size constant however long the session runs.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from memory.context import count_tokens, truncate_to_tokens
+from memory.llm_cache import get_llm_cache
+from memory.warmup import OLLAMA_KEEP_ALIVE, OLLAMA_MODEL
+from telemetry import MetricsCallbackHandler, span
+
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "600"))
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and their personal assistant. "
+    "Keep names, dates, events and facts the user may refer back to. Reply with the summary only, "
+    "in at most {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New turns:\n{turns}\n\n"
+    "Updated summary:"
+)
+
+
+def _format_turns(turns):
+    return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+
+
+def llm_summarizer(llm, max_words=80):
+    """Summarize function that asks llm to fold turns into the summary"""
+    def summarize(summary, turns):
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)", turns=_format_turns(turns))
+        return str(llm.invoke(prompt)).strip()
+    return summarize
+
+
+def ollama_summarizer(model=OLLAMA_MODEL):
+    """llm_summarizer over the same cached, kept-alive Ollama model the agent uses"""
+    from langchain_community.llms import Ollama
+    llm = Ollama(
+        model=model,
+        temperature=0,
+        callbacks=[MetricsCallbackHandler(model)],
+        cache=get_llm_cache(model),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+    return llm_summarizer(llm)
+
+
+def extractive_summary(summary, turns):
+    """Fallback that just keeps the questions asked, when no LLM is available"""
+    asked = "; ".join(question for question, _ in turns)
+    return f"{summary} Earlier the user asked: {asked}.".strip()
+
+
+class ConversationMemory:
+    """Recent turns verbatim plus a rolling summary, under a fixed token budget"""
+
+    def __init__(self, summarize=None, max_tokens=CONVERSATION_TOKEN_BUDGET):
+        self.summarize = summarize or extractive_summary
+        self.summary_tokens = max_tokens // 3
+        self.recent_tokens = max_tokens - self.summary_tokens
+        self.summary = ""
+        self._turns = deque()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+        self._pending = None
+
+    def add_turn(self, question, answer):
+        """Record a finished turn; overflowing old turns are summarized in the background"""
+        overflow = []
+        with self._lock:
+            self._turns.append((question, answer))
+            while len(self._turns) > 1 and count_tokens(_format_turns(self._turns)) > self.recent_tokens:
+                overflow.append(self._turns.popleft())
+        if overflow:
+            # A single worker keeps folds in order, each building on the last summary
+            self._pending = self._executor.submit(self._fold, overflow)
+
+    def _fold(self, turns):
+        with self._lock:
+            summary = self.summary
+        with span("summarize"):
+            try:
+                updated = self.summarize(summary, turns)
+            except Exception as e:
+                print(f"WARNING: Conversation summary failed ({e}), keeping questions only")
+                updated = extractive_summary(summary, turns)
+        with self._lock:
+            self.summary = truncate_to_tokens(updated, self.summary_tokens)
+
+    def wait(self):
+        """Block until queued summarization has finished"""
+        if self._pending is not None:
+            self._pending.result()
+
+    def render(self):
+        """History text for the next prompt, within the token budget"""
+        with self._lock:
+            summary = self.summary
+            turns = list(self._turns)
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation: {summary}")
+        if turns:
+            recent = _format_turns(turns)
+            parts.append("Recent conversation:\n" + truncate_to_tokens(recent, self.recent_tokens))
+        return "\n\n".join(parts)
+
+    def format_input(self, question):
+        """Agent input carrying the conversation so far, so follow-ups resolve"""
+        history = self.render()
+        if not history:
+            return question
+        return f"{history}\n\nCurrent question: {question}"
@@ -0,0 +1,175 @@
+"""
+Near-duplicate collapsing between the loaders and the index.
+
+Newsletters, notifications and recurring events arrive as many documents
+that differ only in dates, numbers or a line or two. Each record gets a
+MinHash signature over its word shingles (with digits normalized), and
+banded locality-sensitive hashing finds earlier records it probably
+matches without comparing against all of them. Matches above DEDUP_THRESHOLD
+estimated Jaccard similarity are dropped before embedding, and the
+canonical record carries a "duplicates" count instead. The index is pickled
+so later runs recognize new copies of documents indexed before. A record
+whose metadata "version" (or, without one, its text) changes is matched
+again, so a thread that started as a notification and got a real reply is
+indexed.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+
+import numpy as np
+
+from memory.context import _shingles
+from telemetry import increment, span
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+NUM_PERM = 64
+BANDS = 16
+
+_PRIME = (1 << 31) - 1
+_DIGITS = re.compile(r"\d+")
+
+
+def record_key(record):
+    """The "source:id" key a record is indexed under"""
+    metadata = record.get("metadata", {})
+    return f"{metadata.get('source')}:{metadata.get('id')}"
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index mapping each seen record to its canonical record"""
+
+    def __init__(self, path=None, threshold=DEDUP_THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets = {}
+        self._signatures = {}
+        self._canonical = {}
+        # key -> version, or a digest of the text, it was last registered with
+        self._fingerprints = {}
+        self.counts = {}
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """Load a saved index from path, or start an empty one that saves there"""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+            index.path = path
+            # Saved before fingerprints were kept; they are recorded as records come back
+            index.__dict__.setdefault("_fingerprints", {})
+            return index
+        return cls(path, **kwargs)
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self._canonical)
+
+    def signature(self, text):
+        """MinHash signature of text's word shingles, with digit runs normalized"""
+        shingles = _shingles(_DIGITS.sub("0", text))
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        ) % np.uint64(_PRIME)
+        # (a * h + b) mod p stays below 2**63, so uint64 arithmetic cannot overflow
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % np.uint64(_PRIME)
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, signature):
+        """Canonical key of the most similar indexed record above threshold, or None"""
+        best, best_similarity = None, self.threshold
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = key, similarity
+        return best
+
+    def _index(self, key, signature):
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def _unindex(self, key):
+        for band_key in self._band_keys(self._signatures.pop(key)):
+            self._buckets[band_key].remove(key)
+
+    def add(self, key, text, version=None):
+        """Register a record and return its canonical key (key itself if it is new content).
+
+        A key seen before keeps its role unless its version, or its text when
+        it has no version, changed. Then a canonical record stays canonical
+        under its new signature, and a duplicate is matched again.
+        """
+        fingerprint = version if version is not None else hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        role = self._canonical.get(key)
+        if role is not None and self._fingerprints.setdefault(key, fingerprint) == fingerprint:
+            return role
+        self._fingerprints[key] = fingerprint
+        signature = self.signature(text)
+        if role == key:
+            # Later copies are compared against the new text
+            self._unindex(key)
+            self._index(key, signature)
+            return key
+        if role is not None:
+            self.counts[role] -= 1
+        canonical = self.find(signature)
+        if canonical is None:
+            canonical = key
+            self._index(key, signature)
+        self._canonical[key] = canonical
+        self.counts[canonical] = self.counts.get(canonical, 0) + 1
+        return canonical
+
+    def collapse(self, records):
+        """Records to index: canonical ones only, each annotated with its duplicate count.
+
+        Within a batch the newest copy becomes canonical. A record seen before
+        keeps its earlier role, so updated versions of a canonical record
+        still pass through and known duplicates stay dropped, until a new
+        version of a duplicate no longer matches anything.
+        """
+        kept = []
+        dropped = 0
+        with span("dedupe"):
+            newest_first = sorted(
+                enumerate(records), key=lambda item: -(item[1].get("metadata", {}).get("timestamp") or 0)
+            )
+            for position, record in newest_first:
+                key = record_key(record)
+                version = record.get("metadata", {}).get("version")
+                if self.add(key, record.get("text", ""), version) == key:
+                    kept.append((position, record))
+                else:
+                    dropped += 1
+        increment("near_duplicates_dropped", dropped)
+        collapsed = []
+        for _, record in sorted(kept, key=lambda item: item[0]):
+            duplicates = self.counts.get(record_key(record), 1) - 1
+            if duplicates:
+                record = {**record, "metadata": {**record.get("metadata", {}), "duplicates": duplicates}}
+            collapsed.append(record)
+        return collapsed
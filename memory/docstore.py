@@ -0,0 +1,285 @@
+"""
+Compact, disk-backed docstore for the FAISS vectorstore.
+
+Document text and metadata live in a SQLite table addressed by integer
+rowid (optionally zstd-compressed, read through SQLite's memory map), and
+the FAISS row -> document id mapping is a flat integer array. Only the
+top-k hits of a search are materialized into Document objects.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from collections.abc import MutableMapping
+from urllib.request import pathname2url
+
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MMAP_BYTES = 256 * 1024 * 1024
+
+# AUTOINCREMENT: id maps and cold segments refer to rows by rowid, so a
+# deleted document's rowid must never be handed to a new one
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS {table} ("
+    "rowid INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT UNIQUE NOT NULL, "
+    "timestamp REAL, body BLOB NOT NULL)"
+)
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """SQLite-backed docstore that stores each document as one compressed row.
+
+    read_only=True opens a store another process writes, without touching it.
+    """
+
+    def __init__(self, path, compress=None, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        if compress is None:
+            compress = os.getenv("DOCSTORE_COMPRESSION", "zstd") == "zstd"
+        self.compress = compress and zstandard is not None
+        self._lock = threading.RLock()
+        self._connect()
+
+    def _connect(self):
+        if self.read_only:
+            # Another process owns the file, so this connection never sets the
+            # journal mode, creates the table or commits
+            uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # mmap_size only configures this connection; it writes nothing to the file
+        self._conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        if not self.read_only:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA.format(table="docs"))
+            self._conn.commit()
+            self._migrate_rowids()
+        self._compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    def _migrate_rowids(self):
+        # Tables created before AUTOINCREMENT reuse the highest rowid after a delete
+        sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'docs'").fetchone()[0]
+        if "AUTOINCREMENT" in sql:
+            return
+        with self._conn:
+            self._conn.execute(_SCHEMA.format(table="docs_new"))
+            self._conn.execute(
+                "INSERT INTO docs_new (rowid, doc_id, timestamp, body) SELECT rowid, doc_id, timestamp, body FROM docs"
+            )
+            self._conn.execute("DROP TABLE docs")
+            self._conn.execute("ALTER TABLE docs_new RENAME TO docs")
+
+    def __getstate__(self):
+        # FAISS.save_local pickles the docstore; the rows are already on disk
+        return {"path": self.path, "compress": self.compress, "read_only": self.read_only}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.compress = state["compress"]
+        self.read_only = state.get("read_only", False)
+        self._lock = threading.RLock()
+        self._connect()
+
+    def _encode(self, doc):
+        payload = json.dumps({"t": doc.page_content, "m": doc.metadata}, default=str).encode("utf-8")
+        if self.compress:
+            return b"z" + self._compressor.compress(payload)
+        return b"j" + payload
+
+    def _decode(self, doc_id, body):
+        body = bytes(body)
+        payload = self._decompressor.decompress(body[1:]) if body[:1] == b"z" else body[1:]
+        data = json.loads(payload)
+        return Document(id=doc_id, page_content=data["t"], metadata=data["m"])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add(self, texts):
+        """Add a {doc_id: Document} mapping; existing ids are rejected like InMemoryDocstore"""
+        rows = [
+            (doc_id, doc.metadata.get("timestamp"), self._encode(doc))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT INTO docs (doc_id, timestamp, body) VALUES (?, ?, ?)", rows)
+                self._conn.commit()
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise ValueError("Tried to add ids that already exist in the docstore")
+
+    def delete(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM docs WHERE doc_id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM docs WHERE doc_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._decode(search, row[0])
+
+    def __contains__(self, doc_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM docs WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+    def delete_after(self, rowid):
+        """Drop rows added after rowid, such as an append that was never published"""
+        with self._lock:
+            self._conn.execute("DELETE FROM docs WHERE rowid > ?", (rowid,))
+            self._conn.commit()
+
+    def backup_to(self, path):
+        """Write a consistent copy of the database to path"""
+        with self._lock:
+            target = sqlite3.connect(path)
+            try:
+                self._conn.backup(target)
+            finally:
+                target.close()
+
+    def rowid_for(self, doc_id):
+        with self._lock:
+            row = self._conn.execute("SELECT rowid FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            raise KeyError(doc_id)
+        return row[0]
+
+    def rowids_for(self, doc_ids, batch=500):
+        """Rowids of the stored documents among doc_ids, a few queries rather than one per id"""
+        doc_ids = list(doc_ids)
+        rowids = []
+        with self._lock:
+            for i in range(0, len(doc_ids), batch):
+                chunk = doc_ids[i:i + batch]
+                rowids += [row[0] for row in self._conn.execute(
+                    f"SELECT rowid FROM docs WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk
+                )]
+        return rowids
+
+    def doc_id_for(self, rowid):
+        with self._lock:
+            row = self._conn.execute("SELECT doc_id FROM docs WHERE rowid = ?", (rowid,)).fetchone()
+        if row is None:
+            raise KeyError(rowid)
+        return row[0]
+
+    def timestamps(self):
+        """(rowid, timestamp) for every document that has one, without decoding bodies"""
+        with self._lock:
+            return self._conn.execute("SELECT rowid, timestamp FROM docs WHERE timestamp IS NOT NULL").fetchall()
+
+    def rowids(self):
+        """Rowid of every stored document"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT rowid FROM docs")]
+
+    def id_entries(self):
+        """(rowid, doc_id, timestamp) for every document, without decoding bodies"""
+        with self._lock:
+            return self._conn.execute("SELECT rowid, doc_id, timestamp FROM docs").fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CompactIdMap(MutableMapping):
+    """FAISS row -> document id mapping stored as an int64 array of docstore rowids"""
+
+    def __init__(self, docstore, rowids=None):
+        self.docstore = docstore
+        self._rowids = array("q", rowids or [])
+
+    @classmethod
+    def from_bytes(cls, docstore, data):
+        id_map = cls(docstore)
+        id_map._rowids.frombytes(data)
+        return id_map
+
+    def __getstate__(self):
+        return {"docstore": self.docstore, "rowids": self._rowids.tobytes()}
+
+    def __setstate__(self, state):
+        self.docstore = state["docstore"]
+        self._rowids = array("q")
+        self._rowids.frombytes(state["rowids"])
+
+    def __len__(self):
+        return len(self._rowids)
+
+    def __iter__(self):
+        return iter(range(len(self._rowids)))
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self._rowids):
+            raise KeyError(position)
+        return self.docstore.doc_id_for(self._rowids[position])
+
+    def __setitem__(self, position, doc_id):
+        rowid = self.docstore.rowid_for(doc_id)
+        if position == len(self._rowids):
+            self._rowids.append(rowid)
+        elif 0 <= position < len(self._rowids):
+            self._rowids[position] = rowid
+        else:
+            raise KeyError(f"FAISS positions must be contiguous, got {position}")
+
+    def __delitem__(self, position):
+        if position != len(self._rowids) - 1:
+            raise KeyError("Only the last FAISS position can be removed")
+        self._rowids.pop()
+
+    def update(self, other=(), **kwargs):
+        # FAISS adds positions in increasing order; sort so appends stay contiguous
+        items = other.items() if hasattr(other, "items") else other
+        for position, doc_id in sorted(items):
+            self[position] = doc_id
+
+    def rowids_bytes(self):
+        return self._rowids.tobytes()
+
+    def positions_of(self, doc_ids):
+        """FAISS positions currently holding the given documents"""
+        targets = self.docstore.rowids_for(doc_ids)
+        if not targets:
+            return []
+        return np.flatnonzero(np.isin(np.frombuffer(self._rowids, dtype=np.int64), targets)).tolist()
+
+    def remove_positions(self, positions):
+        """Drop the given FAISS positions, shifting later ones down like IndexFlat.remove_ids"""
+        dead = set(positions)
+        self._rowids = array("q", (rowid for position, rowid in enumerate(self._rowids) if position not in dead))
+
+    def timestamp_entries(self):
+        """(timestamp, position) pairs for building a TimeIndex in one query"""
+        position_of = {rowid: position for position, rowid in enumerate(self._rowids)}
+        return [
+            (timestamp, position_of[rowid])
+            for rowid, timestamp in self.docstore.timestamps()
+            if rowid in position_of
+        ]
+
+    def row_entries(self):
+        """(position, doc_id, timestamp) for every row, for grouping rows in one query"""
+        position_of = {rowid: position for position, rowid in enumerate(self._rowids)}
+        return [
+            (position_of[rowid], doc_id, timestamp)
+            for rowid, doc_id, timestamp in self.docstore.id_entries()
+            if rowid in position_of
+        ]
@@ -0,0 +1,96 @@
+"""
+Embedding backends for the vectorstore.
+
+EMBEDDING_BACKEND selects how all-MiniLM-L6-v2 is run:
+
+    huggingface   sentence-transformers on PyTorch, fp32 (default)
+    onnx          the model's published ONNX export with dynamic int8
+                  quantization, on onnxruntime; no torch import
+
+Both produce mean-pooled, L2-normalized 384-dimensional vectors, so an index
+built with one backend can be queried with the other.
+"""
+
+import os
+import platform
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+MAX_SEQ_LENGTH = 256
+
+
+def default_onnx_file():
+    """Quantized graph matching this CPU, as published in the model repository"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """MiniLM sentence embeddings from an int8-quantized ONNX graph on onnxruntime"""
+
+    def __init__(self, model_name=MODEL_NAME, onnx_file=None, batch_size=32, threads=None):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        onnx_file = onnx_file or os.getenv("ONNX_MODEL_FILE") or default_onnx_file()
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(model_name, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+        # Mean pooling over real tokens, then L2 normalization, as the
+        # sentence-transformers pipeline for this model does
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Batch texts of similar length together so little time goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embedded = self._embed_batch([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[batch] = embedded
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def load_backend(backend=None):
+    """Instantiate the selected embedding backend, raising if it cannot load"""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "onnx":
+        return OnnxMiniLMEmbeddings()
+    if backend == "huggingface":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,173 @@
+"""
+Inverted index from people, email addresses and organizations to documents.
+
+Entities come from loader metadata rather than from the embedded text:
+email senders and participants, calendar attendees and organizers, and
+Notion people properties. A question that names someone ("what did Priya
+send me?") is resolved to the matching document ids. A full name or an
+email address restricts the retrievers to those documents; a single name
+part or an organization only ranks them higher, since "will" or "acme"
+in a question may not be about a person at all. Function mailboxes
+(noreply@, support@, team@ ...), calendar rooms and single parts that are
+everyday words are not indexed.
+"""
+
+import re
+import threading
+from email.utils import getaddresses
+
+from memory.lexical import tokenize
+
+ENTITY_FIELDS = ("sender", "participants", "attendees", "organizer", "people")
+
+# Mailbox providers say nothing about which organization someone belongs to
+FREE_MAIL_DOMAINS = {
+    "gmail", "googlemail", "outlook", "hotmail", "live", "yahoo", "icloud", "me", "aol", "proton", "protonmail",
+}
+
+# Words that are names of people as often as they are dates
+_CALENDAR_WORDS = {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+}
+
+# Mailboxes that belong to a function or a system rather than a person
+GENERIC_LOCAL_PARTS = {
+    "noreply", "no-reply", "donotreply", "do-not-reply", "no", "reply", "notifications", "notification",
+    "notify", "alerts", "support", "help", "helpdesk", "team", "info", "hello", "contact", "admin", "office",
+    "sales", "billing", "accounts", "news", "newsletter", "updates", "mailer-daemon", "postmaster", "calendar",
+    "invitations", "feedback", "service", "hr", "jobs", "careers", "security", "privacy",
+}
+
+# Rooms and shared calendars that show up as event attendees
+_RESOURCE_DOMAINS = ("resource.calendar.google.com", "group.calendar.google.com", "group.v.calendar.google.com")
+
+# First names and company words that are also everyday words in questions;
+# they still count as part of a full name
+_COMMON_WORDS = GENERIC_LOCAL_PARTS | {
+    "will", "bill", "mark", "rose", "grace", "hope", "joy", "faith", "sue", "pat", "art", "rob", "don", "ray",
+    "chase", "max", "frank", "guy", "dawn", "eve", "summer", "holly", "ivy", "jack", "page", "hunter", "sky",
+    "can", "new", "next", "last", "all", "get", "go", "meeting", "meetings", "email", "emails", "mail",
+    "group", "events", "event", "notes", "open", "tickets", "ticket", "today", "tomorrow", "week",
+}
+
+_LOCAL_PART = re.compile(r"[._+-]+")
+
+
+def _values(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _is_generic(local):
+    parts = [part for part in _LOCAL_PART.split(local) if part]
+    return local in GENERIC_LOCAL_PARTS or all(part in GENERIC_LOCAL_PARTS for part in parts)
+
+
+def is_exact_key(key):
+    """Whether a key names one person unambiguously: an email address or a full name"""
+    return "@" in key or " " in key
+
+
+def entity_keys(mention):
+    """Lookup keys for one "Name <address>" mention: address, name, name parts and organization"""
+    keys = set()
+    for name, address in getaddresses([mention]):
+        address = address.lower()
+        name = name.strip().lower()
+        if "@" in address:
+            local, domain = address.split("@", 1)
+            if domain.endswith(_RESOURCE_DOMAINS):
+                continue
+            keys.add(address)
+            if not name and not _is_generic(local):
+                name = " ".join(part for part in _LOCAL_PART.split(local) if part)
+            organization = domain.split(".")[-2] if domain.count(".") >= 1 else domain
+            if organization not in FREE_MAIL_DOMAINS:
+                keys.add(organization)
+        elif address and not name:
+            name = address.lower()
+        words = tokenize(name)
+        if words:
+            keys.add(" ".join(words))
+            keys.update(words)
+    return {
+        key for key in keys
+        if len(key) > 1 and (is_exact_key(key) or (key not in _CALENDAR_WORDS and key not in _COMMON_WORDS))
+    }
+
+
+def record_entities(record):
+    """All entity keys named in a loader record's metadata"""
+    metadata = record.get("metadata", {})
+    keys = set()
+    for field in ENTITY_FIELDS:
+        for mention in _values(metadata.get(field)):
+            keys |= entity_keys(str(mention))
+    return keys
+
+
+class EntityIndex:
+    """Entity key -> docstore ids of the documents that mention it"""
+
+    def __init__(self, records=()):
+        # The ingest follower adds segments while retrievers resolve queries
+        self._lock = threading.Lock()
+        self._docs = {}
+        self.add_records(records)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add_records(self, records):
+        for record in records:
+            metadata = record.get("metadata", {})
+            doc_id = f"{metadata.get('source')}:{metadata.get('id')}"
+            keys = record_entities(record)
+            with self._lock:
+                for key in keys:
+                    self._docs.setdefault(key, set()).add(doc_id)
+
+    def mentions(self, query):
+        """Known entity keys named in query, preferring full names over their parts"""
+        with self._lock:
+            return self._mentions(query)
+
+    def _mentions(self, query):
+        # Caller holds _lock
+        words = tokenize(query)
+        found = []
+        used = set()
+        for size in (3, 2, 1):
+            for i in range(len(words) - size + 1):
+                if used & set(range(i, i + size)):
+                    continue
+                key = " ".join(words[i:i + size])
+                if key in self._docs:
+                    found.append(key)
+                    used.update(range(i, i + size))
+        return found
+
+    def resolve(self, query):
+        """(doc ids, exact) for the entities query names, or (None, False) if it names none.
+
+        Several entities are intersected ("emails between Priya and Tom"); if
+        no document has them all, documents naming any of them are returned.
+        exact is True when a full name or an address matched, so retrievers
+        may search only these documents; otherwise they should rank them
+        higher without dropping the rest.
+        """
+        with self._lock:
+            keys = self._mentions(query)
+            if not keys:
+                return None, False
+            sets = [self._docs[key] for key in keys]
+            # Both build a new set, so callers never share one add_records is growing
+            doc_ids = set.intersection(*sets) or set.union(*sets)
+        return doc_ids, any(is_exact_key(key) for key in keys)
+
+    def doc_ids_for(self, query):
+        """Docstore ids matching every entity the query names, or None if it names none"""
+        return self.resolve(query)[0]
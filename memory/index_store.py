@@ -0,0 +1,391 @@
+"""
+Persistent FAISS index with versioned snapshots and a write-ahead log.
+
+Layout under the store root:
+
+    CURRENT                  name of the live snapshot, swapped atomically
+    snapshots/v000001/       index.faiss, docstore.sqlite, ids.bin, meta.json
+    live/docstore.sqlite     working copy of the docstore for this session
+    wal.jsonl                add/delete operations since the last snapshot
+
+Every add and delete is appended (and fsynced) to the log before it is
+applied. Opening the store loads the snapshot named by CURRENT and replays
+only the log entries newer than it; add entries carry their vectors, so
+recovery never re-embeds or touches the loaders. Snapshot directories are
+written under a temporary name and renamed into place before CURRENT is
+replaced, so a reader following CURRENT always sees a complete version.
+
+Deletes only tombstone rows (see TombstoneFAISS). Once tombstones pass
+INDEX_COMPACT_RATIO of the index, a background thread compacts it; every
+snapshot is compacted first, so snapshots never carry dead rows. Compaction
+holds the vectorstore's write lock, so no search maps a shifted row to the
+wrong document.
+"""
+
+import base64
+import json
+import os
+import shutil
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from memory.docstore import CompactDocstore, CompactIdMap
+from memory.vectorstore import TombstoneFAISS, document_ids, pending_documents
+from telemetry import increment, span
+
+SNAPSHOT_EVERY = int(os.getenv("INDEX_SNAPSHOT_EVERY", "1000"))
+KEEP_SNAPSHOTS = 2
+COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", "0.2"))
+REBUILD_BATCH = 512
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _encode_vectors(vectors):
+    return base64.b64encode(np.asarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vectors(data, dimension):
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, dimension)
+
+
+class IndexStore:
+    """FAISS vectorstore whose state survives crashes via snapshots plus a WAL"""
+
+    def __init__(self, root, embeddings, snapshot_every=SNAPSHOT_EVERY, fsync=True,
+                 compact_ratio=COMPACT_RATIO, wal=True):
+        self.root = root
+        self.embeddings = embeddings
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.wal = wal
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+        self.vectorstore = None
+        self.version = 0
+        self._seq = 0
+        self._wal_entries = 0
+        self._compactor = None
+        os.makedirs(os.path.join(root, "snapshots"), exist_ok=True)
+        os.makedirs(os.path.join(root, "live"), exist_ok=True)
+        self._wal_path = os.path.join(root, "wal.jsonl")
+        self._live_docstore = os.path.join(root, "live", "docstore.sqlite")
+
+    @classmethod
+    def open(cls, root, embeddings, **kwargs):
+        """Load the current snapshot and replay the log tail"""
+        store = cls(root, embeddings, **kwargs)
+        with span("index_load"):
+            store._recover()
+        return store
+
+    @classmethod
+    def rebuild(cls, root, embeddings, records, batch_size=REBUILD_BATCH, **kwargs):
+        """Build a fresh store from records and swap it in place of root once complete.
+
+        The log is skipped while building: a crash leaves the previous store
+        untouched, and the final snapshot is the only durable state needed.
+        """
+        root = root.rstrip(os.sep)
+        staging = root + ".rebuild"
+        shutil.rmtree(staging, ignore_errors=True)
+        store = cls(staging, embeddings, snapshot_every=0, fsync=False, compact_ratio=0, wal=False)
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                store.add_records(batch)
+                batch = []
+        if batch:
+            store.add_records(batch)
+        store.fsync = True
+        store.snapshot()
+        store.close()
+
+        previous = root + ".old"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(root):
+            os.rename(root, previous)
+        os.rename(staging, root)
+        shutil.rmtree(previous, ignore_errors=True)
+        return cls.open(root, embeddings, **kwargs)
+
+    # -- recovery ---------------------------------------------------------
+
+    def _current_snapshot(self):
+        pointer = os.path.join(self.root, "CURRENT")
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer) as f:
+            name = f.read().strip()
+        return os.path.join(self.root, "snapshots", name) if name else None
+
+    def _reset_live_docstore(self, source=None):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self._live_docstore + suffix):
+                os.remove(self._live_docstore + suffix)
+        if source:
+            shutil.copyfile(source, self._live_docstore)
+
+    def _recover(self):
+        snapshot = self._current_snapshot()
+        if snapshot:
+            with open(os.path.join(snapshot, "meta.json")) as f:
+                meta = json.load(f)
+            self.version = meta["version"]
+            self._seq = meta["seq"]
+            self._reset_live_docstore(os.path.join(snapshot, "docstore.sqlite"))
+            docstore = CompactDocstore(self._live_docstore)
+            with open(os.path.join(snapshot, "ids.bin"), "rb") as f:
+                id_map = CompactIdMap.from_bytes(docstore, f.read())
+            index = faiss.read_index(os.path.join(snapshot, "index.faiss"))
+            self.vectorstore = TombstoneFAISS(self.embeddings, index, docstore, id_map)
+        else:
+            self._reset_live_docstore()
+
+        replayed = 0
+        for entry in self._read_wal():
+            if entry["seq"] <= self._seq:
+                continue
+            try:
+                self._apply(entry)
+            except ValueError as e:
+                print(f"WARNING: Skipping log entry {entry['seq']}: {e}")
+            self._seq = entry["seq"]
+            replayed += 1
+        self._wal_entries = replayed
+        if replayed:
+            print(f"Recovered index v{self.version} and replayed {replayed} log entries")
+        self._maybe_compact()
+
+    def _read_wal(self):
+        if not os.path.exists(self._wal_path):
+            return
+        good = 0
+        with open(self._wal_path, "rb") as f:
+            for line in f:
+                try:
+                    # A line without its newline was cut short even if it happens to parse
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    break
+                good += len(line)
+                yield entry
+            else:
+                return
+        # A torn final line from a crash mid-append; nothing after it was acknowledged.
+        # Cut it off, or the next append would be glued onto it and lost on replay
+        print("WARNING: Dropping incomplete write-ahead log entry")
+        os.truncate(self._wal_path, good)
+        if self.fsync:
+            _fsync_path(self._wal_path)
+
+    # -- write path -------------------------------------------------------
+
+    def _append_wal(self, entry):
+        if not self.wal:
+            return
+        with open(self._wal_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._wal_entries += 1
+
+    def _ensure_vectorstore(self, dimension):
+        if self.vectorstore is None:
+            docstore = CompactDocstore(self._live_docstore)
+            self.vectorstore = TombstoneFAISS(
+                self.embeddings, faiss.IndexFlatL2(dimension), docstore, CompactIdMap(docstore)
+            )
+
+    def _apply(self, entry):
+        if entry["op"] == "add":
+            vectors = _decode_vectors(entry["vectors"], entry["dim"])
+            self._ensure_vectorstore(entry["dim"])
+            self.vectorstore.add_embeddings(
+                list(zip(entry["texts"], vectors.tolist())), metadatas=entry["metadatas"], ids=entry["ids"]
+            )
+        elif entry["op"] == "delete" and self.vectorstore is not None:
+            self.vectorstore.delete(entry["ids"])
+
+    def close(self):
+        self.wait_for_compaction()
+        if self.vectorstore is not None:
+            self.vectorstore.docstore.close()
+
+    def __contains__(self, doc_id):
+        return self.vectorstore is not None and doc_id in self.vectorstore.docstore
+
+    def __len__(self):
+        return 0 if self.vectorstore is None else self.vectorstore.live_count
+
+    def add_documents(self, documents, ids=None, vectors=None):
+        """Embed (unless vectors are given), log and index documents"""
+        if not documents:
+            return []
+        ids = ids or document_ids(documents)
+        existing = [doc_id for doc_id in ids if doc_id in self]
+        if existing or len(set(ids)) != len(ids):
+            # Reject before logging so a bad batch can never poison recovery
+            raise ValueError(f"Documents already indexed or duplicated: {existing[:5]}")
+        texts = [doc.page_content for doc in documents]
+        if vectors is None:
+            with span("embed"):
+                vectors = self.embeddings.embed_documents(texts)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "op": "add",
+                "ids": ids,
+                "texts": texts,
+                "metadatas": [doc.metadata for doc in documents],
+                "dim": int(vectors.shape[1]),
+                "vectors": _encode_vectors(vectors),
+            }
+            self._append_wal(entry)
+            with span("index_build"):
+                self._apply(entry)
+            increment("docs_indexed", len(documents))
+            self._maybe_snapshot()
+        return ids
+
+    def add_records(self, records, vectors=None):
+        """Index new loader records and replace those whose version changed.
+
+        vectors, if given, are the records' embeddings in order (for example
+        from an ingest segment); records that get indexed are not re-embedded.
+        """
+        records = list(records)
+        pending, replaced = pending_documents(
+            records, self.__contains__, lambda doc_id: self.vectorstore.docstore.search(doc_id).metadata
+        )
+        if not pending:
+            return []
+        pending_vectors = None
+        if vectors is not None:
+            row_of = {
+                f"{record['metadata'].get('source')}:{record['metadata'].get('id')}": row
+                for row, record in enumerate(records) if record.get("metadata")
+            }
+            # Records without a source and id get fresh ids and are embedded here
+            if all(doc_id in row_of for doc_id, _ in pending):
+                pending_vectors = np.asarray([vectors[row_of[doc_id]] for doc_id, _ in pending], dtype=np.float32)
+        self.delete(replaced)
+        return self.add_documents(
+            [doc for _, doc in pending], ids=[doc_id for doc_id, _ in pending], vectors=pending_vectors
+        )
+
+    def delete(self, ids):
+        """Log and tombstone documents by docstore id"""
+        ids = [doc_id for doc_id in ids if doc_id in self]
+        if not ids:
+            return
+        with self.lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "op": "delete", "ids": ids}
+            self._append_wal(entry)
+            self._apply(entry)
+            increment("docs_deleted", len(ids))
+            self._maybe_snapshot()
+            self._maybe_compact()
+
+    # -- compaction -------------------------------------------------------
+
+    def _maybe_compact(self):
+        if self.vectorstore is None or not self.compact_ratio:
+            return
+        if self.vectorstore.tombstone_ratio < self.compact_ratio:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="index-compactor", daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """Physically remove tombstoned rows; returns the number removed"""
+        with self.lock:
+            if self.vectorstore is None:
+                return 0
+            with span("index_compact"):
+                removed = self.vectorstore.compact()
+        if removed:
+            increment("index_compactions")
+        return removed
+
+    def wait_for_compaction(self, timeout=None):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+
+    # -- snapshots --------------------------------------------------------
+
+    def _maybe_snapshot(self):
+        if self.snapshot_every and self._wal_entries >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write a new snapshot, swap CURRENT to it and truncate the log"""
+        with self.lock:
+            if self.vectorstore is None:
+                return None
+            # Dead rows are never worth persisting
+            self.compact()
+            with span("index_snapshot"):
+                version = self.version + 1
+                name = f"v{version:06d}"
+                snapshots = os.path.join(self.root, "snapshots")
+                staging = os.path.join(snapshots, f".tmp-{name}")
+                final = os.path.join(snapshots, name)
+                shutil.rmtree(staging, ignore_errors=True)
+                os.makedirs(staging)
+
+                faiss.write_index(self.vectorstore.index, os.path.join(staging, "index.faiss"))
+                self.vectorstore.docstore.backup_to(os.path.join(staging, "docstore.sqlite"))
+                with open(os.path.join(staging, "ids.bin"), "wb") as f:
+                    f.write(self.vectorstore.index_to_docstore_id.rowids_bytes())
+                with open(os.path.join(staging, "meta.json"), "w") as f:
+                    json.dump({"version": version, "seq": self._seq, "created": time.time(),
+                               "count": self.vectorstore.index.ntotal}, f)
+                if self.fsync:
+                    for filename in os.listdir(staging):
+                        _fsync_path(os.path.join(staging, filename))
+                shutil.rmtree(final, ignore_errors=True)
+                os.rename(staging, final)
+
+                pointer_tmp = os.path.join(self.root, "CURRENT.tmp")
+                with open(pointer_tmp, "w") as f:
+                    f.write(name)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                os.replace(pointer_tmp, os.path.join(self.root, "CURRENT"))
+                if self.fsync:
+                    _fsync_path(self.root)
+
+                # Everything up to self._seq is now in the snapshot
+                open(self._wal_path, "w").close()
+                self._wal_entries = 0
+                self.version = version
+                self._prune_snapshots()
+            print(f"Saved index snapshot {name}")
+            return final
+
+    def _prune_snapshots(self):
+        snapshots = os.path.join(self.root, "snapshots")
+        names = sorted(n for n in os.listdir(snapshots) if n.startswith("v"))
+        for name in names[:-KEEP_SNAPSHOTS]:
+            shutil.rmtree(os.path.join(snapshots, name), ignore_errors=True)
@@ -0,0 +1,329 @@
+"""
+Ingestion in a separate worker process, handed to the chat process as segments.
+
+Fetching, parsing and embedding a large sync used to run in the chat
+process, where it competed with answers for the GIL and the CPU. With
+INGEST_WORKER=true, main.py starts run_ingest() in a child process at a
+lower priority. The child runs the loaders, collapses near-duplicates,
+embeds whatever is not indexed yet and writes each batch as an immutable
+segment. The chat process follows the manifest and folds new segments into
+its own index.
+
+Layout under the segments root:
+
+    MANIFEST        {"version": n, "segments": [names]}, replaced atomically
+    APPLIED         highest segment version the chat process has folded in
+    s000001/        records.jsonl, indexed.jsonl, index.faiss, meta.json
+    failed-s000003/ a segment that could not be applied, kept for inspection
+
+records.jsonl holds every fetched record, for the structured, entity and
+summary indexes. indexed.jsonl holds the records to index, and their
+vectors are the rows of index.faiss. The follower memory-maps index.faiss
+and copies the vectors in without embedding anything, so the chat process
+only pays for an append under the index lock. Segments the chat process
+has applied are deleted by the worker. A segment that still fails after
+INGEST_SEGMENT_RETRIES polls is moved aside and skipped, so one bad
+segment does not stall every later one.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from itertools import islice
+
+import faiss
+import numpy as np
+
+from config import get_data_dir, load_api_keys
+from memory.dedupe import NearDuplicateIndex
+from memory.docstore import CompactDocstore
+from memory.tiered import _MMAP_FLAG
+from memory.vectorstore import load_embeddings, pending_documents
+from telemetry import increment, span
+
+SEGMENT_SIZE = int(os.getenv("INGEST_SEGMENT_SIZE", "256"))
+POLL_INTERVAL = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+# Polls a failing segment is retried on before it is quarantined
+SEGMENT_RETRIES = int(os.getenv("INGEST_SEGMENT_RETRIES", "3"))
+# Added to the worker's niceness so the chat process wins any CPU contention
+INGEST_NICE = int(os.getenv("INGEST_NICE", "10"))
+
+
+def _write_json(path, value):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_manifest(root):
+    """The published {"version", "segments"} manifest, empty if nothing was written yet"""
+    path = os.path.join(root, "MANIFEST")
+    if not os.path.exists(path):
+        return {"version": 0, "segments": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_applied(root):
+    """Highest segment version the chat process has applied"""
+    path = os.path.join(root, "APPLIED")
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return int(f.read().strip() or 0)
+
+
+def _version_of(name):
+    return int(name[1:])
+
+
+class SegmentWriter:
+    """Worker side: writes record batches as numbered segments and publishes them in MANIFEST"""
+
+    def __init__(self, root, embeddings=None):
+        self.root = root
+        self.embeddings = embeddings
+        os.makedirs(root, exist_ok=True)
+        self.version = read_manifest(root)["version"]
+
+    def write(self, records, indexed=()):
+        """Write one segment and publish it; returns its name, or None if there was nothing to write"""
+        records, indexed = list(records), list(indexed)
+        if not records and not indexed:
+            return None
+        with span("segment_write"):
+            version = self.version + 1
+            name = f"s{version:06d}"
+            staging = os.path.join(self.root, f".tmp-{name}")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            _write_jsonl(os.path.join(staging, "records.jsonl"), records)
+            _write_jsonl(os.path.join(staging, "indexed.jsonl"), indexed)
+            if indexed and self.embeddings is not None:
+                with span("embed"):
+                    vectors = np.asarray(
+                        self.embeddings.embed_documents([record["text"] for record in indexed]), dtype=np.float32
+                    )
+                index = faiss.IndexFlatL2(vectors.shape[1])
+                index.add(vectors)
+                faiss.write_index(index, os.path.join(staging, "index.faiss"))
+            _write_json(os.path.join(staging, "meta.json"), {
+                "version": version, "records": len(records), "indexed": len(indexed), "created": time.time(),
+            })
+            os.rename(staging, os.path.join(self.root, name))
+            self._publish(version, name)
+        increment("segments_written")
+        return name
+
+    def _publish(self, version, name):
+        applied = read_applied(self.root)
+        live = [n for n in read_manifest(self.root)["segments"] if _version_of(n) > applied]
+        _write_json(os.path.join(self.root, "MANIFEST"), {"version": version, "segments": live + [name]})
+        self.version = version
+        # Applied segments are no longer listed, so no reader will open them again
+        for entry in os.listdir(self.root):
+            if entry.startswith("s") and entry[1:].isdigit() and _version_of(entry) <= applied:
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+
+class IndexedLookup:
+    """Read-only view of the documents the chat process has indexed, so the worker skips them"""
+
+    def __init__(self, docstore_paths):
+        # Opened read-only: the chat process owns these files and may be writing to them.
+        # Missing stores just mean nothing is indexed yet
+        self._docstores = [CompactDocstore(path, read_only=True) for path in docstore_paths if os.path.exists(path)]
+
+    def __contains__(self, doc_id):
+        return any(doc_id in docstore for docstore in self._docstores)
+
+    def metadata(self, doc_id):
+        for docstore in self._docstores:
+            if doc_id in docstore:
+                return docstore.search(doc_id).metadata
+        return {}
+
+    def close(self):
+        for docstore in self._docstores:
+            docstore.close()
+
+
+def indexed_docstore_paths(index_root=None, cold_root=None):
+    """Docstores of the hot index and the cold archive, as the chat process keeps them"""
+    index_root = index_root or get_data_dir("index")
+    cold_root = cold_root or get_data_dir("cold")
+    return [os.path.join(index_root, "live", "docstore.sqlite"), os.path.join(cold_root, "docstore.sqlite")]
+
+
+def ingest_records(writer, records, indexed, detector=None, batch_size=SEGMENT_SIZE):
+    """Write records as segments of batch_size, indexing only near-unique records not indexed yet.
+
+    records may be any iterable; it is consumed one batch at a time, so a
+    streaming loader never has to be held in memory as a whole.
+    """
+    names = []
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        to_index = detector.collapse(batch) if detector is not None else batch
+        pending, _ = pending_documents(to_index, indexed.__contains__, indexed.metadata)
+        name = writer.write(batch, [{"text": doc.page_content, "metadata": doc.metadata} for _, doc in pending])
+        if name:
+            names.append(name)
+    return names
+
+
+def run_ingest(root=None):
+    """Worker entry point: fetch every source and publish what is new as segments"""
+    # The loaders pull in the Google and Notion clients; only the worker needs them
+    from loaders.calendar_loader import load_calendar_records
+    from loaders.gmail_loader import load_gmail_records
+    from loaders.notion_loader import load_notion_records
+
+    if INGEST_NICE and hasattr(os, "nice"):
+        os.nice(INGEST_NICE)
+    load_api_keys()
+    lexical_only = os.getenv("RETRIEVAL_MODE", "vector").lower() == "lexical"
+    writer = SegmentWriter(root or get_data_dir("segments"), None if lexical_only else load_embeddings())
+    detector = None
+    dedupe_path = os.path.join(get_data_dir("dedupe"), "minhash.pkl")
+    if os.getenv("DEDUP", "true").lower() != "false":
+        detector = NearDuplicateIndex.open(dedupe_path)
+    indexed = IndexedLookup(indexed_docstore_paths())
+    try:
+        # Small sources first, so their segments are not queued behind a large mailbox
+        for load in (load_calendar_records, load_notion_records, load_gmail_records):
+            with span("ingest", loader=load.__name__):
+                names = ingest_records(writer, load(), indexed, detector)
+            if detector is not None:
+                detector.save()
+            print(f"Ingest worker published {len(names)} segments from {load.__name__}")
+    finally:
+        indexed.close()
+
+
+def start_ingest_worker(root=None):
+    """Run run_ingest in a child process and return it.
+
+    The child uses the spawn start method so it shares no locks or threads
+    with the chat process, and is not a daemon because the Gmail loader
+    starts its own parsing processes.
+    """
+    import multiprocessing
+
+    process = multiprocessing.get_context("spawn").Process(target=run_ingest, args=(root,), name="ingest-worker")
+    process.start()
+    return process
+
+
+class SegmentFollower:
+    """Chat side: polls MANIFEST and folds new segments into the live indexes"""
+
+    def __init__(self, root, store, side_indexes=(), use_vectors=True, poll_interval=POLL_INTERVAL,
+                 retries=SEGMENT_RETRIES):
+        self.root = root
+        self.store = store
+        self.side_indexes = list(side_indexes)
+        self.use_vectors = use_vectors
+        self.poll_interval = poll_interval
+        self.retries = retries
+        self.applied = read_applied(root)
+        # Segment name -> failed attempts so far
+        self.failures = {}
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+
+    def poll(self):
+        """Apply every segment published since the last poll; returns how many were applied.
+
+        Segments are applied in order, so a failing one stops the poll and is
+        retried on the next. After `retries` failed attempts it is renamed to
+        failed-<name> and skipped.
+        """
+        count = 0
+        for name in read_manifest(self.root)["segments"]:
+            version = _version_of(name)
+            if version <= self.applied:
+                continue
+            try:
+                self._apply(os.path.join(self.root, name))
+            except Exception as e:
+                self.failures[name] = self.failures.get(name, 0) + 1
+                increment("segment_apply_errors")
+                if self.failures[name] < self.retries:
+                    print(f"WARNING: Could not apply ingest segment {name}, will retry: {e}")
+                    break
+                print(f"WARNING: Skipping ingest segment {name} after {self.failures[name]} attempts: {e}")
+                self._quarantine(name)
+            else:
+                count += 1
+            self.failures.pop(name, None)
+            self._mark_applied(version)
+        return count
+
+    def _mark_applied(self, version):
+        self.applied = version
+        with open(os.path.join(self.root, "APPLIED.tmp"), "w") as f:
+            f.write(str(version))
+        os.replace(os.path.join(self.root, "APPLIED.tmp"), os.path.join(self.root, "APPLIED"))
+
+    def _quarantine(self, name):
+        # Out of the s<version> namespace, so the worker's pruning leaves it alone
+        failed = os.path.join(self.root, f"failed-{name}")
+        shutil.rmtree(failed, ignore_errors=True)
+        if os.path.exists(os.path.join(self.root, name)):
+            os.rename(os.path.join(self.root, name), failed)
+        increment("segments_quarantined")
+
+    def _apply(self, path):
+        with span("segment_apply"):
+            indexed = _read_jsonl(os.path.join(path, "indexed.jsonl"))
+            index_path = os.path.join(path, "index.faiss")
+            if indexed and self.use_vectors and os.path.exists(index_path):
+                # Mapped, not read: only the rows being copied are paged in
+                index = faiss.read_index(index_path, _MMAP_FLAG)
+                self.store.add_records(indexed, vectors=index.reconstruct_n(0, index.ntotal))
+            elif indexed:
+                self.store.add_records(indexed)
+            records = _read_jsonl(os.path.join(path, "records.jsonl"))
+            for side_index in self.side_indexes:
+                side_index.add_records(records)
+        increment("segments_applied")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"WARNING: Could not apply ingest segment: {e}")
+
+    def start(self):
+        """Poll on a background thread until close()"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="segment-follower", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,199 @@
+"""
+In-process BM25 inverted index for the lexical-only retrieval mode.
+
+Used when RETRIEVAL_MODE=lexical or when no embedding model can be loaded:
+nothing here imports sentence-transformers or torch, the index is built
+from plain dictionaries in milliseconds, and it is pickled under the data
+directory so later startups only load it.
+"""
+
+import heapq
+import math
+import os
+import pickle
+import threading
+from collections import Counter
+
+from langchain_core.retrievers import BaseRetriever
+
+from memory.context import _STOPWORDS, _WORD
+from memory.time_index import TimeIndex, parse_time_range
+from memory.vectorstore import ENTITY_BOOST, document_ids, narrow_positions, pending_documents
+from telemetry import increment, span
+
+
+def tokenize(text):
+    """Lowercased content words, with sentence punctuation stripped"""
+    words = (word.strip("._-") for word in _WORD.findall(text.lower()))
+    return [word for word in words if word and word not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25-ranked inverted index over Documents, addressable by docstore id"""
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._docs = []
+        self._ids = []
+        self._lengths = []
+        self._positions = {}
+        self._total_length = 0
+        self.time_index = TimeIndex()
+        # Searches may run while a background writer adds chat turns
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def open(cls, path):
+        """Load a saved index from path, or start an empty one that saves there"""
+        if os.path.exists(path):
+            with span("index_load"):
+                with open(path, "rb") as f:
+                    index = pickle.load(f)
+            index.path = path
+            return index
+        return cls(path)
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp = path + ".tmp"
+        with self.lock, open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def add_documents(self, documents, ids=None):
+        ids = ids or document_ids(documents)
+        with span("index_build", mode="lexical"), self.lock:
+            for doc_id, doc in zip(ids, documents):
+                if doc_id in self._positions:
+                    raise ValueError(f"Document already indexed: {doc_id}")
+                position = len(self._docs)
+                terms = Counter(tokenize(doc.page_content))
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[position] = frequency
+                length = sum(terms.values())
+                self._docs.append(doc)
+                self._ids.append(doc_id)
+                self._lengths.append(length)
+                self._positions[doc_id] = position
+                self._total_length += length
+                self.time_index.add(doc.metadata.get("timestamp"), position)
+        increment("docs_indexed", len(documents))
+        return ids
+
+    def add_records(self, records):
+        """Index new loader records and replace those whose version changed"""
+        with self.lock:
+            pending, replaced = pending_documents(
+                records, self.__contains__, lambda doc_id: self._docs[self._positions[doc_id]].metadata
+            )
+            if not pending:
+                return []
+            self.delete(replaced)
+            return self.add_documents([doc for _, doc in pending], ids=[doc_id for doc_id, _ in pending])
+
+    def delete(self, ids):
+        with self.lock:
+            for doc_id in ids:
+                position = self._positions.pop(doc_id, None)
+                if position is None:
+                    continue
+                for term in set(tokenize(self._docs[position].page_content)):
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(position, None)
+                        if not postings:
+                            del self._postings[term]
+                self._total_length -= self._lengths[position]
+                # Positions stay stable so the time index needs no rebuild
+                self._docs[position] = None
+
+    def positions_of(self, doc_ids):
+        """Positions of the given docstore ids that are still indexed"""
+        with self.lock:
+            return [self._positions[doc_id] for doc_id in doc_ids if doc_id in self._positions]
+
+    def search(self, query, k=4, positions=None, boosted=None):
+        """Top-k (Document, BM25 score) pairs, optionally restricted to positions.
+
+        Positions in boosted have their scores raised by ENTITY_BOOST.
+        """
+        allowed = set(positions) if positions is not None else None
+        terms = set(tokenize(query))
+        with self.lock:
+            live = len(self._positions)
+            if not live:
+                return []
+            average_length = self._total_length / live
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (live - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, frequency in postings.items():
+                    if allowed is not None and position not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[position] / average_length)
+                    scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            for position in boosted or ():
+                if position in scores:
+                    scores[position] *= 1 + ENTITY_BOOST
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._docs[position], score) for position, score in best]
+
+    def as_retriever(self, search_kwargs=None, entity_index=None):
+        """Retriever with the same call shape as VectorStore.as_retriever"""
+        return LexicalRetriever(index=self, k=(search_kwargs or {}).get("k", 4), entity_index=entity_index)
+
+
+class LexicalRetriever(BaseRetriever):
+    """BM25 retrieval over a LexicalIndex, narrowed to the time slice and people a query names"""
+
+    index: object
+    k: int = 4
+    entity_index: object = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with span("retrieval", mode="lexical"):
+            positions = None
+            time_range = parse_time_range(query)
+            if time_range is not None:
+                positions = self.index.time_index.range(*time_range) or None
+            doc_ids, exact = self.entity_index.resolve(query) if self.entity_index is not None else (None, False)
+            boosted = None
+            if doc_ids and exact:
+                # Nobody named in that time range: search the range itself
+                positions = narrow_positions(positions, self.index.positions_of(doc_ids)) or positions
+            elif doc_ids:
+                # A first name or an organization may not be about a person: rank, don't restrict
+                boosted = set(self.index.positions_of(doc_ids))
+            results = self.index.search(query, self.k, positions, boosted)
+            if not results and positions is not None:
+                results = self.index.search(query, self.k)
+            return [doc for doc, _ in results]
+
+
+def build_lexical_index(data, path=None):
+    """Build a LexicalIndex from strings or loader records"""
+    index = LexicalIndex(path)
+    index.add_records(data)
+    print(f"Successfully created lexical index with {len(index)} documents")
+    return index
@@ -0,0 +1,154 @@
+"""
+Persistent completion cache for the temperature-0 Ollama clients.
+
+With temperature 0 the same prompt always produces the same completion, so
+QA answers and ReAct reasoning steps are stored in SQLite keyed on a hash of
+the prompt, LangChain's serialized LLM parameters (model name, temperature,
+stop sequences) and the installed model's digest, so re-pulling a model
+invalidates its entries. The least recently used entries are evicted past
+LLM_CACHE_MAX_ENTRIES. Set LLM_CACHE=false to disable.
+
+Building a chain does not touch the cache: the SQLite file is opened and
+Ollama is asked for the digest on the first completion that consults it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+
+from config import get_data_dir
+from telemetry import increment
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+_caches = {}
+
+
+def ollama_model_digest(model, base_url=None, timeout=1.0):
+    """Digest of the locally installed Ollama model, or "unknown" if Ollama is unreachable"""
+    base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/tags", timeout=timeout) as response:
+            models = json.load(response).get("models", [])
+    except (OSError, ValueError):
+        return "unknown"
+    for entry in models:
+        if entry.get("name") in (model, f"{model}:latest"):
+            return entry.get("digest", "unknown")
+    return "unknown"
+
+
+class SQLiteLLMCache(BaseCache):
+    """Size-bounded LRU cache of LLM generations in a SQLite file"""
+
+    def __init__(self, path, namespace="", max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, generations TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_lru ON completions (last_used)")
+        self._conn.commit()
+
+    def _key(self, prompt, llm_string):
+        digest = hashlib.sha256()
+        for part in (self.namespace, llm_string, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT generations FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            increment("llm_cache_misses", namespace=self.namespace)
+            return None
+        increment("llm_cache_hits", namespace=self.namespace)
+        return [Generation(text=g["text"], generation_info=g.get("info")) for g in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        generations = json.dumps(
+            [{"text": g.text, "info": g.generation_info} for g in return_val], default=str
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, generations, last_used) VALUES (?, ?, ?)",
+                (self._key(prompt, llm_string), generations, time.time()),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key IN "
+                    "(SELECT key FROM completions ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def __bool__(self):
+        # LangChain tests `if llm_cache:`; an empty cache must still be consulted
+        return True
+
+
+class LazyLLMCache(BaseCache):
+    """Opens the model's SQLiteLLMCache on the first lookup or update"""
+
+    def __init__(self, model, path=None):
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+        self._cache = None
+
+    @property
+    def cache(self):
+        with self._lock:
+            if self._cache is None:
+                namespace = f"{self.model}@{ollama_model_digest(self.model)}"
+                path = self.path or os.path.join(get_data_dir("cache"), "llm.sqlite")
+                self._cache = SQLiteLLMCache(path, namespace)
+            return self._cache
+
+    def lookup(self, prompt, llm_string):
+        return self.cache.lookup(prompt, llm_string)
+
+    def update(self, prompt, llm_string, return_val):
+        self.cache.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+    def __bool__(self):
+        return True
+
+
+def get_llm_cache(model):
+    """Shared cache for an Ollama model, or None when LLM_CACHE=false"""
+    if os.getenv("LLM_CACHE", "true").lower() == "false":
+        return None
+    if model not in _caches:
+        _caches[model] = LazyLLMCache(model)
+    return _caches[model]
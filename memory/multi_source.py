@@ -0,0 +1,96 @@
+"""
+Concurrent retrieval across sources for questions that span several of them.
+
+The ReAct loop calls one tool per LLM step, so "did anyone email me about
+tomorrow's meeting?" pays a generation between the calendar lookup and the
+email lookup. MultiSourceSearch plans one sub-query per source, runs them
+together on a thread pool and returns a single merged observation, leaving
+the agent one synthesis step: roughly one retrieval plus one generation.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.tools import Tool
+
+from memory.structured import MAX_RESULTS, format_emails, format_events, format_pages
+from memory.time_index import parse_time_range
+from telemetry import span
+
+MAX_WORKERS = 4
+
+_CALENDAR_WORDS = re.compile(r"\b(meeting|meetings|event|events|calendar|schedule|appointment)\b", re.IGNORECASE)
+
+SECTION_TITLES = {
+    "calendar": "Calendar events",
+    "gmail": "Emails",
+    "notion": "Notion pages",
+    "documents": "Related documents",
+}
+
+
+class MultiSourceSearch:
+    """Fan a question out to every source concurrently and merge the answers"""
+
+    def __init__(self, structured_index=None, retriever=None, max_workers=MAX_WORKERS):
+        self.structured_index = structured_index
+        self.retriever = retriever
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="source")
+
+    def plan(self, query):
+        """Independent per-source sub-queries for query, as {source: zero-argument callable}"""
+        index = self.structured_index
+        tasks = {}
+        if index is not None:
+            time_range = parse_time_range(query)
+            if time_range is not None:
+                tasks["calendar"] = lambda: format_events(index.events_between(*time_range)[:MAX_RESULTS * 4])
+            elif _CALENDAR_WORDS.search(query):
+                tasks["calendar"] = lambda: format_events(index.next_events())
+            tasks["gmail"] = lambda: format_emails(index.match_terms(index.emails, ("sender", "subject"), query))
+            tasks["notion"] = lambda: format_pages(index.match_terms(index.pages, ("title",), query))
+        if self.retriever is not None:
+            tasks["documents"] = lambda: "\n".join(
+                f"- {doc.page_content}" for doc in self.retriever.invoke(query)
+            )
+        return tasks
+
+    def _run(self, source, task):
+        with span("retrieval", source=source):
+            return task()
+
+    def search(self, query):
+        """Run all sub-queries concurrently, returning {source: text} in plan order"""
+        futures = {
+            source: self._executor.submit(self._run, source, task)
+            for source, task in self.plan(query).items()
+        }
+        results = {}
+        for source, future in futures.items():
+            try:
+                results[source] = future.result()
+            except Exception as e:
+                results[source] = f"(lookup failed: {e})"
+        return results
+
+    def __call__(self, query):
+        with span("multi_source"):
+            results = self.search(query)
+        sections = [
+            f"{SECTION_TITLES.get(source, source)}:\n{text}"
+            for source, text in results.items() if text
+        ]
+        return "\n\n".join(sections) if sections else "Nothing relevant found in any source."
+
+
+def build_multi_source_tool(structured_index, retriever=None):
+    """Agent tool that answers cross-source questions with one concurrent search"""
+    return Tool(
+        name="Search_All_Sources",
+        func=MultiSourceSearch(structured_index, retriever),
+        description=(
+            "Use this for questions that involve more than one source, such as emails about a "
+            "meeting. Input is the whole question; calendar, email, Notion and documents are "
+            "searched at once and everything relevant is returned together."
+        ),
+    )
@@ -0,0 +1,291 @@
+"""
+Per-source partitions of the vector index, searched in parallel.
+
+Every source shares one FAISS index, so a question about Notion pages used
+to scan every email vector as well, and the largest source set the latency
+of every query. PartitionMap groups FAISS rows by source (and, with
+PARTITION_BY_TIME, by month or year), plan() picks the partitions a
+question can be about, and PartitionedRetriever searches each of them on
+its own thread. A partition search only computes distances for its own
+rows, through an ID selector bitmap inside the FAISS search, which runs
+without the GIL. Hits are merged by score, so latency follows the largest
+partition searched rather than the whole corpus.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from memory.multi_source import _CALENDAR_WORDS
+from memory.time_index import parse_time_range
+from memory.vectorstore import read_locked
+from telemetry import increment, span
+
+PARTITION_WORKERS = int(os.getenv("PARTITION_WORKERS", "4"))
+# "" partitions by source only; "month" or "year" also splits each source by time
+PARTITION_BY_TIME = os.getenv("PARTITION_BY_TIME", "").lower()
+
+_PERIOD_FORMATS = {"month": "%Y-%m", "year": "%Y"}
+
+# Words that confine a question to one source
+SOURCE_WORDS = {
+    "gmail": re.compile(r"\b(e-?mails?|inbox|mail|gmail)\b", re.IGNORECASE),
+    "notion": re.compile(r"\b(notion|pages?|wiki)\b", re.IGNORECASE),
+    "calendar": _CALENDAR_WORDS,
+}
+# Searched alongside whatever sources a question names: what the user said
+# or asked to remember can be about any of them, and "do you remember ..."
+# is as likely to be about an email as about the conversation
+ALWAYS_SEARCHED = {"chat"}
+
+
+def plan_sources(query):
+    """Sources query explicitly asks about, or None if it could be about any"""
+    sources = {source for source, words in SOURCE_WORDS.items() if words.search(query)}
+    return sources or None
+
+
+def _source_of(doc_id):
+    # Docstore ids are "source:id"; ids without a source share one partition
+    return doc_id.split(":", 1)[0] if ":" in doc_id else ""
+
+
+def _period_range(period, by_time):
+    start = datetime.strptime(period, _PERIOD_FORMATS[by_time])
+    if by_time == "year":
+        end = start.replace(year=start.year + 1)
+    else:
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start.timestamp(), end.timestamp()
+
+
+def _bitmap_params(bitmap):
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    params = faiss.SearchParameters(sel=selector)
+    # The selector reads the numpy buffer directly; keep both alive with the params
+    params.referenced_objects = [selector, bitmap]
+    return params
+
+
+class _Partition:
+    """Row bitmap of one partition, updated in place so its search params stay valid"""
+
+    def __init__(self, positions=(), ntotal=0):
+        positions = np.asarray(positions, dtype=np.int64)
+        bits = np.zeros(max(ntotal, 8), dtype=bool)
+        bits[positions] = True
+        self.count = len(positions)
+        self._set_bitmap(np.packbits(bits, bitorder="little"))
+
+    def _set_bitmap(self, bitmap):
+        self.bitmap = bitmap
+        self.params = _bitmap_params(bitmap)
+
+    def add(self, position):
+        byte = position >> 3
+        if byte >= len(self.bitmap):
+            # Doubling keeps resizes (and new params) rare as the index grows
+            grown = np.zeros(max(2 * len(self.bitmap), byte + 1), dtype=np.uint8)
+            grown[:len(self.bitmap)] = self.bitmap
+            self._set_bitmap(grown)
+        self.bitmap[byte] |= np.uint8(1 << (position & 7))
+        self.count += 1
+
+    def remove(self, position):
+        self.bitmap[position >> 3] &= np.uint8(~(1 << (position & 7)) & 0xFF)
+        self.count -= 1
+
+
+class PartitionMap:
+    """FAISS positions grouped by (source, period), kept up to date as the index changes.
+
+    On a TombstoneFAISS store the map subscribes to appends and deletes and
+    flips bits in place, so queries never pay for a rebuild; only compaction,
+    which shifts every position, triggers one. Other stores are rebuilt when
+    their size or generation changes.
+    """
+
+    def __init__(self, vectorstore, by_time=PARTITION_BY_TIME):
+        if by_time and by_time not in _PERIOD_FORMATS:
+            raise ValueError(f"PARTITION_BY_TIME must be one of {sorted(_PERIOD_FORMATS)}, got {by_time!r}")
+        self.vectorstore = vectorstore
+        self.by_time = by_time
+        self._lock = threading.Lock()
+        self._key = None
+        self._stale = True
+        self._partitions = {}
+        # Partition key of each row position, None once the row is deleted
+        self._row_keys = []
+        self._subscribed = hasattr(vectorstore, "subscribe")
+        if self._subscribed:
+            vectorstore.subscribe(self)
+
+    def _current_key(self):
+        # Appends grow the id map, compaction bumps the generation and deletes
+        # add tombstones; any of them changes which rows a partition holds
+        vectorstore = self.vectorstore
+        return (
+            getattr(vectorstore, "generation", 0),
+            len(vectorstore.index_to_docstore_id),
+            len(getattr(vectorstore, "tombstones", ())),
+        )
+
+    def _partition_key(self, doc_id, timestamp):
+        period = None
+        if self.by_time and timestamp is not None:
+            period = datetime.fromtimestamp(timestamp).strftime(_PERIOD_FORMATS[self.by_time])
+        return _source_of(doc_id), period
+
+    def _entries(self):
+        id_map = self.vectorstore.index_to_docstore_id
+        if hasattr(id_map, "row_entries"):
+            return id_map.row_entries()
+        entries = []
+        for position, doc_id in id_map.items():
+            doc = self.vectorstore.docstore.search(doc_id)
+            entries.append((position, doc_id, doc.metadata.get("timestamp") if hasattr(doc, "metadata") else None))
+        return entries
+
+    def _build(self):
+        with span("partition_build"):
+            tombstones = getattr(self.vectorstore, "tombstones", ())
+            ntotal = self.vectorstore.index.ntotal
+            groups = {}
+            row_keys = [None] * ntotal
+            for position, doc_id, timestamp in self._entries():
+                if position in tombstones:
+                    continue
+                key = self._partition_key(doc_id, timestamp)
+                groups.setdefault(key, []).append(position)
+                row_keys[position] = key
+            self._partitions = {key: _Partition(positions, ntotal) for key, positions in groups.items()}
+            self._row_keys = row_keys
+
+    # -- TombstoneFAISS listener, called under the store's write lock ------
+
+    def on_add(self, start, doc_ids, metadatas):
+        with self._lock:
+            if self._stale:
+                return
+            if start != len(self._row_keys):
+                self._stale = True
+                return
+            for position, (doc_id, metadata) in enumerate(zip(doc_ids, metadatas), start):
+                key = self._partition_key(doc_id, (metadata or {}).get("timestamp"))
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = self._partitions[key] = _Partition()
+                partition.add(position)
+                self._row_keys.append(key)
+        increment("partition_rows_added", len(doc_ids))
+
+    def on_delete(self, positions):
+        with self._lock:
+            if self._stale:
+                return
+            for position in positions:
+                key = self._row_keys[position] if position < len(self._row_keys) else None
+                if key is not None:
+                    self._partitions[key].remove(position)
+                    self._row_keys[position] = None
+
+    def on_compact(self):
+        with self._lock:
+            self._stale = True
+
+    def partitions(self):
+        """{(source, period): (row count, FAISS search params)} for the current index"""
+        with self._lock:
+            if self._subscribed:
+                if self._stale:
+                    self._build()
+                    self._stale = False
+            else:
+                key = self._current_key()
+                if key != self._key:
+                    self._build()
+                    self._key = key
+            return {key: (p.count, p.params) for key, p in self._partitions.items() if p.count}
+
+    def plan(self, query, partitions=None):
+        """Partitions worth searching for query, largest first.
+
+        Partitions of the sources the question names plus the chat partition,
+        restricted to periods overlapping its time range when the map is split
+        by time. A plan that would leave nothing to search falls back to every
+        partition.
+        """
+        if partitions is None:
+            partitions = self.partitions()
+        keys = list(partitions)
+        sources = plan_sources(query)
+        if sources is not None:
+            if any(key[0] in sources for key in keys):
+                keys = [key for key in keys if key[0] in sources | ALWAYS_SEARCHED]
+        time_range = parse_time_range(query) if self.by_time else None
+        if time_range is not None:
+            start, end = time_range
+            overlapping = []
+            for key in keys:
+                if key[1] is None:
+                    overlapping.append(key)
+                    continue
+                period_start, period_end = _period_range(key[1], self.by_time)
+                if period_start < end and period_end > start:
+                    overlapping.append(key)
+            keys = overlapping or keys
+        # Start the slowest searches first
+        return sorted(keys, key=lambda key: -partitions[key][0])
+
+
+class PartitionedRetriever(BaseRetriever):
+    """Scatter a query over the planned partitions on a thread pool and merge hits by score"""
+
+    vectorstore: object
+    partitions: object
+    k: int = 4
+    max_workers: int = PARTITION_WORKERS
+    _executor: object = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="partition")
+
+    def _search(self, key, vector, params):
+        with span("partition_search", source=key[0] or "other"):
+            scores, positions = self.vectorstore.index.search(vector, self.k, params=params)
+        return [(float(score), int(position)) for score, position in zip(scores[0], positions[0]) if position != -1]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        # The read lock holds off appends, deletes and compaction until the
+        # merged positions are mapped to documents; partition searches on the
+        # pool run inside it and must not take it again
+        with span("retrieval", mode="partitioned"), read_locked(self.vectorstore):
+            partitions = self.partitions.partitions()
+            keys = self.partitions.plan(query, partitions)
+            if not keys:
+                return []
+            vector = np.array([self.vectorstore.embedding_function.embed_query(query)], dtype=np.float32)
+            if getattr(self.vectorstore, "_normalize_L2", False):
+                faiss.normalize_L2(vector)
+            if len(keys) == 1:
+                hits = self._search(keys[0], vector, partitions[keys[0]][1])
+            else:
+                futures = [self._executor.submit(self._search, key, vector, partitions[key][1]) for key in keys]
+                hits = [hit for future in futures for hit in future.result()]
+            higher_is_better = self.vectorstore.distance_strategy in (
+                DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD
+            )
+            hits.sort(key=lambda hit: -hit[0] if higher_is_better else hit[0])
+            id_map = self.vectorstore.index_to_docstore_id
+            # Only the merged top k are read from the docstore
+            docs = [self.vectorstore.docstore.search(id_map[position]) for _, position in hits[:self.k]]
+        increment("partitions_searched", len(keys))
+        return [doc for doc in docs if hasattr(doc, "page_content")]
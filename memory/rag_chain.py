@@ -1,8 +1,73 @@
+import os
+
 from langchain.chains import RetrievalQA
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain.retrievers.document_compressors import DocumentCompressorPipeline
 from langchain_community.llms import Ollama
+from langchain_community.vectorstores import FAISS
+
+from memory.context import ContextBudgetCompressor, DEFAULT_CONTEXT_TOKENS
+from memory.llm_cache import get_llm_cache
+from memory.partitions import PartitionMap, PartitionedRetriever
+from memory.warmup import OLLAMA_KEEP_ALIVE
+from memory.rerank import AdaptiveCrossEncoderReranker, RERANK_CANDIDATES
+from memory.tiered import TieredRetriever
+from memory.time_index import TimeAwareRetriever, build_time_index
+from telemetry import MetricsCallbackHandler
+
+def build_retriever(vectorstore, k=4, entity_index=None, tiers=None, partitioned=None):
+    """The retrieval stack build_qa_chain answers from, before reranking and the context budget"""
+    if partitioned is None:
+        partitioned = os.getenv("PARTITIONED_SEARCH", "true").lower() != "false"
+    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+    if isinstance(vectorstore, FAISS):
+        if partitioned:
+            # Per-source partitions searched in parallel replace the single flat scan
+            retriever = PartitionedRetriever(vectorstore=vectorstore, partitions=PartitionMap(vectorstore), k=k)
+        retriever = TimeAwareRetriever(
+            base_retriever=retriever,
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=entity_index,
+            k=k,
+        )
+    elif hasattr(retriever, "entity_index"):
+        retriever.entity_index = entity_index
+    if tiers is not None:
+        # Older documents live in the memory-mapped cold tier
+        retriever = TieredRetriever(hot_retriever=retriever, store=tiers, entity_index=entity_index, k=k)
+    return retriever
+
+def build_qa_chain(vectorstore, max_context_tokens=DEFAULT_CONTEXT_TOKENS, rerank=None, llm=None,
+                   entity_index=None, tiers=None, partitioned=None):
+    if rerank is None:
+        rerank = os.getenv("ENABLE_RERANK", "false").lower() == "true"
+
+    compressors = []
+    if rerank:
+        # Pull a wider, cheap FAISS candidate pool and let the cross-encoder pick
+        k = RERANK_CANDIDATES
+        compressors.append(AdaptiveCrossEncoderReranker())
+    else:
+        k = 4
+    retriever = build_retriever(vectorstore, k, entity_index=entity_index, tiers=tiers, partitioned=partitioned)
+    if max_context_tokens:
+        compressors.append(ContextBudgetCompressor(max_tokens=max_context_tokens))
 
-def build_qa_chain(vectorstore):
-    retriever = vectorstore.as_retriever()
-    llm = Ollama(model="llama3.2", temperature=0)
+    if len(compressors) == 1:
+        retriever = ContextualCompressionRetriever(base_compressor=compressors[0], base_retriever=retriever)
+    elif compressors:
+        retriever = ContextualCompressionRetriever(
+            base_compressor=DocumentCompressorPipeline(transformers=compressors),
+            base_retriever=retriever,
+        )
+    if llm is None:
+        llm = Ollama(
+            model="llama3.2",
+            temperature=0,
+            callbacks=[MetricsCallbackHandler("llama3.2")],
+            cache=get_llm_cache("llama3.2"),
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
     qa = RetrievalQA.from_chain_type(llm=llm, retriever=retriever)
     return qa
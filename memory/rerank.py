@@ -0,0 +1,72 @@
+import os
+
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+from telemetry import span
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+
+_models = {}
+
+
+def load_cross_encoder(model_name=RERANK_MODEL):
+    """Load a sentence-transformers CrossEncoder once per process"""
+    if model_name not in _models:
+        from sentence_transformers import CrossEncoder
+        _models[model_name] = CrossEncoder(model_name)
+    return _models[model_name]
+
+
+def adaptive_cutoff(scores, min_keep=1, max_keep=4, margin=3.0):
+    """Number of top scores to keep: those within margin of the best, bounded"""
+    if not scores:
+        return 0
+    ranked = sorted(scores, reverse=True)
+    best = ranked[0]
+    keep = sum(1 for score in ranked if score >= best - margin)
+    return max(min(keep, max_keep, len(ranked)), min(min_keep, len(ranked)))
+
+
+class AdaptiveCrossEncoderReranker(BaseDocumentCompressor):
+    """Rescore a FAISS candidate pool with a cross-encoder and keep the best few.
+
+    Candidates are scored in batches in retrieval order. Once a full batch
+    scores well below the best seen so far, the remaining (lower-ranked by
+    FAISS) candidates are skipped, so easy queries only pay for one batch.
+    """
+
+    model_name: str = RERANK_MODEL
+    batch_size: int = 8
+    min_keep: int = 1
+    max_keep: int = 4
+    margin: float = 3.0
+    model: object = None
+
+    def _score(self, query, documents):
+        model = self.model or load_cross_encoder(self.model_name)
+        pairs = [(query, doc.page_content) for doc in documents]
+        return [float(score) for score in model.predict(pairs, batch_size=self.batch_size)]
+
+    def compress_documents(self, documents, query, callbacks=None):
+        with span("rerank"):
+            return self._rerank(list(documents), query)
+
+    def _rerank(self, documents, query):
+        scored = []
+        best = None
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            scores = self._score(query, batch)
+            scored.extend(zip(batch, scores))
+            batch_best = max(scores)
+            if best is not None and batch_best < best - self.margin:
+                break
+            best = batch_best if best is None else max(best, batch_best)
+
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        keep = adaptive_cutoff([score for _, score in scored], self.min_keep, self.max_keep, self.margin)
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": score})
+            for doc, score in scored[:keep]
+        ]
@@ -0,0 +1,215 @@
+"""
+Structured indexes over loader record metadata, exposed as agent tools.
+
+Questions like "what is my next meeting?" or "emails from Alice" have exact
+answers in the loaders' structured fields (event start/end, sender,
+subject, page title). These tools answer them in milliseconds from memory
+without embedding, vector search or a generation over fuzzy-matched text.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from langchain.tools import Tool
+
+from memory.lexical import tokenize
+from memory.time_index import parse_time_range
+from telemetry import span
+
+MAX_RESULTS = 5
+
+_FIELD = re.compile(r"\b(from|subject|title):\s*(\"[^\"]+\"|\S+)", re.IGNORECASE)
+
+
+def _format_time(timestamp):
+    if timestamp is None:
+        return "unknown time"
+    return datetime.fromtimestamp(timestamp).strftime("%a %d %b %Y %H:%M")
+
+
+def _matches(value, needle):
+    return needle.lower() in (value or "").lower()
+
+
+def format_events(events):
+    lines = []
+    for event in events:
+        line = f"- {event.get('title', 'No title')}: {_format_time(event.get('timestamp'))}"
+        if event.get("end_timestamp"):
+            line += f" until {_format_time(event['end_timestamp'])}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_emails(emails):
+    return "\n".join(
+        f"- {_format_time(e.get('timestamp'))} from {e.get('sender')}: {e.get('subject')}" for e in emails
+    )
+
+
+def format_pages(pages):
+    return "\n".join(f"- {p.get('title')} (edited {_format_time(p.get('timestamp'))})" for p in pages)
+
+
+def _parse_fields(query):
+    """Split "from:alice subject:budget rest" into ({"from": "alice", ...}, "rest")"""
+    fields = {}
+    for name, value in _FIELD.findall(query):
+        fields[name.lower()] = value.strip('"')
+    return fields, _FIELD.sub("", query).strip()
+
+
+class StructuredIndex:
+    """Calendar events sorted by start time, plus email and Notion page metadata.
+
+    Segments from the ingest worker are added on the follower thread while
+    the agent reads, so every access to the lists goes through _lock.
+    """
+
+    def __init__(self, records=()):
+        self._lock = threading.Lock()
+        self._event_starts = []
+        self._events = []
+        self.emails = []
+        self.pages = []
+        # (source, id) -> the metadata stored for it, so a new version can replace it
+        self._entries = {}
+        self.add_records(records)
+
+    def add_records(self, records):
+        """Add new records and replace those whose metadata "version" changed"""
+        with self._lock:
+            for record in records:
+                self._add(record)
+
+    def _add(self, record):
+        # Caller holds _lock
+        metadata = record.get("metadata", {})
+        key = (metadata.get("source"), metadata.get("id"))
+        stored = self._entries.get(key)
+        if stored is not None:
+            if metadata.get("version") is None or stored.get("version") == metadata["version"]:
+                return
+            self._remove(stored)
+        self._entries[key] = metadata
+        source = metadata.get("source")
+        if source == "calendar" and metadata.get("timestamp") is not None:
+            i = bisect_left(self._event_starts, metadata["timestamp"])
+            self._event_starts.insert(i, metadata["timestamp"])
+            self._events.insert(i, metadata)
+        elif source == "gmail":
+            insort(self.emails, metadata, key=lambda m: -(m.get("timestamp") or 0))
+        elif source == "notion":
+            insort(self.pages, metadata, key=lambda m: -(m.get("timestamp") or 0))
+
+    def _remove(self, metadata):
+        for items in (self._events, self.emails, self.pages):
+            for i, item in enumerate(items):
+                if item is metadata:
+                    del items[i]
+                    if items is self._events:
+                        del self._event_starts[i]
+                    return
+
+    def events_between(self, start, end):
+        """Events starting in [start, end), in time order"""
+        with self._lock:
+            return self._events[bisect_left(self._event_starts, start):bisect_left(self._event_starts, end)]
+
+    def next_events(self, now=None, limit=MAX_RESULTS):
+        with self._lock:
+            i = bisect_left(self._event_starts, now if now is not None else time.time())
+            return self._events[i:i + limit]
+
+    def find_emails(self, sender=None, subject=None, text=None, limit=MAX_RESULTS):
+        """Most recent emails matching sender/subject substrings (text matches either)"""
+        found = []
+        with self._lock:
+            emails = list(self.emails)
+        for email in emails:
+            if sender and not _matches(email.get("sender"), sender):
+                continue
+            if subject and not _matches(email.get("subject"), subject):
+                continue
+            if text and not (_matches(email.get("sender"), text) or _matches(email.get("subject"), text)):
+                continue
+            found.append(email)
+            if len(found) >= limit:
+                break
+        return found
+
+    def find_pages(self, title=None, limit=MAX_RESULTS):
+        """Most recently edited Notion pages whose title contains title"""
+        with self._lock:
+            pages = list(self.pages)
+        return [page for page in pages if not title or _matches(page.get("title"), title)][:limit]
+
+    def match_terms(self, items, fields, query, limit=MAX_RESULTS):
+        """Items sharing words with a free-form question in any of fields, most shared first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            items = list(items)
+        scored = []
+        for rank, item in enumerate(items):
+            words = set(tokenize(" ".join(str(item.get(field) or "") for field in fields)))
+            shared = len(terms & words)
+            if shared:
+                # items are newest first, so rank breaks ties by recency
+                scored.append((-shared, rank, item))
+        return [item for _, _, item in sorted(scored, key=lambda entry: entry[:2])[:limit]]
+
+    # -- tool entry points: one free-text argument, plain-text answer -----
+
+    def lookup_calendar(self, query):
+        with span("structured_lookup", source="calendar"):
+            time_range = parse_time_range(query)
+            events = self.events_between(*time_range) if time_range else self.next_events()
+            if not events:
+                return "No calendar events found for that time."
+            return format_events(events[:MAX_RESULTS * 4])
+
+    def lookup_email(self, query):
+        with span("structured_lookup", source="gmail"):
+            fields, rest = _parse_fields(query)
+            emails = self.find_emails(fields.get("from"), fields.get("subject"), rest or None)
+            if not emails:
+                return "No matching emails found."
+            return format_emails(emails)
+
+    def lookup_notion(self, query):
+        with span("structured_lookup", source="notion"):
+            fields, rest = _parse_fields(query)
+            pages = self.find_pages(fields.get("title") or rest or None)
+            if not pages:
+                return "No matching Notion pages found."
+            return format_pages(pages)
+
+
+def build_structured_tools(index):
+    """Agent tools answering structured questions directly from a StructuredIndex"""
+    return [
+        Tool(
+            name="Calendar_Lookup",
+            func=index.lookup_calendar,
+            description=(
+                "Use this first for questions about meetings or events at a time. Input is a time phrase "
+                "such as 'tomorrow', 'next week', 'Friday' or 'next meeting'; returns exact event titles and times."
+            ),
+        ),
+        Tool(
+            name="Email_Lookup",
+            func=index.lookup_email,
+            description=(
+                "Use this first to find emails by sender or subject. Input like 'from:alice subject:budget' "
+                "or a name or subject word; returns the most recent matching emails."
+            ),
+        ),
+        Tool(
+            name="Notion_Lookup",
+            func=index.lookup_notion,
+            description="Use this first to find Notion pages by title. Input is part of the page title.",
+        ),
+    ]
@@ -0,0 +1,339 @@
+"""
+Hierarchical summaries for broad questions such as "what happened this month".
+
+Stuffing a month of emails and events into RetrievalQA either drops most of
+them or overflows the context window. SummaryIndex keeps per-thread,
+per-day and per-week summaries instead: new records, and records whose
+metadata "version" changed, mark their thread, day and week dirty, a background worker re-summarizes only those (weeks from
+their day summaries), and the results are saved next to the raw index.
+SummaryRouter answers broad questions with one short LLM call over the few
+summaries covering the period and sends everything else to the QA chain.
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from memory.context import count_tokens, truncate_to_tokens
+from memory.llm_cache import get_llm_cache
+from memory.time_index import RECENT_WINDOW_DAYS, parse_time_range
+from memory.warmup import OLLAMA_KEEP_ALIVE, OLLAMA_MODEL
+from telemetry import MetricsCallbackHandler, increment, span
+
+SUMMARY_CONTEXT_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", "1000"))
+MEMBER_TOKENS = 60
+SUMMARY_TOKENS = 150
+
+LEVELS = ("thread", "day", "week")
+
+GROUP_PROMPT = (
+    "Summarize the following items from the user's email, calendar and notes for {label}. "
+    "Keep names, dates, decisions and open tasks. Reply with the summary only, in at most "
+    "{max_words} words.\n\n{items}\n\nSummary:"
+)
+
+ANSWER_PROMPT = (
+    "Answer the user's question using these summaries of their email, calendar and notes. "
+    "If they do not contain the answer, say so.\n\n{summaries}\n\nQuestion: {question}\nAnswer:"
+)
+
+_BROAD = re.compile(
+    r"\b(what happened|what have i been|what did i do|summar(?:y|ize|ise)|overview|recap|"
+    r"catch me up|highlights|how was my|how did my)\b",
+    re.IGNORECASE,
+)
+_EMAIL = re.compile(r"\b(emails?|inbox|threads?|mail)\b", re.IGNORECASE)
+
+
+def is_broad_question(query):
+    """Whether query asks about a whole period rather than a specific item"""
+    return bool(_BROAD.search(query))
+
+
+def _day_start(timestamp):
+    return datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def group_keys(record):
+    """The (level, key) groups a loader record belongs to"""
+    metadata = record.get("metadata", {})
+    keys = []
+    if metadata.get("thread_id"):
+        keys.append(("thread", f"{metadata.get('source')}:{metadata['thread_id']}"))
+    if metadata.get("timestamp") is not None:
+        day = _day_start(metadata["timestamp"])
+        week = day - timedelta(days=day.weekday())
+        keys.append(("day", day.strftime("%Y-%m-%d")))
+        keys.append(("week", week.strftime("%Y-%m-%d")))
+    return keys
+
+
+def _week_of(day):
+    start = datetime.strptime(day, "%Y-%m-%d")
+    return (start - timedelta(days=start.weekday())).strftime("%Y-%m-%d")
+
+
+def _version(member):
+    # Members saved before versions were tracked are [timestamp, text]
+    return member[2] if len(member) > 2 else None
+
+
+def _period(level, key, members):
+    """(start, end) epoch range a group covers"""
+    if level == "thread":
+        times = [member[0] for member in members.values() if member[0] is not None]
+        return (min(times), max(times) + 1) if times else (0, 0)
+    start = datetime.strptime(key, "%Y-%m-%d")
+    return start.timestamp(), (start + timedelta(days=7 if level == "week" else 1)).timestamp()
+
+
+def _by_time(member):
+    return member[0] if member[0] is not None else 0
+
+
+def _label(level, key):
+    if level == "thread":
+        return "one email thread"
+    if level == "day":
+        return datetime.strptime(key, "%Y-%m-%d").strftime("%A %d %B %Y")
+    return "the week of " + datetime.strptime(key, "%Y-%m-%d").strftime("%d %B %Y")
+
+
+def llm_group_summarizer(llm, max_words=80):
+    """Summarize function that asks llm for a summary of a group's items"""
+    def summarize(label, items):
+        prompt = GROUP_PROMPT.format(label=label, max_words=max_words, items="\n".join(f"- {item}" for item in items))
+        return str(llm.invoke(prompt)).strip()
+    return summarize
+
+
+def _ollama(model):
+    from langchain_community.llms import Ollama
+    return Ollama(
+        model=model,
+        temperature=0,
+        callbacks=[MetricsCallbackHandler(model)],
+        cache=get_llm_cache(model),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+
+def ollama_group_summarizer(model=OLLAMA_MODEL):
+    """llm_group_summarizer over the shared cached, kept-alive Ollama model"""
+    return llm_group_summarizer(_ollama(model))
+
+
+def extractive_group_summary(label, items):
+    """Fallback that lists the first line of each item, when no LLM is available"""
+    return f"{label}: " + "; ".join(item.splitlines()[0] for item in items if item)
+
+
+class SummaryIndex:
+    """Thread, day and week summaries, rebuilt incrementally on a background worker"""
+
+    def __init__(self, path=None, summarize=None, max_tokens=SUMMARY_TOKENS):
+        self.path = path
+        self.summarize = summarize or extractive_group_summary
+        self.max_tokens = max_tokens
+        # (level, key) -> {record id: [timestamp, short text, version]}; weeks hold their day keys
+        self._members = {}
+        # record id -> day key, so a new version that moves a record leaves its old day
+        self._day_of = {}
+        self._summaries = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+        self._pending = None
+
+    @classmethod
+    def open(cls, path, summarize=None):
+        """Load saved summaries from path, or start empty and save there"""
+        index = cls(path, summarize)
+        if os.path.exists(path):
+            with span("index_load", mode="summaries"), open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            for entry in state["groups"]:
+                group = (entry["level"], entry["key"])
+                index._members[group] = entry["members"]
+                if entry["level"] == "day":
+                    index._day_of.update(dict.fromkeys(entry["members"], entry["key"]))
+                if entry.get("summary") is not None:
+                    index._summaries[group] = entry["summary"]
+            index._dirty = {group for group in index._members if group not in index._summaries}
+            if index._dirty:
+                index._pending = index._executor.submit(index._refresh)
+        return index
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            state = json.dumps({"groups": [
+                {"level": level, "key": key, "members": members, "summary": self._summaries.get((level, key))}
+                for (level, key), members in self._members.items()
+            ]})
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(state)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def add_records(self, records):
+        """Assign new or changed records to their groups and re-summarize those groups in the background"""
+        with self._lock:
+            for record in records:
+                metadata = record.get("metadata", {})
+                record_id = f"{metadata.get('source')}:{metadata.get('id')}"
+                version = metadata.get("version")
+                keys = dict(group_keys(record))
+                old_day = self._day_of.get(record_id)
+                if version is not None and old_day is not None and old_day != keys.get("day"):
+                    stale = self._members[("day", old_day)].get(record_id)
+                    if stale is not None and _version(stale) != version:
+                        self._drop_from_day(record_id, old_day)
+                for level in ("thread", "day"):
+                    members = self._members.setdefault((level, keys[level]), {}) if level in keys else None
+                    if members is None:
+                        continue
+                    member = members.get(record_id)
+                    if member is not None and (version is None or _version(member) == version):
+                        continue
+                    members[record_id] = [
+                        metadata.get("timestamp"), truncate_to_tokens(record.get("text", ""), MEMBER_TOKENS), version
+                    ]
+                    self._dirty.add((level, keys[level]))
+                    if level == "day":
+                        self._day_of[record_id] = keys["day"]
+                        self._members.setdefault(("week", keys["week"]), {})[keys["day"]] = None
+                        self._dirty.add(("week", keys["week"]))
+            dirty = bool(self._dirty)
+        if dirty:
+            self._pending = self._executor.submit(self._refresh)
+        return self._pending
+
+    def _drop_from_day(self, record_id, day):
+        # Caller holds _lock; an emptied day leaves its week as well
+        group, week = ("day", day), ("week", _week_of(day))
+        members = self._members[group]
+        del members[record_id]
+        del self._day_of[record_id]
+        if members:
+            self._dirty.add(group)
+        else:
+            del self._members[group]
+            self._summaries.pop(group, None)
+            self._dirty.discard(group)
+            self._members.get(week, {}).pop(day, None)
+        if self._members.get(week):
+            self._dirty.add(week)
+        elif week in self._members:
+            del self._members[week]
+            self._summaries.pop(week, None)
+            self._dirty.discard(week)
+
+    def _summarize(self, level, key, items):
+        with span("summarize", level=level):
+            try:
+                summary = self.summarize(_label(level, key), items)
+            except Exception as e:
+                print(f"WARNING: Summary of {level} {key} failed ({e}), listing items instead")
+                summary = extractive_group_summary(_label(level, key), items)
+        increment("summaries_built", level=level)
+        return truncate_to_tokens(summary, self.max_tokens)
+
+    def _refresh(self):
+        # Weeks are summarized from their days, so days go first
+        for level in LEVELS:
+            with self._lock:
+                groups = sorted(group for group in self._dirty if group[0] == level)
+            for group in groups:
+                with self._lock:
+                    self._dirty.discard(group)
+                    if group not in self._members:
+                        continue
+                    if level == "week":
+                        items = [self._summaries[("day", day)] for day in sorted(self._members[group])
+                                 if ("day", day) in self._summaries]
+                    else:
+                        items = [member[1] for member in sorted(self._members[group].values(), key=_by_time)]
+                summary = self._summarize(level, group[1], items)
+                with self._lock:
+                    if group in self._members:
+                        self._summaries[group] = summary
+        if self.path:
+            self.save()
+
+    def wait(self):
+        """Block until queued summarization has finished"""
+        if self._pending is not None:
+            self._pending.result()
+
+    def summary(self, level, key):
+        return self._summaries.get((level, key))
+
+    def summaries_between(self, start, end, level=None, max_tokens=SUMMARY_CONTEXT_TOKENS):
+        """Summaries covering [start, end), newest first, within max_tokens.
+
+        Unless a level is given, week summaries are used for ranges of a week
+        or more and day summaries for shorter ones, so a month costs about
+        four summaries.
+        """
+        level = level or ("week" if end - start >= 7 * 86400 else "day")
+        with self._lock:
+            found = []
+            for (group_level, key), summary in self._summaries.items():
+                if group_level != level:
+                    continue
+                period_start, period_end = _period(level, key, self._members[(group_level, key)])
+                if period_start < end and period_end > start:
+                    found.append((period_start, _label(level, key), summary))
+        selected, used = [], 0
+        for _, label, summary in sorted(found, reverse=True):
+            text = f"{label}: {summary}"
+            cost = count_tokens(text)
+            if selected and used + cost > max_tokens:
+                break
+            selected.append(text)
+            used += cost
+        return selected
+
+
+class SummaryRouter:
+    """Answer broad questions from summaries and pass the rest to the QA chain"""
+
+    def __init__(self, qa_chain, summary_index, llm=None):
+        self.qa_chain = qa_chain
+        self.summary_index = summary_index
+        self.llm = llm
+        # The multi-source tool searches documents through the chain's retriever
+        self.retriever = getattr(qa_chain, "retriever", None)
+
+    def route(self, query):
+        """Summaries to answer query from, or None if it should go to the QA chain"""
+        if not is_broad_question(query):
+            return None
+        time_range = parse_time_range(query)
+        if time_range is None:
+            end = datetime.now().timestamp()
+            time_range = (end - RECENT_WINDOW_DAYS * 86400, end)
+        # Email questions are answered thread by thread rather than day by day
+        level = "thread" if _EMAIL.search(query) else None
+        return self.summary_index.summaries_between(*time_range, level=level) or None
+
+    def invoke(self, query, *args, **kwargs):
+        if isinstance(query, dict):
+            query = query.get("query") or query.get("input", "")
+        summaries = self.route(query)
+        if summaries is None:
+            return self.qa_chain.invoke(query, *args, **kwargs)
+        if self.llm is None:
+            self.llm = _ollama(OLLAMA_MODEL)
+        with span("summary_answer"):
+            prompt = ANSWER_PROMPT.format(summaries="\n\n".join(summaries), question=query)
+            answer = str(self.llm.invoke(prompt)).strip()
+        increment("summary_routed_questions")
+        return {"query": query, "result": answer}
@@ -0,0 +1,463 @@
+"""
+Hot/cold tiering for the vector index.
+
+Most questions are about the last few weeks, so only documents newer than
+HOT_DAYS stay in the in-memory IndexStore (the hot tier). Older documents
+are moved, vectors included, into a read-only cold tier whose FAISS index
+is memory-mapped from disk, so the archive costs page cache rather than
+resident memory. The cold tier is searched only when the hot tier returns
+too few documents, the question asks about dates before the cutoff, or
+everyone it names only appears in archived documents.
+
+Cold layout under its root:
+
+    MANIFEST                {"segments": [names]} in row order, replaced atomically
+    docstore.sqlite         documents of every segment, appended in place
+    s000001/                index.faiss and ids.bin of one append
+
+An age-out only writes the documents it moves: their rows go into the
+shared docstore and their vectors into a new segment, which is then
+published in MANIFEST. Existing segments are never rewritten, just mapped,
+and searched together as one index. To keep the segment count logarithmic,
+a new segment is merged with the ones before it while they are no larger
+than it, up to COLD_SEGMENT_ROWS rows. Docstore rows that no published
+segment references (an append interrupted by a crash) are dropped on open.
+A crash between archiving and deleting from the hot tier only leaves a
+document in both tiers; results are merged by document id. Aging runs at
+startup and then every HOT_TIER_AGE_SECONDS.
+
+Archived documents carry their metadata "version" like the hot tier. When a
+newer version of one is indexed in the hot tier, or ages out, the archived
+row is deleted from the docstore. Its vector stays in its segment as a dead
+row that searches skip and the next merge over it drops.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+
+import faiss
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from memory.docstore import CompactDocstore, CompactIdMap
+from memory.time_index import TimeAwareRetriever, build_time_index, parse_time_range
+from memory.vectorstore import document_ids, to_document
+from telemetry import increment, span
+
+HOT_DAYS = float(os.getenv("HOT_TIER_DAYS", "30"))
+AGE_INTERVAL = float(os.getenv("HOT_TIER_AGE_SECONDS", "3600"))
+# Segments are not merged past this many rows, so a merge never loads more
+COLD_SEGMENT_ROWS = int(os.getenv("COLD_SEGMENT_ROWS", "100000"))
+
+# Newer FAISS builds can map flat codes directly; older ones only map inverted lists
+_MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+class SegmentedIndex:
+    """Memory-mapped segment indexes searched as one index with successive row ids.
+
+    dead holds the row ids of superseded documents, which search() skips.
+    """
+
+    def __init__(self, segments, dead=()):
+        self.segments = list(segments)
+        self.d = self.segments[0].d
+        self.metric_type = self.segments[0].metric_type
+        self.offsets = np.cumsum([0] + [segment.ntotal for segment in self.segments])
+        self.ntotal = int(self.offsets[-1])
+        self.dead = np.asarray(dead, dtype=np.int64)
+        self._shards = faiss.IndexShards(self.d, False, True)
+        for segment in self.segments:
+            self._shards.add_shard(segment)
+
+    def search(self, x, k):
+        if not len(self.dead):
+            return self._shards.search(x, k)
+        # At most len(dead) of the hits can be dead, so this many more always leaves k live ones
+        scores, ids = self._shards.search(x, k + len(self.dead))
+        live = ~np.isin(ids, self.dead)
+        kept_scores = np.full((len(ids), k), np.inf, dtype=np.float32)
+        kept_ids = np.full((len(ids), k), -1, dtype=np.int64)
+        for row in range(len(ids)):
+            kept = np.flatnonzero(live[row])[:k]
+            kept_scores[row, :len(kept)] = scores[row, kept]
+            kept_ids[row, :len(kept)] = ids[row, kept]
+        return kept_scores, kept_ids
+
+    def reconstruct_batch(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.empty((len(ids), self.d), dtype=np.float32)
+        owner = np.searchsorted(self.offsets, ids, side="right") - 1
+        for i in np.unique(owner):
+            rows = owner == i
+            vectors[rows] = self.segments[i].reconstruct_batch(ids[rows] - self.offsets[i])
+        return vectors
+
+
+def _write_json(path, value):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+class ColdTier:
+    """Read-only, memory-mapped archive index that grows by appending segments"""
+
+    def __init__(self, root, embeddings):
+        self.root = root
+        self.embeddings = embeddings
+        self.vectorstore = None
+        self.segments = []
+        self.lock = threading.RLock()
+        self._retrievers = {}
+        # name -> (mapped index, rowids bytes); segments never change once written
+        self._mapped = {}
+        os.makedirs(root, exist_ok=True)
+        self._migrate()
+        self.docstore = CompactDocstore(os.path.join(root, "docstore.sqlite"))
+
+    @classmethod
+    def open(cls, root, embeddings):
+        cold = cls(root, embeddings)
+        segments = cold._read_manifest()
+        if segments:
+            cold._load(segments)
+        # Leftovers of an append or merge that never got published
+        rowids = array("q", b"".join(cold._segment(name)[1] for name in segments))
+        cold.docstore.delete_after(max(rowids, default=0))
+        for entry in os.listdir(root):
+            if entry.startswith(".tmp-") or (entry.startswith("s") and entry[1:].isdigit() and entry not in segments):
+                shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+        return cold
+
+    def _migrate(self):
+        # Archives written before segments were one version named by CURRENT
+        pointer = os.path.join(self.root, "CURRENT")
+        if not os.path.exists(pointer) or os.path.exists(os.path.join(self.root, "MANIFEST")):
+            return
+        with open(pointer) as f:
+            version = os.path.join(self.root, f.read().strip())
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(os.path.join(version, "docstore.sqlite" + suffix)):
+                os.replace(os.path.join(version, "docstore.sqlite" + suffix),
+                           os.path.join(self.root, "docstore.sqlite" + suffix))
+        os.rename(version, os.path.join(self.root, "s000001"))
+        _write_json(os.path.join(self.root, "MANIFEST"), {"segments": ["s000001"]})
+        os.remove(pointer)
+        for entry in os.listdir(self.root):
+            if entry.startswith("v") and entry[1:].isdigit():
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+    def _read_manifest(self):
+        path = os.path.join(self.root, "MANIFEST")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)["segments"]
+
+    def _segment(self, name):
+        if name not in self._mapped:
+            path = os.path.join(self.root, name)
+            with open(os.path.join(path, "ids.bin"), "rb") as f:
+                rowids = f.read()
+            self._mapped[name] = (faiss.read_index(os.path.join(path, "index.faiss"), _MMAP_FLAG), rowids)
+        return self._mapped[name]
+
+    def _load(self, segments):
+        mapped = [self._segment(name) for name in segments]
+        rowids = b"".join(rowids for _, rowids in mapped)
+        id_map = CompactIdMap.from_bytes(self.docstore, rowids)
+        # Rows whose document was superseded by a newer version
+        dead = np.flatnonzero(~np.isin(np.frombuffer(rowids, dtype=np.int64), self.docstore.rowids()))
+        self.vectorstore = FAISS(
+            self.embeddings, SegmentedIndex((index for index, _ in mapped), dead), self.docstore, id_map
+        )
+        self.segments = list(segments)
+        self._mapped = {name: self._mapped[name] for name in segments}
+        self._retrievers = {}
+
+    def _publish(self, segments):
+        _write_json(os.path.join(self.root, "MANIFEST"), {"segments": segments})
+        self._load(segments)
+
+    def __len__(self):
+        if self.vectorstore is None:
+            return 0
+        return self.vectorstore.index.ntotal - len(self.vectorstore.index.dead)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.docstore
+
+    def is_current(self, doc_id, metadata):
+        """True if doc_id is archived and metadata carries no other "version" than the archived copy"""
+        if doc_id not in self:
+            return False
+        version = metadata.get("version")
+        return version is None or self.docstore.search(doc_id).metadata.get("version") == version
+
+    def delete(self, ids):
+        """Drop archived copies superseded by a newer version elsewhere; returns the ids dropped"""
+        with self.lock:
+            ids = [doc_id for doc_id in ids if doc_id in self]
+            if not ids:
+                return []
+            self.docstore.delete(ids)
+            # Their vectors stay in the segments as dead rows until a merge drops them
+            self._load(self.segments)
+        increment("cold_docs_superseded", len(ids))
+        return ids
+
+    def _next_name(self):
+        numbers = [int(name[1:]) for name in os.listdir(self.root) if name.startswith("s") and name[1:].isdigit()]
+        return f"s{max(numbers, default=0) + 1:06d}"
+
+    def _write_segment(self, index, rowids):
+        name = self._next_name()
+        staging = os.path.join(self.root, f".tmp-{name}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        faiss.write_index(index, os.path.join(staging, "index.faiss"))
+        with open(os.path.join(staging, "ids.bin"), "wb") as f:
+            f.write(rowids)
+        os.rename(staging, os.path.join(self.root, name))
+        return name
+
+    def append(self, ids, documents, vectors):
+        """Archive documents with their vectors as a new segment.
+
+        An archived copy with another metadata "version" is replaced. Returns
+        the ids the archive now holds at the given versions.
+        """
+        with self.lock:
+            keep = [
+                i for i, (doc_id, doc) in enumerate(zip(ids, documents)) if not self.is_current(doc_id, doc.metadata)
+            ]
+            if not keep:
+                return list(ids)
+            with span("cold_append"):
+                # A replaced row dies with its docstore row; if this append never
+                # publishes, the hot tier still holds the new version
+                self.docstore.delete([ids[i] for i in keep if ids[i] in self])
+                # Only the moved rows are written: new docstore rows and a segment of their vectors
+                id_map = CompactIdMap(self.docstore)
+                writer = FAISS(self.embeddings, faiss.IndexFlatL2(len(vectors[0])), self.docstore, id_map)
+                writer.add_embeddings(
+                    [(documents[i].page_content, list(vectors[i])) for i in keep],
+                    metadatas=[documents[i].metadata for i in keep],
+                    ids=[ids[i] for i in keep],
+                )
+                name = self._write_segment(writer.index, id_map.rowids_bytes())
+                segments, replaced = self._merge(self.segments + [name])
+                self._publish(segments)
+            for name in replaced:
+                # Readers of the previous view keep their mapped files; only the names go
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            return list(ids)
+
+    def _merge(self, segments):
+        """Merge the newest segment into the ones before it while they are no larger than it.
+
+        Like a binary counter, this keeps the number of segments logarithmic
+        in the archive size, and no merge exceeds COLD_SEGMENT_ROWS rows, so
+        it never reads more than that many vectors into memory. Returns the
+        new segment list and the names it replaced.
+        """
+        sizes = [self._segment(name)[0].ntotal for name in segments]
+        run = 1
+        while run < len(segments):
+            tail = sum(sizes[-run:])
+            previous = sizes[-run - 1]
+            if previous > tail or previous + tail > COLD_SEGMENT_ROWS:
+                break
+            run += 1
+        if run == 1:
+            return segments, []
+        with span("cold_merge"):
+            parts = [self._segment(name) for name in segments[-run:]]
+            index = faiss.IndexFlatL2(parts[0][0].d)
+            alive = self.docstore.rowids()
+            kept_rowids = []
+            for part, rowids in parts:
+                # Dead rows of superseded documents are not carried over
+                rowids = np.frombuffer(rowids, dtype=np.int64)
+                live = np.isin(rowids, alive)
+                index.add(part.reconstruct_n(0, part.ntotal)[live])
+                kept_rowids.append(rowids[live].tobytes())
+            name = self._write_segment(index, b"".join(kept_rowids))
+        increment("cold_segments_merged", run)
+        return segments[:-run] + [name], segments[-run:]
+
+    def retriever(self, k=4, entity_index=None):
+        """Time- and entity-aware retriever over the current cold segments, or None if empty"""
+        with self.lock:
+            vectorstore = self.vectorstore
+            if vectorstore is None:
+                return None
+            # Built once per published view; the time index is the expensive part
+            key = (k, id(entity_index))
+            if key not in self._retrievers:
+                self._retrievers[key] = TimeAwareRetriever(
+                    base_retriever=vectorstore.as_retriever(search_kwargs={"k": k}),
+                    vectorstore=vectorstore,
+                    time_index=build_time_index(vectorstore),
+                    entity_index=entity_index,
+                    k=k,
+                )
+            return self._retrievers[key]
+
+    def close(self):
+        self.docstore.close()
+
+
+class TieredStore:
+    """An IndexStore for recent documents plus a ColdTier for everything older than hot_days"""
+
+    def __init__(self, hot, cold, hot_days=HOT_DAYS):
+        self.hot = hot
+        self.cold = cold
+        self.hot_days = hot_days
+        self._ager = None
+        self._stop = threading.Event()
+
+    @property
+    def cutoff(self):
+        return time.time() - self.hot_days * 86400
+
+    def __len__(self):
+        return len(self.hot) + len(self.cold)
+
+    def add_records(self, records, vectors=None):
+        """Index records in the hot tier, skipping old ones that are already archived at their version.
+
+        A record whose archived copy it supersedes drops that copy, so the two
+        tiers never answer with different versions of one document.
+        """
+        cutoff = self.cutoff
+        records = list(records)
+        documents = [to_document(record) for record in records]
+        rows, archived = [], []
+        for row, (doc_id, doc) in enumerate(zip(document_ids(documents), documents)):
+            if doc_id in self.cold:
+                if (doc.metadata.get("timestamp") or cutoff) < cutoff and self.cold.is_current(doc_id, doc.metadata):
+                    continue
+                archived.append(doc_id)
+            rows.append(row)
+        added = self.hot.add_records(
+            [records[row] for row in rows], vectors=None if vectors is None else [vectors[row] for row in rows]
+        )
+        if archived:
+            added_ids = set(added)
+            self.cold.delete([doc_id for doc_id in archived if doc_id in added_ids])
+        return added
+
+    def age_out(self):
+        """Move hot documents older than the cutoff into the cold tier; returns how many moved"""
+        cutoff = self.cutoff
+        with self.hot.lock:
+            vectorstore = self.hot.vectorstore
+            if vectorstore is None:
+                return 0
+            id_map = vectorstore.index_to_docstore_id
+            positions = [
+                position for timestamp, position in id_map.timestamp_entries()
+                if timestamp < cutoff and position not in vectorstore.tombstones
+            ]
+            if not positions:
+                return 0
+            ids = [id_map[position] for position in positions]
+            documents = [vectorstore.docstore.search(doc_id) for doc_id in ids]
+            vectors = vectorstore.index.reconstruct_batch(positions)
+        with span("age_out"):
+            archived = set(self.cold.append(ids, documents, vectors))
+            with self.hot.lock:
+                # A newer version may have replaced a hot copy meanwhile; it stays,
+                # and the archived copy it supersedes goes
+                moved, superseded = [], []
+                for doc_id, doc in zip(ids, documents):
+                    if doc_id not in archived or doc_id not in self.hot:
+                        continue
+                    hot_version = self.hot.vectorstore.docstore.search(doc_id).metadata.get("version")
+                    (moved if hot_version == doc.metadata.get("version") else superseded).append(doc_id)
+                self.hot.delete(moved)
+            self.cold.delete(superseded)
+        increment("docs_aged_out", len(moved))
+        return len(moved)
+
+    def _age_periodically(self, interval):
+        while True:
+            try:
+                self.age_out()
+            except Exception as e:
+                print(f"WARNING: Could not move old documents to the archive: {e}")
+            if self._stop.wait(interval):
+                return
+
+    def start_aging(self, interval=AGE_INTERVAL):
+        """Age out now and then every interval seconds on a background thread, until close()"""
+        if self._ager is None or not self._ager.is_alive():
+            self._stop.clear()
+            self._ager = threading.Thread(
+                target=self._age_periodically, args=(interval,), name="index-ager", daemon=True
+            )
+            self._ager.start()
+        return self._ager
+
+    def close(self):
+        """Stop the aging thread, letting an age-out in progress finish"""
+        self._stop.set()
+        if self._ager is not None:
+            self._ager.join()
+
+
+def _doc_key(doc):
+    return f"{doc.metadata.get('source')}:{doc.metadata.get('id')}"
+
+
+class TieredRetriever(BaseRetriever):
+    """Hot-tier retrieval, falling back to the cold tier for sparse results, old dates or archived people"""
+
+    hot_retriever: BaseRetriever
+    store: object
+    k: int = 4
+    entity_index: object = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        docs = self.hot_retriever.invoke(query)
+        cutoff = self.store.cutoff
+        time_range = parse_time_range(query)
+        targets_old = time_range is not None and time_range[0] < cutoff
+        named = self.entity_index.doc_ids_for(query) if self.entity_index is not None else None
+        # The hot retriever found none of their documents and answered without them
+        named_only_cold = bool(named) and not any(doc_id in self.store.hot for doc_id in named)
+        if not targets_old and not named_only_cold and len(docs) >= self.k:
+            return docs
+        cold = self.store.cold.retriever(self.k, self.entity_index)
+        if cold is None:
+            return docs
+        with span("retrieval", tier="cold"):
+            cold_docs = cold.invoke(query)
+        increment("cold_tier_searches")
+        if targets_old and time_range[1] <= cutoff:
+            # Entirely before the cutoff: hot results can only be off-topic
+            return cold_docs or docs
+        if named_only_cold:
+            # The archived documents of the people named lead, then the rest by tier
+            first = [doc for doc in cold_docs if _doc_key(doc) in named]
+            if first:
+                merged, seen = [], set()
+                for doc in first + docs + cold_docs:
+                    if _doc_key(doc) not in seen:
+                        seen.add(_doc_key(doc))
+                        merged.append(doc)
+                return merged[:max(self.k, len(docs))]
+        seen = {_doc_key(doc) for doc in docs}
+        extra = [doc for doc in cold_docs if _doc_key(doc) not in seen]
+        if not targets_old:
+            extra = extra[:max(self.k - len(docs), 0)]
+        return docs + extra
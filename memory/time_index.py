@@ -0,0 +1,172 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from memory.vectorstore import PositionCache, boosted_search, narrow_positions, read_locked, search_positions
+from telemetry import span
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+RECENT_WINDOW_DAYS = 14
+
+_RELATIVE_SPAN = re.compile(r"\b(last|past|next|coming)\s+(\d+)\s+(day|week|month)s?\b")
+_NAMED_PERIOD = re.compile(r"\b(this|next|last|past)\s+(week|month)\b")
+_WEEKDAY = re.compile(r"\b(?:(last|next|this)\s+)?(" + "|".join(WEEKDAYS) + r")\b")
+
+
+def _midnight(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _span(start, end):
+    return start.timestamp(), end.timestamp()
+
+
+def parse_time_range(query, now=None):
+    """Extract a (start, end) epoch range from phrases like "Friday" or "last week".
+
+    Returns None when the query has no recognizable temporal expression.
+    """
+    now = now or datetime.now()
+    today = _midnight(now)
+    text = query.lower()
+
+    match = _RELATIVE_SPAN.search(text)
+    if match:
+        direction, amount, unit = match.group(1), int(match.group(2)), match.group(3)
+        days = amount * {"day": 1, "week": 7, "month": 30}[unit]
+        if direction in ("next", "coming"):
+            return _span(now, now + timedelta(days=days))
+        return _span(now - timedelta(days=days), now)
+
+    if "today" in text or "tonight" in text:
+        return _span(today, today + timedelta(days=1))
+    if "tomorrow" in text:
+        return _span(today + timedelta(days=1), today + timedelta(days=2))
+    if "yesterday" in text:
+        return _span(today - timedelta(days=1), today)
+
+    match = _NAMED_PERIOD.search(text)
+    if match:
+        which, unit = match.groups()
+        if unit == "week":
+            start = today - timedelta(days=today.weekday())
+            offset = {"this": 0, "next": 1}.get(which, -1)
+            start += timedelta(days=7 * offset)
+            return _span(start, start + timedelta(days=7))
+        start = today.replace(day=1)
+        if which == "next":
+            start = (start + timedelta(days=32)).replace(day=1)
+        elif which in ("last", "past"):
+            start = (start - timedelta(days=1)).replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return _span(start, end)
+
+    match = _WEEKDAY.search(text)
+    if match:
+        which, name = match.groups()
+        delta = WEEKDAYS.index(name) - today.weekday()
+        if which == "last":
+            delta = delta - 7 if delta >= 0 else delta
+        elif which == "next":
+            delta = delta + 7 if delta <= 0 else delta
+        elif delta < 0:
+            # A bare weekday refers to the upcoming one
+            delta += 7
+        day = today + timedelta(days=delta)
+        return _span(day, day + timedelta(days=1))
+
+    if re.search(r"\b(upcoming|coming up|soon|next meeting|next event)\b", text):
+        return _span(now, now + timedelta(days=RECENT_WINDOW_DAYS))
+    if re.search(r"\b(recent|recently|lately|latest)\b", text):
+        return _span(now - timedelta(days=RECENT_WINDOW_DAYS), now)
+    return None
+
+
+class TimeIndex:
+    """Sorted timestamp -> FAISS row index supporting range lookups by bisection"""
+
+    def __init__(self, entries=()):
+        pairs = sorted((timestamp, position) for timestamp, position in entries if timestamp is not None)
+        self._times = [timestamp for timestamp, _ in pairs]
+        self._positions = [position for _, position in pairs]
+
+    def __len__(self):
+        return len(self._times)
+
+    def add(self, timestamp, position):
+        if timestamp is None:
+            return
+        i = bisect_right(self._times, timestamp)
+        self._times.insert(i, timestamp)
+        self._positions.insert(i, position)
+
+    def range(self, start, end):
+        """Row positions with start <= timestamp < end, in time order"""
+        lo = bisect_left(self._times, start)
+        hi = bisect_left(self._times, end)
+        return self._positions[lo:hi]
+
+
+def build_time_index(vectorstore):
+    """Index every document in a FAISS store by its metadata timestamp"""
+    if hasattr(vectorstore.index_to_docstore_id, "timestamp_entries"):
+        return TimeIndex(vectorstore.index_to_docstore_id.timestamp_entries())
+    entries = []
+    for position, doc_id in vectorstore.index_to_docstore_id.items():
+        doc = vectorstore.docstore.search(doc_id)
+        if hasattr(doc, "metadata"):
+            entries.append((doc.metadata.get("timestamp"), position))
+    return TimeIndex(entries)
+
+
+class TimeAwareRetriever(BaseRetriever):
+    """Restrict vector search to the time slice and the people a query names"""
+
+    base_retriever: BaseRetriever
+    vectorstore: object
+    time_index: object
+    entity_index: object = None
+    k: int = 4
+    _index_key: tuple = PrivateAttr(default=None)
+    _entity_positions: object = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._index_key = self._current_key()
+        # A named entity resolves to the same documents query after query
+        self._entity_positions = PositionCache(self.vectorstore)
+
+    def _current_key(self):
+        # Appends grow the id map and compaction bumps the generation; either
+        # invalidates the positions stored in the time index
+        return getattr(self.vectorstore, "generation", 0), len(self.vectorstore.index_to_docstore_id)
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with span("retrieval"):
+            # Positions are only meaningful until the next compaction
+            with read_locked(self.vectorstore):
+                positions = None
+                time_range = parse_time_range(query)
+                if time_range is not None:
+                    key = self._current_key()
+                    if key != self._index_key:
+                        self.time_index = build_time_index(self.vectorstore)
+                        self._index_key = key
+                    positions = self.time_index.range(*time_range)
+                doc_ids, exact = self.entity_index.resolve(query) if self.entity_index is not None else (None, False)
+                boosted = None
+                if doc_ids and exact:
+                    # Nobody named in that time range: search the range itself
+                    positions = narrow_positions(positions, self._entity_positions.positions(doc_ids)) or positions
+                elif doc_ids:
+                    # A first name or an organization may not be about a person: rank, don't restrict
+                    boosted = self._entity_positions.positions(doc_ids)
+                    if positions is None and boosted:
+                        return [doc for doc, _ in boosted_search(self.vectorstore, query, boosted, self.k)]
+                if positions:
+                    results = search_positions(self.vectorstore, query, positions, self.k, boosted)
+                    if results:
+                        return [doc for doc, _ in results]
+            return self.base_retriever.invoke(query)
@@ -1,27 +1,438 @@
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
+from langchain_core.documents import Document
+from langchain_community.vectorstores.utils import DistanceStrategy
+import faiss
+import numpy as np
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 
-def build_vectorstore(data):
+from config import get_data_dir
+from memory.docstore import CompactDocstore, CompactIdMap
+from memory.embeddings import EMBEDDING_BACKEND, load_backend
+from telemetry import increment, span
+
+# How much better a document scores when it involves someone a question names
+# by first name or organization only (see EntityIndex.resolve)
+ENTITY_BOOST = float(os.getenv("ENTITY_BOOST", "0.3"))
+# Most recently indexed documents of a boosted entity that are scored exactly;
+# an organization can appear in thousands, and a boost only re-ranks
+ENTITY_BOOST_LIMIT = int(os.getenv("ENTITY_BOOST_LIMIT", "512"))
+POSITION_CACHE_SIZE = 256
+
+def to_document(item):
+    """Accept either a plain string or a loader record with text and metadata"""
+    if isinstance(item, str):
+        return Document(page_content=item)
+    return Document(page_content=item["text"], metadata=dict(item.get("metadata", {})))
+
+def document_ids(documents):
+    """Stable "source:id" docstore ids for records, unique within the batch"""
+    ids = []
+    seen = set()
+    for doc in documents:
+        source = doc.metadata.get("source")
+        record_id = doc.metadata.get("id")
+        doc_id = f"{source}:{record_id}" if source and record_id else str(uuid.uuid4())
+        if doc_id in seen:
+            doc_id = f"{doc_id}:{uuid.uuid4().hex[:8]}"
+        seen.add(doc_id)
+        ids.append(doc_id)
+    return ids
+
+def pending_documents(records, contains, stored_metadata):
+    """(doc_id, Document) pairs that need indexing, plus the indexed ids they replace.
+
+    A record is pending when its id is not indexed yet, or when it carries a
+    metadata "version" (such as a Gmail thread's historyId) that differs from
+    the indexed copy. Unchanged records are skipped without re-embedding.
+    """
+    documents = [to_document(record) for record in records]
+    pending, replaced = [], []
+    for doc_id, doc in zip(document_ids(documents), documents):
+        if not contains(doc_id):
+            pending.append((doc_id, doc))
+        elif doc.metadata.get("version") is not None and (
+            stored_metadata(doc_id).get("version") != doc.metadata["version"]
+        ):
+            pending.append((doc_id, doc))
+            replaced.append(doc_id)
+    return pending, replaced
+
+class ReadWriteLock:
+    """Any number of readers or one writer; a waiting writer holds off new readers.
+
+    Reads are reentrant per thread and the writing thread may also read, so a
+    search that runs another search, or a write that looks at the index,
+    cannot deadlock behind a waiting writer.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        depth = getattr(self._local, "depth", 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        if getattr(self._local, "depth", 0):
+            raise RuntimeError("Cannot write to the index while reading it")
+        with self._cond:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+def read_locked(vectorstore):
+    """Context holding vectorstore's read lock, for stores that have one"""
+    lock = getattr(vectorstore, "rwlock", None)
+    return lock.read() if lock is not None else nullcontext()
+
+
+class TombstoneFAISS(FAISS):
+    """FAISS store whose deletes mark rows dead instead of rewriting the index.
+
+    Deleted rows stay in the FAISS index as tombstones and are excluded inside
+    the search itself through an ID selector, so results are never short and
+    no over-fetching is needed. compact() physically drops them once enough
+    have accumulated. Requires a CompactIdMap as index_to_docstore_id.
+
+    Searches hold rwlock for reading and appends, deletes and compaction hold
+    it for writing, so no search sees the index and id map out of step or row
+    positions shift underneath it. Callers that turn positions into documents
+    themselves (time and entity slices) must hold read_locked() across both
+    steps. Side structures keyed by row position can subscribe() to be told
+    about every change while the write lock is held.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tombstones = set()
+        self.generation = 0
+        self.rwlock = ReadWriteLock()
+        self._search_params = None
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """Call listener.on_add(start, ids, metadatas), on_delete(positions) and on_compact() on changes"""
+        self._listeners.append(listener)
+
+    @property
+    def live_count(self):
+        return self.index.ntotal - len(self.tombstones)
+
+    @property
+    def tombstone_ratio(self):
+        return len(self.tombstones) / self.index.ntotal if self.index.ntotal else 0.0
+
+    def delete(self, ids=None, **kwargs):
+        """Tombstone documents by docstore id; their rows are dropped at compaction"""
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+        with self.rwlock.write():
+            positions = self.index_to_docstore_id.positions_of(ids)
+            self.docstore.delete(ids)
+            self.tombstones.update(positions)
+            self._search_params = None
+            for listener in self._listeners:
+                listener.on_delete(positions)
+        return True
+
+    def compact(self):
+        """Remove tombstoned rows from the index and id map, returning how many were dropped"""
+        with self.rwlock.write():
+            if not self.tombstones:
+                return 0
+            dead = sorted(self.tombstones)
+            self.index.remove_ids(np.asarray(dead, dtype=np.int64))
+            self.index_to_docstore_id.remove_positions(dead)
+            self.tombstones = set()
+            self._search_params = None
+            # Positions have shifted, so side indexes keyed by position must rebuild
+            self.generation += 1
+            for listener in self._listeners:
+                listener.on_compact()
+            return len(dead)
+
+    def _FAISS__add(self, texts, embeddings, metadatas=None, ids=None):
+        # add_texts, add_embeddings and aadd_texts all append through FAISS.__add;
+        # embedding happens before it, so only the append itself holds the lock
+        metadatas = list(metadatas) if metadatas is not None else None
+        with self.rwlock.write():
+            start = self.index.ntotal
+            added = super()._FAISS__add(texts, embeddings, metadatas=metadatas, ids=ids)
+            for listener in self._listeners:
+                listener.on_add(start, added, metadatas or [{} for _ in added])
+            return added
+
+    def _live_search_params(self):
+        if self._search_params is None:
+            dead = faiss.IDSelectorBatch(np.asarray(sorted(self.tombstones), dtype=np.int64))
+            live = faiss.IDSelectorNot(dead)
+            params = faiss.SearchParameters(sel=live)
+            # The SWIG objects do not own each other; keep them alive together
+            params.referenced_objects = [dead, live]
+            self._search_params = params
+        return self._search_params
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        with self.rwlock.read():
+            return self._search_live(embedding, k, filter, fetch_k, **kwargs)
+
+    def _search_live(self, embedding, k, filter, fetch_k, **kwargs):
+        if not self.tombstones:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        scores, indices = self.index.search(
+            vector, k if filter is None else fetch_k, params=self._live_search_params()
+        )
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        docs = []
+        for score, position in zip(scores[0], indices[0]):
+            if position == -1:
+                continue
+            doc = self.docstore.search(self.index_to_docstore_id[int(position)])
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, float(score)))
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            higher_is_better = self.distance_strategy in (
+                DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD
+            )
+            docs = [
+                (doc, score) for doc, score in docs
+                if (score >= score_threshold if higher_is_better else score <= score_threshold)
+            ]
+        return docs[:k]
+
+def create_faiss_store(embeddings, dimension, docstore_path=None):
+    """Empty flat-L2 FAISS store backed by a fresh CompactDocstore file"""
+    path = docstore_path or os.path.join(get_data_dir(), "docstore.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    docstore = CompactDocstore(path)
+    return TombstoneFAISS(embeddings, faiss.IndexFlatL2(dimension), docstore, CompactIdMap(docstore))
+
+def load_embeddings(backend=None):
+    """Load the MiniLM embedder (EMBEDDING_BACKEND), or None if no backend can load"""
+    backend = backend or EMBEDDING_BACKEND
+    try:
+        return load_backend(backend)
+    except Exception as e:
+        if backend == "onnx":
+            print(f"WARNING: ONNX embedding backend unavailable ({e}), using sentence-transformers")
+            return load_embeddings("huggingface")
+        print(f"ERROR: Could not load embedding model: {e}")
+        print("Falling back to lexical search...")
+        return None
+
+def build_vectorstore(data, embeddings=None, docstore_path=None):
     """Build vectorstore with free HuggingFace embeddings"""
-    documents = [Document(page_content=item) for item in data]
+    with span("chunk"):
+        documents = [to_document(item) for item in data]
     
     try:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        vectorstore = FAISS.from_documents(documents, embeddings)
+        if embeddings is None:
+            embeddings = load_backend()
+        texts = [doc.page_content for doc in documents]
+        with span("embed"):
+            vectors = embeddings.embed_documents(texts)
+        with span("index_build"):
+            vectorstore = create_faiss_store(embeddings, len(vectors[0]), docstore_path)
+            vectorstore.add_embeddings(
+                list(zip(texts, vectors)),
+                metadatas=[doc.metadata for doc in documents],
+                ids=document_ids(documents),
+            )
+        increment("docs_indexed", len(documents))
         print(f"Successfully created vectorstore with {len(documents)} documents")
         return vectorstore
         
     except Exception as e:
         print(f"ERROR: Unexpected error creating vectorstore: {e}")
-        print("Creating fallback vectorstore...")
+        print("Creating fallback lexical index...")
         
         if documents:
-            from langchain_community.embeddings import FakeEmbeddings
-            fake_embeddings = FakeEmbeddings(size=384)  # Match MiniLM dimension
-            vectorstore = FAISS.from_documents(documents, fake_embeddings)
-            return vectorstore
+            # Random vectors would index fine but retrieve nothing useful
+            from memory.lexical import build_lexical_index
+            return build_lexical_index(data)
         else:
             return None
+
+def positions_for_ids(vectorstore, doc_ids):
+    """FAISS positions holding the given docstore ids"""
+    id_map = vectorstore.index_to_docstore_id
+    if hasattr(id_map, "positions_of"):
+        return id_map.positions_of(doc_ids)
+    wanted = set(doc_ids)
+    return [position for position, doc_id in id_map.items() if doc_id in wanted]
+
+def narrow_positions(positions, entity_positions):
+    """Positions in both slices, empty if they do not overlap; the entity slice if positions is None.
+
+    Callers decide what an empty overlap falls back to; the retrievers keep
+    the time slice, since an explicit date range is the stronger constraint.
+    """
+    if positions is None:
+        return entity_positions
+    return sorted(set(positions) & set(entity_positions))
+
+class PositionCache:
+    """FAISS positions of recently resolved document sets, such as everything naming one entity.
+
+    On a TombstoneFAISS store the cache subscribes to appends and deletes and
+    patches cached sets while the write lock is held, so a repeated entity
+    never costs a docstore lookup; compaction clears it. Other stores are
+    cleared whenever their size or generation changes. Callers hold
+    read_locked() across positions() and the search that uses them.
+    """
+
+    def __init__(self, vectorstore, size=POSITION_CACHE_SIZE):
+        self.vectorstore = vectorstore
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._key = None
+        self._subscribed = hasattr(vectorstore, "subscribe")
+        if self._subscribed:
+            vectorstore.subscribe(self)
+
+    def positions(self, doc_ids):
+        """Sorted positions holding doc_ids"""
+        key = frozenset(doc_ids)
+        with self._lock:
+            if not self._subscribed:
+                current = getattr(self.vectorstore, "generation", 0), len(self.vectorstore.index_to_docstore_id)
+                if current != self._key:
+                    self._entries.clear()
+                    self._key = current
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                increment("position_cache_hits")
+            else:
+                self._entries[key] = set(positions_for_ids(self.vectorstore, key))
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            return sorted(self._entries[key])
+
+    # -- TombstoneFAISS listener, called under the store's write lock ------
+
+    def on_add(self, start, doc_ids, metadatas):
+        with self._lock:
+            for cached_ids, positions in self._entries.items():
+                positions.update(start + i for i, doc_id in enumerate(doc_ids) if doc_id in cached_ids)
+
+    def on_delete(self, positions):
+        with self._lock:
+            for cached in self._entries.values():
+                cached.difference_update(positions)
+
+    def on_compact(self):
+        with self._lock:
+            self._entries.clear()
+
+def _query_vector(vectorstore, query):
+    query_vector = np.asarray(vectorstore.embedding_function.embed_query(query), dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+    return query_vector
+
+def boosted_search(vectorstore, query, boosted, k=4):
+    """Top k of a normal search and the boosted rows together, boosted rows scored up by ENTITY_BOOST.
+
+    Only the newest ENTITY_BOOST_LIMIT boosted rows are scored exactly, so a
+    large organization costs no more than a bounded slice; the query is
+    embedded once for both searches.
+    """
+    query_vector = _query_vector(vectorstore, query)
+    boosted = sorted(boosted)[-ENTITY_BOOST_LIMIT:]
+    with read_locked(vectorstore):
+        hits = vectorstore.similarity_search_with_score_by_vector(query_vector.tolist(), k)
+        results = _search_positions(vectorstore, query_vector, boosted, k, boosted)
+    higher_is_better = vectorstore.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+    best = {}
+    for doc, score in hits + results:
+        # A boosted row found by both searches keeps its boosted score
+        key = doc.id or id(doc)
+        if key not in best or (score > best[key][1] if higher_is_better else score < best[key][1]):
+            best[key] = (doc, score)
+    return sorted(best.values(), key=lambda pair: -pair[1] if higher_is_better else pair[1])[:k]
+
+def search_positions(vectorstore, query, positions, k=4, boosted=None):
+    """Exact search over a subset of FAISS rows, returning (Document, score) pairs.
+
+    Used when a side index (time, entity, ...) has already narrowed the
+    candidates, so only that slice of vectors is touched. Rows in boosted
+    have their scores improved by ENTITY_BOOST before ranking.
+    """
+    if not positions:
+        return []
+    query_vector = _query_vector(vectorstore, query)
+    with read_locked(vectorstore):
+        return _search_positions(vectorstore, query_vector, positions, k, boosted)
+
+def _search_positions(vectorstore, query_vector, positions, k, boosted=None):
+    tombstones = getattr(vectorstore, "tombstones", None)
+    if tombstones:
+        positions = [position for position in positions if position not in tombstones]
+    if not positions:
+        return []
+    ids = np.asarray(positions, dtype=np.int64)
+    vectors = vectorstore.index.reconstruct_batch(ids)
+    boost = np.isin(ids, np.fromiter(boosted, dtype=np.int64)) * ENTITY_BOOST if boosted else 0.0
+    if vectorstore.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        scores = vectors @ query_vector
+        scores = scores + np.abs(scores) * boost
+        order = np.argsort(-scores)[:k]
+    else:
+        scores = ((vectors - query_vector) ** 2).sum(axis=1) * (1 - boost)
+        order = np.argsort(scores)[:k]
+    results = []
+    for i in order:
+        doc_id = vectorstore.index_to_docstore_id[int(ids[i])]
+        results.append((vectorstore.docstore.search(doc_id), float(scores[i])))
+    return results
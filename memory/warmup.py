@@ -0,0 +1,61 @@
+"""
+Startup warm-up for the embedding model and the Ollama LLM.
+
+Both are warmed on background threads while the loaders fetch data, so the
+first question does not pay for Ollama loading the model into memory or for
+the embedder's first-call overhead. OLLAMA_KEEP_ALIVE (default 30m) is sent
+with the warm-up and by both Ollama clients, so the model stays resident
+between sparse questions for the rest of the session.
+"""
+
+import json
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import span
+
+OLLAMA_MODEL = "llama3.2"
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def warm_ollama(model=OLLAMA_MODEL, base_url=None, keep_alive=OLLAMA_KEEP_ALIVE, timeout=120):
+    """Ask Ollama to load model into memory; returns False if the server is unreachable"""
+    base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # An empty prompt loads the model without generating anything
+    body = json.dumps({"model": model, "prompt": "", "keep_alive": keep_alive}).encode("utf-8")
+    request = urllib.request.Request(
+        f"{base_url}/api/generate", data=body, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with span("warmup", model=model):
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+        return True
+    except OSError as e:
+        print(f"WARNING: Could not warm up Ollama model {model}: {e}")
+        return False
+
+
+def warm_embeddings(embeddings):
+    """Run one embedding so lazy initialization happens before the first question"""
+    if embeddings is None:
+        return None
+    with span("warmup", model="embeddings"):
+        embeddings.embed_query("warm up")
+    return embeddings
+
+
+def start_warmup(load_embeddings=None, model=OLLAMA_MODEL):
+    """Start warming on background threads.
+
+    load_embeddings is a zero-argument callable; its (warmed) result is
+    available from the returned "embeddings" future. The "llm" future
+    resolves to whether Ollama answered.
+    """
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warmup")
+    futures = {"llm": executor.submit(warm_ollama, model)}
+    if load_embeddings is not None:
+        futures["embeddings"] = executor.submit(lambda: warm_embeddings(load_embeddings()))
+    executor.shutdown(wait=False)
+    return futures
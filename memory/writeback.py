@@ -0,0 +1,93 @@
+"""
+Write-back of the user's own conversation into the index.
+
+Chat turns and explicit "remember that ..." statements are queued and
+indexed by a background thread, which embeds them in batches and appends
+them through the store's normal logged add path. Each batch is mirrored
+first, like loader records, so `--rebuild` indexes them again. The append holds the
+index's write lock, so searches on the chat thread never see it half done.
+The active turn only pays for a queue put.
+"""
+
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from loaders.mirror import mirror_records
+from loaders.records import make_record
+
+WRITE_BATCH = 16
+FLUSH_INTERVAL = 1.0
+
+_REMEMBER = re.compile(r"^\s*(?:please\s+)?remember(?:\s+that)?[\s,:]+(?P<fact>.+)$", re.IGNORECASE | re.DOTALL)
+
+
+def parse_remember(text):
+    """The fact in a "remember that ..." statement, or None for other messages"""
+    match = _REMEMBER.match(text)
+    return match.group("fact").strip() if match else None
+
+
+class MemoryWriter:
+    """Queue that indexes chat records on a background thread in batches"""
+
+    def __init__(self, store, batch_size=WRITE_BATCH, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def _submit(self, text, kind):
+        now = time.time()
+        self._queue.put(make_record("chat", uuid.uuid4().hex, text, timestamp=now, kind=kind))
+
+    def remember(self, fact):
+        """Queue an explicit statement the user asked to be remembered"""
+        stamp = datetime.now().strftime("%a %d %b %Y %H:%M")
+        self._submit(f"On {stamp} the user asked to remember: {fact}", "note")
+
+    def record_turn(self, question, answer):
+        """Queue a finished chat turn"""
+        stamp = datetime.now().strftime("%a %d %b %Y %H:%M")
+        self._submit(f"On {stamp} the user said: {question}\nThe assistant answered: {answer}", "turn")
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._closed and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                mirror_records(batch)
+                self.store.add_records(batch)
+            except Exception as e:
+                print(f"WARNING: Could not index {len(batch)} chat records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until everything queued so far is indexed"""
+        self._queue.join()
+
+    def close(self):
+        """Index what is queued and stop the background thread"""
+        self._closed = True
+        self._thread.join()
@@ -0,0 +1,201 @@
+"""
+Per-stage timing spans and counters with Prometheus text and JSON-lines export.
+
+Set METRICS_PORT to serve /metrics (Prometheus text format) and
+/metrics.json over HTTP, and METRICS_LOG to append one JSON object per
+finished span to a file.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{v}"'.replace("\n", " ") for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage duration histograms and named counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self.log_path = os.getenv("METRICS_LOG")
+
+    def observe(self, stage, seconds, **labels):
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)})
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+        if self.log_path:
+            entry = {"ts": time.time(), "stage": stage, "seconds": round(seconds, 6), **labels}
+            with self._lock, open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """Plain-dict view suitable for JSON export"""
+        with self._lock:
+            stages = [
+                {"stage": stage, "labels": dict(key), "count": h["count"], "sum_seconds": h["sum"]}
+                for (stage, key), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for (name, key), value in sorted(self._counters.items())
+            ]
+        return {"stages": stages, "counters": counters}
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP memory_stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE memory_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, key), h in sorted(self._histograms.items()):
+                base = (("stage", stage),) + key
+                for bound, count in zip(BUCKETS, h["buckets"]):
+                    lines.append(f"memory_stage_duration_seconds_bucket{_format_labels(base, [('le', bound)])} {count}")
+                lines.append(f"memory_stage_duration_seconds_bucket{_format_labels(base, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"memory_stage_duration_seconds_sum{_format_labels(base)} {h['sum']:.6f}")
+                lines.append(f"memory_stage_duration_seconds_count{_format_labels(base)} {h['count']}")
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE memory_{name}_total counter")
+                for (counter_name, key), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"memory_{name}_total{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time the enclosed block as one observation of stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start, **labels)
+
+
+def timed(stage, **labels):
+    """Decorator form of span; a generator is timed until it is exhausted"""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator(*args, **kwargs):
+                with span(stage, **labels):
+                    yield from func(*args, **kwargs)
+            return generator
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(name, amount=1, **labels):
+    registry.increment(name, amount, **labels)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """LangChain callback recording LLM time-to-first-token and total time"""
+
+    def __init__(self, model=None):
+        self.model = model
+        self._starts = {}
+        self._first_token = set()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        start = self._starts.get(run_id)
+        if start is not None and run_id not in self._first_token:
+            self._first_token.add(run_id)
+            registry.observe("llm_ttft", time.perf_counter() - start, model=self.model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        self._first_token.discard(run_id)
+        if start is not None:
+            registry.observe("llm_total", time.perf_counter() - start, model=self.model)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+        self._first_token.discard(run_id)
+        increment("llm_errors", model=self.model)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = registry.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(registry.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve metrics on a daemon thread if METRICS_PORT (or port) is set"""
+    if port is None:
+        port = os.getenv("METRICS_PORT")
+    if port in (None, ""):
+        return None
+    server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available at http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
@@ -4,6 +4,29 @@ Test package for Personal Memory AI project.
 This package contains comprehensive tests for all components of the application:
 - Data loaders (Gmail, Notion, Calendar)
 - Memory system (Vectorstore, QA Chain)
+- Context assembly (dedupe, trimming, token budget)
+- Cross-encoder reranking
+- Time-aware retrieval (time index, date parsing)
+- Benchmark harness (synthetic corpus, offline stubs)
+- Telemetry (stage spans, counters, metrics export)
+- Compact docstore (SQLite rows, integer id map)
+- Index persistence (snapshots, write-ahead log, recovery)
+- ONNX embedding backend
+- Lexical-only retrieval mode
+- Raw-data mirror and offline rebuild
+- LLM response cache
+- Model warm-up and keep-alive
+- Structured agent tools
+- Concurrent multi-source search
+- Conversation memory
+- Chat write-back memory
+- Hierarchical summaries for broad questions
+- Gmail body and attachment extraction
+- Ingest-time near-duplicate collapsing
+- People and organization lookups
+- Hot/cold tiered index
+- Per-source partitions with scatter-gather search
+- Ingest segments and the chat-side follower
 - Agent functionality
 - Integration tests
 - Docker configuration tests
@@ -15,6 +38,29 @@ To run specific test suites:
     python tests/run_all_tests.py main
     python tests/run_all_tests.py loaders
     python tests/run_all_tests.py memory
+    python tests/run_all_tests.py context
+    python tests/run_all_tests.py rerank
+    python tests/run_all_tests.py time
+    python tests/run_all_tests.py benchmarks
+    python tests/run_all_tests.py telemetry
+    python tests/run_all_tests.py docstore
+    python tests/run_all_tests.py index
+    python tests/run_all_tests.py embeddings
+    python tests/run_all_tests.py lexical
+    python tests/run_all_tests.py mirror
+    python tests/run_all_tests.py llm_cache
+    python tests/run_all_tests.py warmup
+    python tests/run_all_tests.py structured
+    python tests/run_all_tests.py multi_source
+    python tests/run_all_tests.py conversation
+    python tests/run_all_tests.py writeback
+    python tests/run_all_tests.py summaries
+    python tests/run_all_tests.py mime
+    python tests/run_all_tests.py dedupe
+    python tests/run_all_tests.py entities
+    python tests/run_all_tests.py tiered
+    python tests/run_all_tests.py partitions
+    python tests/run_all_tests.py ingest
     python tests/run_all_tests.py agent
     python tests/run_all_tests.py integration
     python tests/run_all_tests.py docker
@@ -23,10 +69,40 @@ To run individual test files:
     python -m unittest tests.test_main
     python -m unittest tests.test_loaders
     python -m unittest tests.test_memory_system
+    python -m unittest tests.test_context
+    python -m unittest tests.test_rerank
+    python -m unittest tests.test_time_index
+    python -m unittest tests.test_benchmarks
+    python -m unittest tests.test_telemetry
+    python -m unittest tests.test_docstore
+    python -m unittest tests.test_index_store
+    python -m unittest tests.test_embeddings
+    python -m unittest tests.test_lexical
+    python -m unittest tests.test_mirror
+    python -m unittest tests.test_llm_cache
+    python -m unittest tests.test_warmup
+    python -m unittest tests.test_structured
+    python -m unittest tests.test_multi_source
+    python -m unittest tests.test_conversation
+    python -m unittest tests.test_writeback
+    python -m unittest tests.test_summaries
+    python -m unittest tests.test_mime
+    python -m unittest tests.test_dedupe
+    python -m unittest tests.test_entities
+    python -m unittest tests.test_tiered
+    python -m unittest tests.test_partitions
+    python -m unittest tests.test_ingest
     python -m unittest tests.test_agent
     python -m unittest tests.test_integration
     python -m unittest tests.test_docker
 """
 
+import os
+
+# Chains built in tests must not open the shared cache file or probe Ollama
+os.environ.setdefault("LLM_CACHE", "false")
+# Loaders under test must not write a mirror into the working tree
+os.environ.setdefault("RAW_MIRROR", "false")
+
 __version__ = "1.0.0"
 __author__ = "Personal Memory AI Team"
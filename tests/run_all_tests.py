@@ -116,6 +116,29 @@ def main():
         ("test_main", "Main Application Flow Tests"),
         ("test_loaders", "Data Loader Tests"),
         ("test_memory_system", "Memory System Tests"),
+        ("test_context", "Context Assembly Tests"),
+        ("test_rerank", "Reranking Tests"),
+        ("test_time_index", "Time-Aware Retrieval Tests"),
+        ("test_benchmarks", "Benchmark Harness Tests"),
+        ("test_telemetry", "Telemetry Tests"),
+        ("test_docstore", "Compact Docstore Tests"),
+        ("test_index_store", "Index Persistence Tests"),
+        ("test_embeddings", "Embedding Backend Tests"),
+        ("test_lexical", "Lexical Mode Tests"),
+        ("test_mirror", "Raw Data Mirror Tests"),
+        ("test_llm_cache", "LLM Cache Tests"),
+        ("test_warmup", "Warm-up Tests"),
+        ("test_structured", "Structured Tool Tests"),
+        ("test_multi_source", "Multi-Source Search Tests"),
+        ("test_conversation", "Conversation Memory Tests"),
+        ("test_writeback", "Write-back Memory Tests"),
+        ("test_summaries", "Summary Index Tests"),
+        ("test_mime", "MIME Extraction Tests"),
+        ("test_dedupe", "Near-duplicate Tests"),
+        ("test_entities", "Entity Index Tests"),
+        ("test_tiered", "Tiered Store Tests"),
+        ("test_partitions", "Partitioned Search Tests"),
+        ("test_ingest", "Ingest Worker Tests"),
         ("test_agent", "Agent and Chat Interface Tests"),
         ("test_integration", "Integration Tests"),
         ("test_docker", "Docker Configuration Tests")
@@ -183,6 +206,29 @@ def run_specific_test(test_name):
         "main": ("test_main", "Main Application Flow Tests"),
         "loaders": ("test_loaders", "Data Loader Tests"),
         "memory": ("test_memory_system", "Memory System Tests"),
+        "context": ("test_context", "Context Assembly Tests"),
+        "rerank": ("test_rerank", "Reranking Tests"),
+        "time": ("test_time_index", "Time-Aware Retrieval Tests"),
+        "benchmarks": ("test_benchmarks", "Benchmark Harness Tests"),
+        "telemetry": ("test_telemetry", "Telemetry Tests"),
+        "docstore": ("test_docstore", "Compact Docstore Tests"),
+        "index": ("test_index_store", "Index Persistence Tests"),
+        "embeddings": ("test_embeddings", "Embedding Backend Tests"),
+        "lexical": ("test_lexical", "Lexical Mode Tests"),
+        "mirror": ("test_mirror", "Raw Data Mirror Tests"),
+        "llm_cache": ("test_llm_cache", "LLM Cache Tests"),
+        "warmup": ("test_warmup", "Warm-up Tests"),
+        "structured": ("test_structured", "Structured Tool Tests"),
+        "multi_source": ("test_multi_source", "Multi-Source Search Tests"),
+        "conversation": ("test_conversation", "Conversation Memory Tests"),
+        "writeback": ("test_writeback", "Write-back Memory Tests"),
+        "summaries": ("test_summaries", "Summary Index Tests"),
+        "mime": ("test_mime", "MIME Extraction Tests"),
+        "dedupe": ("test_dedupe", "Near-duplicate Tests"),
+        "entities": ("test_entities", "Entity Index Tests"),
+        "tiered": ("test_tiered", "Tiered Store Tests"),
+        "partitions": ("test_partitions", "Partitioned Search Tests"),
+        "ingest": ("test_ingest", "Ingest Worker Tests"),
         "agent": ("test_agent", "Agent and Chat Interface Tests"),
         "integration": ("test_integration", "Integration Tests"),
         "docker": ("test_docker", "Docker Configuration Tests")
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import compare, run_size
+from benchmarks.stubs import HashingEmbeddings, StubLLM
+from benchmarks.synthetic import generate_corpus, generate_queries
+
+
+@patch('memory.context._encoding', False)
+class TestBenchmarks(unittest.TestCase):
+    """Smoke tests for the offline benchmark harness"""
+
+    def test_corpus_is_deterministic(self):
+        """Test the same seed produces the same records"""
+        first = generate_corpus(40, seed=3, now=1700000000)
+        second = generate_corpus(40, seed=3, now=1700000000)
+
+        self.assertEqual(first, second)
+        self.assertEqual({r["metadata"]["source"] for r in first}, {"gmail", "calendar", "notion"})
+
+    def test_stubs_are_deterministic(self):
+        """Test the embedding and LLM stubs are stable across calls"""
+        embeddings = HashingEmbeddings(size=32)
+
+        self.assertEqual(embeddings.embed_query("budget review"), embeddings.embed_query("budget review"))
+        self.assertEqual(StubLLM().invoke("hello"), StubLLM().invoke("hello"))
+
+    def test_run_size_reports_metrics(self):
+        """Test a tiny run reports latency percentiles and exact recall"""
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run_size(200, generate_queries(10), HashingEmbeddings(size=64),
+                              docstore_path=os.path.join(tmp, "docstore.sqlite"))
+
+        for metric in ("ingest_docs_per_s", "index_build_s", "search_p99_ms",
+                       "answer_p95_ms", "context_tokens_mean"):
+            self.assertIn(metric, result)
+        self.assertEqual(result["recall_at_k"], 1.0)
+
+    def test_recall_measures_the_app_retriever(self):
+        """Test recall drops when the app's retriever misses the exact neighbours"""
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch('benchmarks.run_benchmarks.build_retriever') as mock_build:
+            mock_build.return_value.invoke.return_value = []
+            result = run_size(200, generate_queries(10), HashingEmbeddings(size=64), end_to_end=False,
+                              docstore_path=os.path.join(tmp, "docstore.sqlite"))
+
+        self.assertEqual(result["recall_at_k"], 0.0)
+
+    def test_compare_flags_regressions(self):
+        """Test regressions are detected in the right direction per metric"""
+        baseline = {"runs": [{"size": 10, "search_p50_ms": 1.0, "recall_at_k": 1.0}]}
+        current = {"runs": [{"size": 10, "search_p50_ms": 2.0, "recall_at_k": 1.5}]}
+
+        regressions = compare(current, baseline, tolerance=0.2)
+
+        self.assertEqual([r["metric"] for r in regressions], ["search_p50_ms"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from memory.context import (
+    ContextBudgetCompressor,
+    assemble_context,
+    count_tokens,
+    dedupe_documents,
+    trim_to_relevant_sentences,
+)
+
+
+@patch('memory.context._encoding', False)
+class TestContextAssembly(unittest.TestCase):
+    """Test context deduplication, trimming and token budgeting"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.long_text = " ".join(
+            [f"Filler sentence number {i} about nothing in particular." for i in range(40)]
+            + ["The budget review meeting moved to Friday."]
+        )
+
+    def test_count_tokens_without_tiktoken(self):
+        """Test token estimate when no encoding is available"""
+        self.assertEqual(count_tokens(""), 0)
+        self.assertEqual(count_tokens("a" * 40), 10)
+
+    def test_dedupe_near_identical_documents(self):
+        """Test near-identical chunks collapse to the first occurrence"""
+        docs = [
+            Document(page_content="From: Alice\nSubject: Lunch\nContent: Lunch at noon on Tuesday"),
+            Document(page_content="From: Alice\nSubject: Lunch\nContent: Lunch at noon on Tuesday "),
+            Document(page_content="From: Bob\nSubject: Report\nContent: Quarterly numbers attached"),
+        ]
+
+        result = dedupe_documents(docs)
+
+        self.assertEqual(len(result), 2)
+        self.assertIs(result[0], docs[0])
+        self.assertIs(result[1], docs[2])
+
+    def test_trim_keeps_query_relevant_sentences(self):
+        """Test long documents are trimmed to matching sentences"""
+        trimmed = trim_to_relevant_sentences(self.long_text, "When is the budget meeting?")
+
+        self.assertEqual(trimmed, "The budget review meeting moved to Friday.")
+
+    def test_trim_leaves_short_documents_intact(self):
+        """Test short documents are not trimmed"""
+        text = "From: Alice\nSubject: Lunch"
+        self.assertEqual(trim_to_relevant_sentences(text, "budget"), text)
+
+    def test_assemble_context_enforces_budget(self):
+        """Test the assembled context never exceeds the token budget"""
+        docs = [Document(page_content=f"Document {i} " + "word " * 200) for i in range(10)]
+
+        result = assemble_context(docs, "document", max_tokens=300, min_trim_tokens=1000)
+
+        total = sum(count_tokens(doc.page_content) for doc in result)
+        self.assertLessEqual(total, 300)
+        self.assertLess(len(result), len(docs))
+
+    def test_compressor_preserves_metadata(self):
+        """Test the compressor keeps document metadata"""
+        docs = [Document(page_content="Team offsite on Friday", metadata={"source": "calendar"})]
+
+        result = ContextBudgetCompressor(max_tokens=100).compress_documents(docs, "offsite")
+
+        self.assertEqual(result[0].metadata, {"source": "calendar"})
+
+    @patch('memory.rag_chain.Ollama')
+    def test_qa_chain_uses_compression_retriever(self, mock_ollama):
+        """Test build_qa_chain routes retrieval through the context compressor"""
+        from langchain_community.embeddings import FakeEmbeddings
+        from langchain_community.llms.fake import FakeListLLM
+        from langchain_community.vectorstores import FAISS
+        from langchain.retrievers import ContextualCompressionRetriever
+        from memory.rag_chain import build_qa_chain
+
+        mock_ollama.return_value = FakeListLLM(responses=["ok"])
+        vectorstore = FAISS.from_texts(["Team offsite on Friday"], FakeEmbeddings(size=8))
+
+        qa = build_qa_chain(vectorstore, max_context_tokens=200)
+
+        self.assertIsInstance(qa.retriever, ContextualCompressionRetriever)
+        self.assertEqual(qa.retriever.base_compressor.max_tokens, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import threading
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.context import count_tokens
+from memory.conversation import ConversationMemory, llm_summarizer
+from ui.chat_terminal import run_chat
+
+
+class TestConversationMemory(unittest.TestCase):
+    """Test bounded session memory with rolling summarization"""
+
+    def test_first_question_is_passed_through(self):
+        """Test an empty memory adds nothing to the prompt"""
+        memory = ConversationMemory(summarize=MagicMock())
+        self.assertEqual(memory.format_input("What's on Friday?"), "What's on Friday?")
+
+    def test_recent_turns_are_kept_verbatim(self):
+        """Test follow-ups see the previous turn word for word"""
+        memory = ConversationMemory(summarize=MagicMock(), max_tokens=300)
+        memory.add_turn("What's my next meeting?", "Design review at 10:00.")
+
+        prompt = memory.format_input("And the one after that?")
+
+        self.assertIn("User: What's my next meeting?\nAssistant: Design review at 10:00.", prompt)
+        self.assertTrue(prompt.endswith("Current question: And the one after that?"))
+
+    def test_old_turns_fold_into_summary_within_budget(self):
+        """Test history stays under budget as the session grows"""
+        summarize = MagicMock(side_effect=lambda summary, turns: f"{summary} {len(turns)} turns about meetings".strip())
+        memory = ConversationMemory(summarize=summarize, max_tokens=90)
+        for i in range(20):
+            memory.add_turn(f"Question number {i} about the meeting schedule?", f"Answer number {i} with some detail.")
+            memory.wait()
+            self.assertLessEqual(count_tokens(memory.render()), 90 + 10)
+
+        self.assertTrue(summarize.called)
+        self.assertIn("turns about meetings", memory.render())
+        self.assertIn("Question number 19", memory.render())
+
+    def test_summarization_runs_off_the_calling_thread(self):
+        """Test add_turn returns before the summarizer finishes"""
+        release = threading.Event()
+
+        def slow_summarize(summary, turns):
+            release.wait(5)
+            return "summary"
+
+        memory = ConversationMemory(summarize=slow_summarize, max_tokens=30)
+        memory.add_turn("A fairly long first question about the quarterly budget review?", "A long answer.")
+        memory.add_turn("Second question?", "Second answer.")
+
+        self.assertEqual(memory.summary, "")
+        release.set()
+        memory.wait()
+        self.assertEqual(memory.summary, "summary")
+
+    @patch('builtins.print')
+    def test_failed_summary_keeps_questions(self, mock_print):
+        """Test an LLM failure falls back to an extractive summary"""
+        memory = ConversationMemory(summarize=MagicMock(side_effect=RuntimeError("ollama down")), max_tokens=90)
+        memory.add_turn("Who emailed about the offsite?", "Alice did, with the agenda attached. " * 10)
+        memory.add_turn("When is it?", "Next Friday.")
+        memory.wait()
+
+        self.assertIn("Who emailed about the offsite?", memory.summary)
+
+    def test_llm_summarizer_prompts_with_summary_and_turns(self):
+        """Test the LLM is asked to merge new turns into the summary"""
+        llm = MagicMock()
+        llm.invoke.return_value = "  merged  "
+
+        self.assertEqual(llm_summarizer(llm)("old", [("q", "a")]), "merged")
+        prompt = llm.invoke.call_args[0][0]
+        self.assertIn("old", prompt)
+        self.assertIn("User: q\nAssistant: a", prompt)
+
+    @patch('builtins.input', side_effect=["What's my next meeting?", "And after that?", "exit"])
+    @patch('builtins.print')
+    def test_run_chat_sends_history_with_follow_ups(self, mock_print, mock_input):
+        """Test the chat loop passes earlier turns to the agent"""
+        agent = MagicMock()
+        agent.invoke.side_effect = [{"output": "Design review"}, {"output": "Retro"}]
+
+        run_chat(agent, ConversationMemory(summarize=MagicMock()))
+
+        second_input = agent.invoke.call_args_list[1][0][0]["input"]
+        self.assertIn("Assistant: Design review", second_input)
+        self.assertIn("Current question: And after that?", second_input)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.records import make_record
+from memory.dedupe import NearDuplicateIndex
+
+
+def newsletter(i, day):
+    return make_record(
+        "gmail", f"n{i}",
+        f"Subject: Weekly digest #{i}\n\nHere are this week's top stories from the engineering blog. "
+        f"Read about scaling databases, the new deploy pipeline and {day} team offsite photos. "
+        f"You received this because you subscribed. Unsubscribe at any time.",
+        timestamp=1715000000 + i * 604800,
+    )
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Test MinHash LSH collapsing of near-duplicate records"""
+
+    def test_similar_signatures_estimate_jaccard(self):
+        """Test near-identical texts agree on most signature slots and unrelated ones do not"""
+        index = NearDuplicateIndex()
+        a = index.signature(newsletter(1, "Monday")["text"])
+        b = index.signature(newsletter(2, "Monday")["text"])
+        c = index.signature("Dentist appointment moved to Thursday afternoon at the downtown clinic")
+
+        self.assertGreater((a == b).mean(), 0.8)
+        self.assertLess((a == c).mean(), 0.2)
+
+    def test_newsletters_collapse_to_newest_with_count(self):
+        """Test repeated newsletters become one canonical record with a duplicate count"""
+        records = [newsletter(i, "Monday") for i in range(5)] + [
+            make_record("gmail", "x", "Subject: Contract\n\nPlease sign the attached contract by Friday.")
+        ]
+        kept = NearDuplicateIndex().collapse(records)
+
+        self.assertEqual([r["metadata"]["id"] for r in kept], ["n4", "x"])
+        self.assertEqual(kept[0]["metadata"]["duplicates"], 4)
+        self.assertNotIn("duplicates", kept[1]["metadata"])
+        self.assertNotIn("duplicates", records[4]["metadata"])
+
+    def test_recurring_events_collapse(self):
+        """Test occurrences differing only in dates are duplicates"""
+        events = [
+            make_record("calendar", f"standup_{day}", f"Event: Team standup\nStart: 2024-05-{day:02d}T09:00:00+01:00\n"
+                        f"End: 2024-05-{day:02d}T09:15:00+01:00", timestamp=1715000000 + day * 86400)
+            for day in range(13, 18)
+        ]
+        self.assertEqual(len(NearDuplicateIndex().collapse(events)), 1)
+
+    def test_later_runs_drop_new_copies_and_keep_updates(self):
+        """Test the saved index recognizes new duplicates and lets canonical updates through"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "minhash.pkl")
+            index = NearDuplicateIndex(path)
+            first = index.collapse([newsletter(1, "Monday")])
+            index.save()
+
+            reopened = NearDuplicateIndex.open(path)
+            kept = reopened.collapse([newsletter(1, "Monday"), newsletter(2, "Monday")])
+
+            self.assertEqual([r["metadata"]["id"] for r in first], ["n1"])
+            self.assertEqual([r["metadata"]["id"] for r in kept], ["n1"])
+            self.assertEqual(kept[0]["metadata"]["duplicates"], 1)
+            self.assertEqual(len(reopened), 2)
+
+    def test_new_version_of_a_duplicate_is_matched_again(self):
+        """Test a dropped record whose version changes is kept once it no longer matches"""
+        index = NearDuplicateIndex()
+        index.collapse([newsletter(1, "Monday"), newsletter(2, "Monday")])
+        reply = make_record(
+            "gmail", "n1", "Re: offsite budget. Priya approved the venue deposit and wants the final headcount by Friday.",
+            timestamp=1716000000, version="2",
+        )
+
+        self.assertEqual(index.collapse([newsletter(1, "Monday")]), [])
+        self.assertEqual([r["metadata"]["id"] for r in index.collapse([reply])], ["n1"])
+        self.assertEqual(index.counts["gmail:n2"], 1)
+        self.assertEqual(index.collapse([reply]), [reply])
+
+    def test_threshold_controls_collapsing(self):
+        """Test a strict threshold keeps moderately similar records apart"""
+        records = [newsletter(1, "Monday"), newsletter(2, "Wednesday and Friday")]
+        self.assertEqual(len(NearDuplicateIndex(threshold=0.99).collapse(records)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
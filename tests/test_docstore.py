@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from loaders.records import make_record
+from memory.docstore import CompactDocstore, CompactIdMap
+from memory.time_index import build_time_index
+from memory.vectorstore import build_vectorstore
+
+
+class TestCompactDocstore(unittest.TestCase):
+    """Test the SQLite-backed docstore and integer id map"""
+
+    def setUp(self):
+        """Create a temporary docstore file"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "docstore.sqlite")
+
+    def test_add_search_delete(self):
+        """Test documents round-trip with metadata and can be deleted"""
+        for compress in (True, False):
+            with self.subTest(compress=compress):
+                store = CompactDocstore(self.path + str(compress), compress=compress)
+                store.add({"gmail:1": Document(page_content="Lunch at noon", metadata={"source": "gmail"})})
+
+                doc = store.search("gmail:1")
+                self.assertEqual(doc.page_content, "Lunch at noon")
+                self.assertEqual(doc.metadata, {"source": "gmail"})
+                self.assertEqual(len(store), 1)
+
+                store.delete(["gmail:1"])
+                self.assertIn("not found", store.search("gmail:1"))
+                store.close()
+
+    def test_duplicate_ids_rejected(self):
+        """Test adding an existing id raises like InMemoryDocstore"""
+        store = CompactDocstore(self.path)
+        store.add({"a": Document(page_content="one")})
+
+        with self.assertRaises(ValueError):
+            store.add({"a": Document(page_content="two")})
+        self.assertEqual(store.search("a").page_content, "one")
+
+    def test_deleted_rowids_are_not_reused(self):
+        """Test a document added after deleting the newest one gets a fresh rowid, also in older files"""
+        legacy = sqlite3.connect(self.path)
+        legacy.execute(
+            "CREATE TABLE docs (rowid INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, timestamp REAL, body BLOB NOT NULL)"
+        )
+        legacy.execute("INSERT INTO docs (doc_id, timestamp, body) VALUES ('gmail:1', NULL, ?)", (b'j{"t": "a", "m": {}}',))
+        legacy.commit()
+        legacy.close()
+        store = CompactDocstore(self.path)
+        self.addCleanup(store.close)
+        store.add({"gmail:2": Document(page_content="b")})
+        deleted = store.rowid_for("gmail:2")
+
+        store.delete(["gmail:2"])
+        store.add({"gmail:3": Document(page_content="c")})
+
+        self.assertEqual(store.search("gmail:1").page_content, "a")
+        self.assertGreater(store.rowid_for("gmail:3"), deleted)
+
+    def test_id_map_resolves_positions(self):
+        """Test the id map stores rowids and resolves document ids lazily"""
+        store = CompactDocstore(self.path)
+        store.add({"x": Document(page_content="x"), "y": Document(page_content="y")})
+        id_map = CompactIdMap(store)
+
+        id_map.update({1: "y", 0: "x"})
+
+        self.assertEqual(len(id_map), 2)
+        self.assertEqual(id_map[0], "x")
+        self.assertEqual(dict(id_map.items()), {0: "x", 1: "y"})
+        with self.assertRaises(KeyError):
+            id_map[5] = "x"
+
+    @patch('memory.vectorstore.increment')
+    def test_build_vectorstore_uses_compact_store(self, mock_increment):
+        """Test the built store searches, persists and feeds the time index"""
+        records = [
+            make_record("calendar", "1", "Event: Standup", timestamp=100.0),
+            make_record("notion", "2", "Roadmap notes"),
+        ]
+        with patch('builtins.print'):
+            vectorstore = build_vectorstore(records, embeddings=FakeEmbeddings(size=8), docstore_path=self.path)
+
+        self.assertIsInstance(vectorstore.docstore, CompactDocstore)
+        self.assertEqual(vectorstore.index_to_docstore_id[0], "calendar:1")
+        self.assertEqual(len(vectorstore.similarity_search("standup", k=2)), 2)
+        self.assertEqual(build_time_index(vectorstore).range(0, 200), [0])
+
+        vectorstore.save_local(self.tmp.name)
+        loaded = FAISS.load_local(self.tmp.name, FakeEmbeddings(size=8), allow_dangerous_deserialization=True)
+        self.assertEqual(loaded.docstore.search("notion:2").page_content, "Roadmap notes")
+
+
+if __name__ == '__main__':
+    unittest.main()
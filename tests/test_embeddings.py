@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.embeddings import OnnxMiniLMEmbeddings, default_onnx_file, load_backend
+from memory.vectorstore import load_embeddings
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in: one token per word, right-padded to the batch maximum"""
+
+    def encode_batch(self, texts):
+        width = max(len(text.split()) for text in texts)
+        encodings = []
+        for text in texts:
+            ids = [len(word) for word in text.split()]
+            pad = width - len(ids)
+            encodings.append(SimpleNamespace(
+                ids=ids + [0] * pad, attention_mask=[1] * len(ids) + [0] * pad, type_ids=[0] * width
+            ))
+        return encodings
+
+
+class FakeSession:
+    """ONNX session stand-in whose hidden state for a token is [id, 1]"""
+
+    def run(self, outputs, feeds):
+        ids = feeds["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+class TestOnnxEmbeddings(unittest.TestCase):
+    """Test pooling, batching and backend selection"""
+
+    def _embedder(self, batch_size=2):
+        embedder = OnnxMiniLMEmbeddings.__new__(OnnxMiniLMEmbeddings)
+        embedder.batch_size = batch_size
+        embedder.tokenizer = FakeTokenizer()
+        embedder.session = FakeSession()
+        embedder._input_names = {"input_ids", "attention_mask"}
+        return embedder
+
+    def test_mean_pooling_ignores_padding(self):
+        """Test padded positions do not change a text's vector"""
+        embedder = self._embedder()
+        alone = embedder.embed_query("abc")
+        padded = embedder._embed_batch(["abc", "a bb cccc"])[0]
+
+        np.testing.assert_allclose(alone, padded, rtol=1e-6)
+        self.assertAlmostEqual(float(np.linalg.norm(alone)), 1.0, places=5)
+
+    def test_length_sorted_batches_keep_input_order(self):
+        """Test documents come back in input order despite batching by length"""
+        embedder = self._embedder(batch_size=2)
+        texts = ["a bb cccc dddd", "abc", "a b", "abcdef"]
+
+        vectors = embedder.embed_documents(texts)
+
+        expected = [embedder.embed_query(text) for text in texts]
+        np.testing.assert_allclose(vectors, expected, rtol=1e-6)
+        self.assertEqual(embedder.embed_documents([]), [])
+
+    def test_default_onnx_file_matches_cpu(self):
+        """Test the quantized graph is chosen per architecture"""
+        with patch('memory.embeddings.platform.machine', return_value="aarch64"):
+            self.assertEqual(default_onnx_file(), "onnx/model_qint8_arm64.onnx")
+        with patch('memory.embeddings.platform.machine', return_value="x86_64"):
+            self.assertEqual(default_onnx_file(), "onnx/model_quint8_avx2.onnx")
+
+    def test_unknown_backend_rejected(self):
+        """Test a misspelled backend is an error rather than a silent default"""
+        with self.assertRaises(ValueError):
+            load_backend("tensorflow")
+
+    @patch('builtins.print')
+    def test_onnx_failure_falls_back_to_huggingface(self, mock_print):
+        """Test load_embeddings falls back when onnxruntime is unavailable"""
+        fallback = MagicMock()
+
+        def fake_load(backend):
+            if backend == "onnx":
+                raise ImportError("No module named 'onnxruntime'")
+            return fallback
+
+        with patch('memory.vectorstore.load_backend', side_effect=fake_load):
+            self.assertIs(load_embeddings("onnx"), fallback)
+
+
+if __name__ == '__main__':
+    unittest.main()
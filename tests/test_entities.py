@@ -0,0 +1,232 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.records import make_record
+from memory.entities import EntityIndex, entity_keys, record_entities
+from memory.lexical import LexicalIndex
+from memory.time_index import TimeAwareRetriever, build_time_index
+from memory.vectorstore import build_vectorstore, document_ids, to_document
+
+
+class TestEntityExtraction(unittest.TestCase):
+    """Test entity keys taken from loader metadata"""
+
+    def test_mailbox_keys(self):
+        """Test an address yields the address, name, name parts and organization"""
+        self.assertEqual(
+            entity_keys("Priya Sharma <Priya.Sharma@acme.com>"),
+            {"priya.sharma@acme.com", "priya sharma", "priya", "sharma", "acme"},
+        )
+
+    def test_free_mail_and_bare_addresses(self):
+        """Test mailbox providers are not organizations and names come from the local part"""
+        self.assertEqual(entity_keys("tom.baker@gmail.com"), {"tom.baker@gmail.com", "tom baker", "tom", "baker"})
+
+    def test_dates_are_not_people(self):
+        """Test names that are also dates are not used as keys"""
+        self.assertNotIn("may", entity_keys("May Chen <may@acme.com>"))
+
+    def test_common_words_and_function_mailboxes(self):
+        """Test everyday first names, function mailboxes and rooms do not become single-word keys"""
+        self.assertEqual(entity_keys("Will Smith <will@acme.com>"), {"will@acme.com", "will smith", "smith", "acme"})
+        self.assertEqual(entity_keys("team@acme.com"), {"team@acme.com", "acme"})
+        self.assertEqual(entity_keys("Acme Support <support@acme.com>"), {"support@acme.com", "acme support", "acme"})
+        self.assertEqual(entity_keys("noreply@gmail.com"), {"noreply@gmail.com"})
+        self.assertEqual(entity_keys("Room 4B <c_1@resource.calendar.google.com>"), set())
+
+    def test_record_entities_from_every_source(self):
+        """Test participants, attendees, organizers and Notion people are all indexed"""
+        email = make_record("gmail", "t1", "...", sender="Tom <tom@acme.com>",
+                            participants=["Tom <tom@acme.com>", "Priya <priya@acme.com>"])
+        event = make_record("calendar", "e1", "...", attendees=["Lee <lee@globex.com>"], organizer="tom@acme.com")
+        page = make_record("notion", "p1", "...", people=["Dana Scully <dana@fbi.gov>"])
+
+        self.assertIn("priya", record_entities(email))
+        self.assertTrue({"lee", "globex", "tom@acme.com"} <= record_entities(event))
+        self.assertIn("dana scully", record_entities(page))
+
+
+class TestEntityIndex(unittest.TestCase):
+    """Test resolving entity mentions in questions to documents"""
+
+    def setUp(self):
+        """Set up records from two senders"""
+        self.records = [
+            make_record("gmail", "1", "From: Priya\nSubject: Budget\nThe Q3 budget draft.",
+                        sender="Priya Sharma <priya@acme.com>", participants=["Priya Sharma <priya@acme.com>"]),
+            make_record("gmail", "2", "From: Tom\nSubject: Budget\nComments on the budget.",
+                        sender="Tom Baker <tom@acme.com>",
+                        participants=["Tom Baker <tom@acme.com>", "Priya Sharma <priya@acme.com>"]),
+            make_record("notion", "3", "Budget planning page"),
+        ]
+        self.index = EntityIndex(self.records)
+
+    def test_mentions_prefer_full_names(self):
+        """Test a full name is matched once rather than as separate words"""
+        self.assertEqual(self.index.mentions("What did Priya Sharma send me?"), ["priya sharma"])
+        self.assertEqual(self.index.mentions("budget emails from acme"), ["acme"])
+        self.assertEqual(self.index.mentions("what is the budget?"), [])
+
+    def test_doc_ids_for(self):
+        """Test single, combined and missing entity mentions"""
+        self.assertEqual(self.index.doc_ids_for("what did priya send?"), {"gmail:1", "gmail:2"})
+        self.assertEqual(self.index.doc_ids_for("emails between Tom and Priya"), {"gmail:2"})
+        self.assertIsNone(self.index.doc_ids_for("what is the budget?"))
+
+    def test_vector_retrieval_is_restricted_to_entity(self):
+        """Test a question naming someone only searches that person's documents"""
+        documents = [to_document(r) for r in self.records]
+        vectorstore = FAISS.from_documents(documents, HashingEmbeddings(size=32), ids=document_ids(documents))
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=self.index,
+        )
+
+        result = retriever.invoke("what did Tom Baker say about the budget?")
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["2"])
+
+    def test_entity_and_time_restrictions_combine(self):
+        """Test a person and a time range narrow to their overlap"""
+        friday = datetime(2024, 5, 17, 9).timestamp()
+        records = [
+            make_record("gmail", "1", "Budget", timestamp=friday, sender="Tom Baker <tom@acme.com>"),
+            make_record("gmail", "2", "Budget", timestamp=friday, sender="priya@acme.com"),
+            make_record("gmail", "3", "Budget", timestamp=friday - 7 * 86400, sender="Tom Baker <tom@acme.com>"),
+        ]
+        documents = [to_document(r) for r in records]
+        vectorstore = FAISS.from_documents(documents, HashingEmbeddings(size=32), ids=document_ids(documents))
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=EntityIndex(records),
+        )
+
+        with patch('memory.time_index.parse_time_range', return_value=(friday - 3600, friday + 3600)):
+            result = retriever.invoke("budget from Tom Baker on Friday")
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["1"])
+
+    def test_time_range_kept_when_entity_is_outside_it(self):
+        """Test a person with no documents in the range does not lift the range"""
+        friday = datetime(2024, 5, 17, 9).timestamp()
+        records = [
+            make_record("gmail", "1", "Budget", timestamp=friday, sender="priya@acme.com"),
+            make_record("gmail", "2", "Budget", timestamp=friday - 7 * 86400, sender="tom@acme.com"),
+        ]
+        documents = [to_document(r) for r in records]
+        vectorstore = FAISS.from_documents(documents, HashingEmbeddings(size=32), ids=document_ids(documents))
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=EntityIndex(records),
+        )
+        index = LexicalIndex()
+        index.add_records(records)
+
+        with patch('memory.time_index.parse_time_range', return_value=(friday - 3600, friday + 3600)), \
+             patch('memory.lexical.parse_time_range', return_value=(friday - 3600, friday + 3600)):
+            vector_result = retriever.invoke("budget from tom on Friday")
+            lexical_result = index.as_retriever(entity_index=EntityIndex(records)).invoke("budget from tom on Friday")
+
+        self.assertEqual([doc.metadata["id"] for doc in vector_result], ["1"])
+        self.assertEqual([doc.metadata["id"] for doc in lexical_result], ["1"])
+
+    def test_lexical_retrieval_is_restricted_to_entity(self):
+        """Test BM25 retrieval honours entity mentions too"""
+        index = LexicalIndex()
+        index.add_records(self.records)
+        retriever = index.as_retriever(entity_index=EntityIndex(self.records[:1] + self.records[2:]))
+
+        result = retriever.invoke("budget from priya sharma")
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["1"])
+
+    def test_exact_only_for_full_names_and_addresses(self):
+        """Test only full names and addresses resolve as exact"""
+        self.assertEqual(self.index.resolve("what did priya sharma send?"), ({"gmail:1", "gmail:2"}, True))
+        self.assertEqual(self.index.resolve("mail from tom@acme.com"), ({"gmail:2"}, True))
+        self.assertEqual(self.index.resolve("what did priya send?"), ({"gmail:1", "gmail:2"}, False))
+        self.assertEqual(self.index.resolve("what is the budget?"), (None, False))
+
+    def test_first_name_boosts_without_filtering(self):
+        """Test a first name ranks that person's documents first but keeps the others"""
+        records = [
+            make_record("gmail", "1", "Team meeting moved to Thursday", sender="Dana <dana@acme.com>"),
+            make_record("gmail", "2", "Lunch plans", sender="Will Smith <will@acme.com>"),
+            make_record("calendar", "3", "Team meeting tomorrow", attendees=["Will Smith <will@acme.com>"]),
+            make_record("notion", "4", "Team meeting notes"),
+        ]
+        documents = [to_document(r) for r in records]
+        vectorstore = FAISS.from_documents(documents, HashingEmbeddings(size=32), ids=document_ids(documents))
+        entities = EntityIndex(records)
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(search_kwargs={"k": 2}),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=entities,
+            k=3,
+        )
+        lexical = LexicalIndex()
+        lexical.add_records(records)
+
+        self.assertIsNone(entities.doc_ids_for("will I have a team meeting tomorrow?"))
+        vector_ids = [doc.metadata["id"] for doc in retriever.invoke("team meeting with smith")]
+        lexical_retriever = lexical.as_retriever(entity_index=entities)
+        lexical_ids = [doc.metadata["id"] for doc in lexical_retriever.invoke("team meeting with smith")]
+
+        self.assertEqual(vector_ids[0], "3")
+        self.assertEqual(len(vector_ids), 3)
+        self.assertEqual(lexical_ids[0], "3")
+        self.assertIn("1", lexical_ids)
+
+    def test_entity_positions_are_cached_and_follow_appends(self):
+        """Test a repeated entity skips the docstore and a boosted search skips the base retriever"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        records = [
+            make_record("gmail", "1", "Offsite venue options", sender="Will Smith <will@acme.com>"),
+            make_record("gmail", "2", "Lunch plans for Friday", sender="Dana Lee <dana@acme.com>"),
+            make_record("notion", "3", "Offsite agenda draft"),
+        ]
+        with patch('builtins.print'):
+            vectorstore = build_vectorstore(records, HashingEmbeddings(size=32), os.path.join(tmp.name, "docstore.sqlite"))
+        entities = EntityIndex(records)
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(search_kwargs={"k": 3}),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+            entity_index=entities,
+            k=3,
+        )
+        later = make_record("gmail", "4", "Offsite budget from Will", sender="Will Smith <will@acme.com>")
+        # Entities can learn of a document before its vector is appended
+        entities.add_records([later])
+        retriever.invoke("what did smith say about the offsite?")
+        vectorstore.add_texts([later["text"]], metadatas=[later["metadata"]], ids=["gmail:4"])
+
+        with patch('memory.vectorstore.positions_for_ids', side_effect=AssertionError("looked up again")), \
+                patch.object(type(retriever.base_retriever), '_get_relevant_documents',
+                             side_effect=AssertionError("base search")):
+            ids = [doc.metadata["id"] for doc in retriever.invoke("what did smith say about the offsite?")]
+
+        self.assertEqual(set(ids[:2]), {"1", "4"})
+        self.assertEqual(len(ids), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import threading
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.records import make_record
+from memory.index_store import IndexStore
+
+
+class TestIndexStore(unittest.TestCase):
+    """Test WAL persistence, snapshots and crash recovery"""
+
+    def setUp(self):
+        """Create a temporary store root and silence progress output"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.embeddings = HashingEmbeddings(size=16)
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _records(self, start, count):
+        return [make_record("gmail", str(i), f"Email number {i} about budgets") for i in range(start, start + count)]
+
+    def _open(self, **kwargs):
+        return IndexStore.open(self.root, self.embeddings, fsync=False, **kwargs)
+
+    def test_recovery_replays_log_without_snapshot(self):
+        """Test a store reopened after a crash replays the whole log"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 3))
+        store.delete(["gmail:1"])
+
+        with patch.object(self.embeddings, 'embed_documents', side_effect=AssertionError("re-embedded")):
+            recovered = self._open(snapshot_every=0)
+
+        self.assertEqual(len(recovered), 2)
+        self.assertIn("gmail:0", recovered)
+        self.assertNotIn("gmail:1", recovered)
+        self.assertEqual(recovered.vectorstore.similarity_search("budgets", k=5)[0].metadata["source"], "gmail")
+
+    def test_snapshot_swaps_current_and_truncates_log(self):
+        """Test snapshots move CURRENT forward and only the tail is replayed"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 2))
+        store.snapshot()
+        store.add_records(self._records(2, 1))
+
+        with open(os.path.join(self.root, "CURRENT")) as f:
+            self.assertEqual(f.read(), "v000001")
+        with open(os.path.join(self.root, "wal.jsonl")) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        recovered = self._open(snapshot_every=0)
+        self.assertEqual(recovered.version, 1)
+        self.assertEqual(len(recovered), 3)
+        self.assertEqual(recovered.vectorstore.docstore.search("gmail:2").page_content, "Email number 2 about budgets")
+
+    def test_periodic_snapshot_and_pruning(self):
+        """Test snapshots are taken every N log entries and old ones pruned"""
+        store = self._open(snapshot_every=1)
+        for i in range(4):
+            store.add_records(self._records(i, 1))
+
+        self.assertEqual(store.version, 4)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "snapshots"))), ["v000003", "v000004"])
+
+    def test_torn_log_tail_is_ignored(self):
+        """Test a partially written final log line does not block recovery"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 2))
+        with open(os.path.join(self.root, "wal.jsonl"), "a") as f:
+            f.write('{"seq": 3, "op": "add", "ids": ["gmail:9"')
+
+        recovered = self._open(snapshot_every=0)
+
+        self.assertEqual(len(recovered), 2)
+
+    def test_writes_after_a_torn_tail_survive_the_next_restart(self):
+        """Test recovery cuts the torn line off, so later appends are not glued onto it"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 1))
+        with open(os.path.join(self.root, "wal.jsonl"), "a") as f:
+            f.write('{"seq": 2, "op": "add", "ids": ["gmail:9"')
+        recovered = self._open(snapshot_every=0)
+        recovered.add_records(self._records(1, 1))
+
+        restarted = self._open(snapshot_every=0)
+
+        self.assertEqual(len(restarted), 2)
+        self.assertIn("gmail:1", restarted)
+
+    def test_existing_ids_are_skipped_or_rejected(self):
+        """Test add_records is incremental and duplicates never reach the log"""
+        store = self._open(snapshot_every=0)
+        self.assertEqual(len(store.add_records(self._records(0, 2))), 2)
+        self.assertEqual(store.add_records(self._records(0, 3)), ["gmail:2"])
+
+        with self.assertRaises(ValueError):
+            store.add_documents([store.vectorstore.docstore.search("gmail:0")], ids=["gmail:0"])
+        self.assertEqual(len(self._open(snapshot_every=0)), 3)
+
+    def test_deletes_are_tombstoned_and_filtered(self):
+        """Test deleted rows stay in FAISS but never come back from search"""
+        store = self._open(snapshot_every=0, compact_ratio=0)
+        store.add_records(self._records(0, 4))
+        store.delete(["gmail:1", "gmail:2"])
+
+        self.assertEqual(store.vectorstore.index.ntotal, 4)
+        self.assertEqual(len(store), 2)
+        results = store.vectorstore.similarity_search("budgets", k=4)
+        self.assertEqual(sorted(doc.metadata["id"] for doc in results), ["0", "3"])
+
+        # A deleted id can be indexed again, e.g. when a source updates a document
+        store.add_records(self._records(1, 1))
+        results = store.vectorstore.similarity_search("budgets", k=4)
+        self.assertEqual(sorted(doc.metadata["id"] for doc in results), ["0", "1", "3"])
+
+    def test_changed_version_replaces_document(self):
+        """Test a record is re-embedded only when its version changes"""
+        store = self._open(snapshot_every=0, compact_ratio=0)
+        thread = make_record("gmail", "t1", "Budget thread", version="100")
+        store.add_records([thread])
+
+        with patch.object(self.embeddings, 'embed_documents', side_effect=AssertionError("re-embedded")):
+            self.assertEqual(store.add_records([thread]), [])
+
+        updated = make_record("gmail", "t1", "Budget thread with a new reply", version="101")
+        self.assertEqual(store.add_records([updated]), ["gmail:t1"])
+        self.assertEqual(len(store), 1)
+        results = store.vectorstore.similarity_search("budget", k=4)
+        self.assertEqual([doc.page_content for doc in results], ["Budget thread with a new reply"])
+        self.assertEqual(len(self._open(snapshot_every=0)), 1)
+
+    def test_background_compaction_past_ratio(self):
+        """Test compaction drops tombstoned rows once the ratio passes the threshold"""
+        store = self._open(snapshot_every=0, compact_ratio=0.5)
+        store.add_records(self._records(0, 4))
+        store.delete(["gmail:0"])
+        store.wait_for_compaction()
+        self.assertEqual(store.vectorstore.index.ntotal, 4)
+
+        store.delete(["gmail:1"])
+        store.wait_for_compaction()
+
+        self.assertEqual(store.vectorstore.index.ntotal, 2)
+        self.assertEqual(store.vectorstore.tombstones, set())
+        self.assertEqual(store.vectorstore.generation, 1)
+        results = store.vectorstore.similarity_search("budgets", k=4)
+        self.assertEqual(sorted(doc.metadata["id"] for doc in results), ["2", "3"])
+
+    def test_snapshot_compacts_first(self):
+        """Test snapshots never persist tombstoned rows"""
+        store = self._open(snapshot_every=0, compact_ratio=0)
+        store.add_records(self._records(0, 3))
+        store.delete(["gmail:0"])
+        store.snapshot()
+
+        recovered = self._open(snapshot_every=0, compact_ratio=0)
+        self.assertEqual(recovered.vectorstore.index.ntotal, 2)
+        self.assertEqual(recovered.vectorstore.docstore.search("gmail:2").metadata["id"], "2")
+
+    def test_compaction_waits_for_searches(self):
+        """Test compaction cannot shift rows under a search holding the read lock"""
+        store = self._open(snapshot_every=0, compact_ratio=0)
+        store.add_records(self._records(0, 3))
+        store.delete(["gmail:0"])
+
+        with store.vectorstore.rwlock.read():
+            compactor = threading.Thread(target=store.compact)
+            compactor.start()
+            compactor.join(0.2)
+            self.assertTrue(compactor.is_alive())
+            self.assertEqual(store.vectorstore.index.ntotal, 3)
+            # Reads stay reentrant while the compactor waits
+            self.assertEqual(len(store.vectorstore.similarity_search("budgets", k=4)), 2)
+        compactor.join()
+
+        self.assertEqual(store.vectorstore.index.ntotal, 2)
+
+    def test_appends_wait_for_searches(self):
+        """Test an append cannot grow the index under a search holding the read lock"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 2))
+
+        with store.vectorstore.rwlock.read():
+            writer = threading.Thread(target=store.add_records, args=(self._records(2, 1),))
+            writer.start()
+            writer.join(0.2)
+            self.assertTrue(writer.is_alive())
+            self.assertEqual(store.vectorstore.index.ntotal, 2)
+            self.assertEqual(len(store.vectorstore.index_to_docstore_id), 2)
+        writer.join()
+
+        self.assertEqual(store.vectorstore.index.ntotal, 3)
+        self.assertIn("gmail:2", store)
+
+    def test_write_inside_read_is_rejected(self):
+        """Test a thread cannot upgrade its read lock into a deadlock"""
+        store = self._open(snapshot_every=0)
+        store.add_records(self._records(0, 1))
+
+        with store.vectorstore.rwlock.read():
+            with self.assertRaises(RuntimeError):
+                store.vectorstore.delete(["gmail:0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
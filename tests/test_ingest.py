@@ -0,0 +1,170 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.records import make_record
+from memory.dedupe import NearDuplicateIndex
+from memory.entities import EntityIndex
+from memory.index_store import IndexStore
+from memory.ingest import (
+    IndexedLookup, SegmentFollower, SegmentWriter, ingest_records, read_applied, read_manifest,
+)
+from memory.lexical import LexicalIndex
+
+
+class TestIngestSegments(unittest.TestCase):
+    """Test segments handed from the ingest worker to the chat process"""
+
+    def setUp(self):
+        """Create a segments root and a chat-side index store"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.root = os.path.join(self.tmp.name, "segments")
+        self.store = IndexStore.open(os.path.join(self.tmp.name, "index"), HashingEmbeddings(size=16), fsync=False)
+        self.records = [
+            make_record("gmail", "m1", "Budget approval for the offsite", 100, sender="Priya <priya@acme.com>"),
+            make_record("notion", "p1", "Offsite packing list", 200),
+        ]
+
+    def _live_docstore(self):
+        return os.path.join(self.tmp.name, "index", "live", "docstore.sqlite")
+
+    def test_writer_publishes_numbered_segments(self):
+        """Test each write adds a segment directory and bumps the manifest version"""
+        writer = SegmentWriter(self.root, HashingEmbeddings(size=16))
+
+        writer.write(self.records[:1], self.records[:1])
+        writer.write(self.records[1:], self.records[1:])
+
+        self.assertEqual(read_manifest(self.root), {"version": 2, "segments": ["s000001", "s000002"]})
+        for name in ("records.jsonl", "indexed.jsonl", "index.faiss", "meta.json"):
+            self.assertTrue(os.path.exists(os.path.join(self.root, "s000002", name)))
+        self.assertEqual(SegmentWriter(self.root).version, 2)
+
+    def test_follower_adds_vectors_without_embedding(self):
+        """Test the chat side copies segment vectors instead of re-embedding"""
+        SegmentWriter(self.root, HashingEmbeddings(size=16)).write(self.records, self.records)
+        entities = EntityIndex()
+        follower = SegmentFollower(self.root, self.store, (entities,))
+
+        with patch.object(self.store.embeddings, 'embed_documents', side_effect=AssertionError("re-embedded")):
+            self.assertEqual(follower.poll(), 1)
+
+        self.assertIn("gmail:m1", self.store)
+        self.assertIn("notion:p1", self.store)
+        self.assertEqual(self.store.vectorstore.similarity_search("packing list", k=1)[0].metadata["id"], "p1")
+        self.assertEqual(entities.doc_ids_for("what did priya send"), {"gmail:m1"})
+
+    def test_applied_segments_are_not_reapplied(self):
+        """Test APPLIED survives a restart and the worker prunes applied segments"""
+        writer = SegmentWriter(self.root, HashingEmbeddings(size=16))
+        writer.write(self.records[:1], self.records[:1])
+        SegmentFollower(self.root, self.store).poll()
+
+        restarted = SegmentFollower(self.root, self.store)
+        writer.write(self.records[1:], self.records[1:])
+
+        self.assertEqual(read_applied(self.root), 1)
+        self.assertEqual(read_manifest(self.root)["segments"], ["s000002"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "s000001")))
+        self.assertEqual(restarted.poll(), 1)
+        self.assertEqual(restarted.poll(), 0)
+        self.assertEqual(len(self.store), 2)
+
+    def test_failing_segment_is_quarantined_after_retries(self):
+        """Test a segment that keeps failing is moved aside so later segments still apply"""
+        writer = SegmentWriter(self.root, HashingEmbeddings(size=16))
+        writer.write(self.records[:1], self.records[:1])
+        writer.write(self.records[1:], self.records[1:])
+        entities = EntityIndex()
+        follower = SegmentFollower(self.root, self.store, (entities,), retries=2)
+
+        with patch.object(entities, 'add_records', side_effect=[ValueError("bad segment"), ValueError("bad segment"), None]):
+            self.assertEqual(follower.poll(), 0)
+            self.assertEqual(read_applied(self.root), 0)
+            self.assertEqual(follower.poll(), 1)
+
+        self.assertEqual(read_applied(self.root), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "failed-s000001")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "s000001")))
+        self.assertIn("notion:p1", self.store)
+        self.assertEqual(follower.poll(), 0)
+
+    def test_ingest_skips_indexed_and_duplicate_records(self):
+        """Test the worker only embeds records the chat process has not indexed"""
+        self.store.add_records(self.records[:1])
+        indexed = IndexedLookup([self._live_docstore()])
+        self.addCleanup(indexed.close)
+        records = self.records + [
+            make_record("notion", "p2", "Offsite packing list", 300),
+        ]
+        writer = SegmentWriter(self.root, HashingEmbeddings(size=16))
+
+        with patch.object(writer.embeddings, 'embed_documents', wraps=writer.embeddings.embed_documents) as embed:
+            ingest_records(writer, records, indexed, NearDuplicateIndex())
+
+        self.assertEqual(embed.call_count, 1)
+        self.assertEqual(len(embed.call_args.args[0]), 1)
+        SegmentFollower(self.root, self.store).poll()
+        self.assertIn("notion:p2", self.store)
+        self.assertNotIn("notion:p1", self.store)
+
+    def test_indexed_lookup_never_writes_to_the_chat_docstore(self):
+        """Test the worker reads the chat process's docstore through a read-only connection"""
+        self.store.add_records(self.records[:1])
+        indexed = IndexedLookup([self._live_docstore()])
+        self.addCleanup(indexed.close)
+
+        self.store.add_records(self.records[1:])
+
+        self.assertIn("gmail:m1", indexed)
+        self.assertIn("notion:p1", indexed)
+        self.assertEqual(indexed.metadata("notion:p1")["id"], "p1")
+        with self.assertRaises(sqlite3.OperationalError):
+            indexed._docstores[0]._conn.execute("DELETE FROM docs")
+
+    def test_ingest_consumes_records_in_batches(self):
+        """Test a streaming loader is read one segment at a time"""
+        consumed = []
+
+        def load():
+            for i in range(5):
+                consumed.append(i)
+                yield make_record("notion", f"p{i}", f"Page {i}", 100 + i)
+
+        writer = SegmentWriter(self.root, HashingEmbeddings(size=16))
+        sizes = []
+        original = writer.write
+
+        def write(records, indexed):
+            sizes.append((len(records), len(consumed)))
+            return original(records, indexed)
+
+        with patch.object(writer, 'write', side_effect=write):
+            names = ingest_records(writer, load(), IndexedLookup([]), batch_size=2)
+
+        self.assertEqual(len(names), 3)
+        self.assertEqual(sizes, [(2, 2), (2, 4), (1, 5)])
+
+    def test_lexical_follower_indexes_records(self):
+        """Test segments written without an embedder feed a lexical index"""
+        SegmentWriter(self.root).write(self.records, self.records)
+        index = LexicalIndex()
+
+        SegmentFollower(self.root, index, use_vectors=False).poll()
+
+        self.assertEqual(len(index), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import subprocess
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.records import make_record
+from memory.lexical import LexicalIndex, build_lexical_index, tokenize
+from memory.vectorstore import build_vectorstore, load_embeddings
+
+
+class TestLexicalIndex(unittest.TestCase):
+    """Test the BM25 inverted index used by lexical-only mode"""
+
+    def setUp(self):
+        """Set up a small mixed-source corpus"""
+        self.records = [
+            make_record("gmail", "1", "From: alice\nSubject: Budget review\nContent: The Q3 budget is due Friday.",
+                        timestamp=1715936400),
+            make_record("calendar", "2", "Event: Dentist appointment", timestamp=1716195600),
+            make_record("notion", "3", "Roadmap planning notes for the budget offsite"),
+        ]
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tokenize_drops_stopwords_and_punctuation(self):
+        """Test tokens are lowercased content words"""
+        self.assertEqual(tokenize("What is the Budget?"), ["budget"])
+        self.assertEqual(tokenize("Due Friday."), ["due", "friday"])
+
+    def test_search_ranks_by_bm25(self):
+        """Test the document repeating the query term ranks first"""
+        index = build_lexical_index(self.records)
+
+        results = index.search("budget review", k=3)
+
+        self.assertEqual([doc.metadata["id"] for doc, _ in results], ["1", "3"])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(index.search("nothing matches", k=3), [])
+
+    def test_delete_and_incremental_add(self):
+        """Test deleted documents disappear and only new ids are added"""
+        index = build_lexical_index(self.records)
+        index.delete(["gmail:1"])
+
+        self.assertEqual([doc.metadata["id"] for doc, _ in index.search("budget")], ["3"])
+        self.assertEqual(index.add_records(self.records), ["gmail:1"])
+        self.assertEqual(len(index), 3)
+
+    def test_retriever_restricts_to_time_slice(self):
+        """Test temporal queries only search documents inside the range"""
+        index = build_lexical_index(self.records)
+        retriever = index.as_retriever(search_kwargs={"k": 2})
+
+        with patch('memory.lexical.parse_time_range', return_value=(1716190000, 1716200000)):
+            result = retriever.invoke("appointment or budget")
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["2"])
+
+    def test_save_and_open_round_trip(self):
+        """Test a saved index reopens with the same contents"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.pkl")
+            index = LexicalIndex.open(path)
+            index.add_records(self.records)
+            index.save()
+
+            reopened = LexicalIndex.open(path)
+
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual(reopened.search("dentist")[0][0].metadata["id"], "2")
+
+    def test_failed_embeddings_fall_back_to_lexical(self):
+        """Test a failing embedding model yields a lexical index, not random vectors"""
+        with patch('memory.vectorstore.load_backend', side_effect=OSError("no model")):
+            self.assertIsNone(load_embeddings("huggingface"))
+            index = build_vectorstore(self.records)
+
+        self.assertIsInstance(index, LexicalIndex)
+        self.assertEqual(index.search("dentist")[0][0].metadata["id"], "2")
+
+    def test_lexical_path_never_imports_torch(self):
+        """Test the modules lexical mode needs load without torch"""
+        code = (
+            "import sys, main, memory.lexical, memory.rag_chain; "
+            "print('torch' in sys.modules or 'sentence_transformers' in sys.modules)"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+        self.assertEqual(output.stdout.strip().splitlines()[-1], "False", output.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.llms.fake import FakeListLLM
+from langchain_core.outputs import Generation
+
+from memory.llm_cache import LazyLLMCache, SQLiteLLMCache, ollama_model_digest
+from telemetry import registry
+
+
+class TestLLMCache(unittest.TestCase):
+    """Test the persistent temperature-0 completion cache"""
+
+    def setUp(self):
+        """Create a cache file in a temporary directory"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "llm.sqlite")
+        registry.reset()
+
+    def test_repeated_prompt_skips_the_llm(self):
+        """Test an identical prompt is served from the cache"""
+        cache = SQLiteLLMCache(self.path, "llama3.2@abc")
+        llm = FakeListLLM(responses=["first", "second"], cache=cache)
+
+        self.assertEqual(llm.invoke("What is on Friday?"), "first")
+        self.assertEqual(llm.invoke("What is on Friday?"), "first")
+        self.assertEqual(llm.invoke("Something else"), "second")
+        self.assertEqual(registry.counter("llm_cache_hits", namespace="llama3.2@abc"), 1)
+        self.assertEqual(registry.counter("llm_cache_misses", namespace="llama3.2@abc"), 2)
+
+    def test_entries_persist_and_are_keyed_on_model_version(self):
+        """Test entries survive reopening but not a model digest change"""
+        SQLiteLLMCache(self.path, "llama3.2@abc").update("prompt", "params", [Generation(text="answer")])
+
+        self.assertEqual(SQLiteLLMCache(self.path, "llama3.2@abc").lookup("prompt", "params")[0].text, "answer")
+        self.assertIsNone(SQLiteLLMCache(self.path, "llama3.2@def").lookup("prompt", "params"))
+        self.assertIsNone(SQLiteLLMCache(self.path, "llama3.2@abc").lookup("prompt", "other params"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test the cache stays within max_entries, keeping recently used prompts"""
+        cache = SQLiteLLMCache(self.path, max_entries=2)
+        with patch('memory.llm_cache.time.time', side_effect=[1, 2, 3, 4]):
+            cache.update("a", "p", [Generation(text="A")])
+            cache.update("b", "p", [Generation(text="B")])
+            cache.lookup("a", "p")
+            cache.update("c", "p", [Generation(text="C")])
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.lookup("a", "p"))
+        self.assertIsNone(cache.lookup("b", "p"))
+
+    def test_lazy_cache_opens_on_first_completion(self):
+        """Test building an LLM with the cache neither creates the file nor asks Ollama"""
+        with patch('memory.llm_cache.ollama_model_digest', return_value="abc") as digest:
+            cache = LazyLLMCache("llama3.2", self.path)
+            llm = FakeListLLM(responses=["first", "second"], cache=cache)
+
+            self.assertFalse(os.path.exists(self.path))
+            digest.assert_not_called()
+
+            self.assertEqual(llm.invoke("What is on Friday?"), "first")
+            self.assertEqual(llm.invoke("What is on Friday?"), "first")
+
+        digest.assert_called_once_with("llama3.2")
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(registry.counter("llm_cache_hits", namespace="llama3.2@abc"), 1)
+
+    def test_digest_unknown_when_ollama_unreachable(self):
+        """Test cache keys still work without a running Ollama server"""
+        with patch('memory.llm_cache.urllib.request.urlopen', side_effect=OSError("refused")):
+            self.assertEqual(ollama_model_digest("llama3.2"), "unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,12 @@ import unittest
 from unittest.mock import patch, MagicMock, mock_open
 import sys
 import os
+import base64
 
 # Add the parent directory to the path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from loaders.gmail_loader import load_gmail_emails
+from loaders.gmail_loader import load_gmail_emails, load_gmail_records, strip_quoted, thread_record
 from loaders.notion_loader import load_notion_pages
 from loaders.calendar_loader import load_calendar_events
 
@@ -162,6 +163,28 @@ class TestLoaders(unittest.TestCase):
         self.assertEqual(result[1], 'Meeting 2')
         self.assertEqual(result[2], 'No title')
     
+    @patch('loaders.gmail_loader.build')
+    @patch('loaders.gmail_loader.Credentials')
+    @patch('loaders.gmail_loader.os.path.exists')
+    @patch.dict(os.environ, {'GOOGLE_CLIENT_SECRET_FILE': 'test_credentials.json', 'RAW_MIRROR': 'false'})
+    def test_gmail_loader_reads_threads(self, mock_exists, mock_credentials, mock_build):
+        """Test Gmail is loaded one record per thread"""
+        mock_exists.return_value = True
+        mock_credentials.from_authorized_user_file.return_value = MagicMock(valid=True)
+        mock_service = MagicMock()
+        mock_build.return_value = mock_service
+        mock_service.users().threads().list().execute.return_value = {'threads': [{'id': 't1'}]}
+        mock_service.users().threads().get().execute.return_value = _thread(
+            "t1", "7", [("alice", "Budget", "Draft attached."), ("bob", "Re: Budget", "Looks good.")]
+        )
+
+        with patch('builtins.print'):
+            records = list(load_gmail_records())
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["metadata"]["id"], "t1")
+        self.assertEqual(records[0]["metadata"]["message_count"], 2)
+
     def test_error_handling(self):
         """Test error handling in loaders"""
         # Test with missing environment variables
@@ -170,5 +193,68 @@ class TestLoaders(unittest.TestCase):
                 load_notion_pages()
 
 
+def _message(sender, subject, body, date):
+    data = base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii").rstrip("=")
+    return {
+        'internalDate': str(date),
+        'snippet': body[:20],
+        'payload': {
+            'mimeType': 'multipart/alternative',
+            'headers': [{'name': 'From', 'value': sender}, {'name': 'Subject', 'value': subject}],
+            'parts': [{'mimeType': 'text/plain', 'body': {'data': data}}],
+        },
+    }
+
+
+def _thread(thread_id, history_id, messages):
+    return {
+        'id': thread_id,
+        'historyId': history_id,
+        'messages': [_message(*message, 1715590800000 + i * 60000) for i, message in enumerate(messages)],
+    }
+
+
+class TestGmailThreads(unittest.TestCase):
+    """Test thread-level Gmail records"""
+
+    def test_strip_quoted_reply_text(self):
+        """Test quoted replies, reply headers and signatures are dropped"""
+        body = "Sounds good, see you Friday.\r\n\r\n-- \r\nBob\r\n"
+        self.assertEqual(strip_quoted(body), "Sounds good, see you Friday.")
+        body = (
+            "Moved to 3pm.\n\nOn Mon, May 13, 2024 at 10:00 AM Alice <alice@example.com>\nwrote:\n"
+            "> Can we meet at 2?\n> Thanks"
+        )
+        self.assertEqual(strip_quoted(body), "Moved to 3pm.")
+        self.assertEqual(strip_quoted("Yes.\n> earlier text\nAgreed."), "Yes.\nAgreed.")
+
+    def test_thread_record_combines_messages(self):
+        """Test a thread becomes one record without repeated quoted text"""
+        record = thread_record(_thread("t1", "42", [
+            ("alice@example.com", "Budget", "Draft budget attached."),
+            ("bob@example.com", "Re: Budget", "Looks good.\n\nOn Mon Alice wrote:\n> Draft budget attached."),
+        ]))
+
+        self.assertEqual(record["text"].count("Draft budget attached."), 1)
+        self.assertIn("From: bob@example.com\nLooks good.", record["text"])
+        metadata = record["metadata"]
+        self.assertEqual((metadata["id"], metadata["thread_id"], metadata["version"]), ("t1", "t1", "42"))
+        self.assertEqual(metadata["subject"], "Budget")
+        self.assertEqual(metadata["sender"], "bob@example.com")
+        self.assertEqual(metadata["timestamp"], 1715590860.0)
+
+    def test_long_thread_keeps_first_and_newest(self):
+        """Test very long threads keep the opening message and the latest replies"""
+        messages = [("alice", "Plan", "Opening message.")] + [
+            ("bob", "Re: Plan", f"Reply {i} " + "x" * 500) for i in range(20)
+        ]
+        text = thread_record(_thread("t2", "1", messages))["text"]
+
+        self.assertIn("Opening message.", text)
+        self.assertIn("Reply 19", text)
+        self.assertNotIn("Reply 0 ", text)
+        self.assertIn("earlier messages omitted", text)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.gmail_loader import iter_thread_records, thread_record
+from loaders.mime import attachments, html_to_text, message_body, pdf_text
+
+
+def encode(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def make_pdf(text):
+    import pymupdf
+    document = pymupdf.open()
+    document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def message(parts, message_id="m1"):
+    return {
+        'id': message_id,
+        'internalDate': '1715590800000',
+        'snippet': 'snippet only',
+        'payload': {
+            'mimeType': 'multipart/mixed',
+            'headers': [{'name': 'From', 'value': 'alice'}, {'name': 'Subject', 'value': 'Invoice'}],
+            'parts': parts,
+        },
+    }
+
+
+class TestMimeExtraction(unittest.TestCase):
+    """Test body and attachment extraction from Gmail payloads"""
+
+    def test_html_to_text(self):
+        """Test markup, scripts and entities are removed"""
+        markup = "<html><head><style>p {}</style></head><body><p>Hi&nbsp;Bob,</p><div>Total: &pound;40</div>" \
+                 "<script>track()</script></body></html>"
+        self.assertEqual(html_to_text(markup), "Hi Bob,\n\nTotal: £40")
+
+    def test_plain_text_is_preferred(self):
+        """Test text/plain wins over the HTML alternative"""
+        payload = {'mimeType': 'multipart/alternative', 'parts': [
+            {'mimeType': 'text/html', 'body': {'data': encode("<p>HTML version</p>")}},
+            {'mimeType': 'text/plain', 'body': {'data': encode("Plain version")}},
+        ]}
+        self.assertEqual(message_body(payload), "Plain version")
+
+    def test_html_only_body_is_converted(self):
+        """Test HTML-only newsletters still yield their full text"""
+        payload = {'mimeType': 'text/html', 'body': {'data': encode("<h1>News</h1><p>" + "word " * 100 + "</p>")}}
+        self.assertEqual(message_body(payload).count("word"), 100)
+
+    def test_huge_html_body_is_cut_before_parsing(self):
+        """Test only the first max_bytes of a body reach the HTML parser"""
+        markup = "<p>" + "word " * 100000 + "</p>"
+        payload = {'mimeType': 'text/html', 'body': {'data': encode(markup)}}
+
+        with patch('loaders.mime.html_to_text', wraps=html_to_text) as convert:
+            text = message_body(payload, max_bytes=1000)
+
+        self.assertEqual(len(convert.call_args.args[0]), 1000)
+        self.assertLessEqual(len(text), 1000)
+        self.assertTrue(text.startswith("word word"))
+
+    def test_pdf_attachment_text(self):
+        """Test PDF attachments are extracted and oversized ones skipped"""
+        pdf = make_pdf("Invoice total 40 pounds")
+        payload = {'parts': [
+            {'mimeType': 'application/pdf', 'filename': 'invoice.pdf', 'body': {'attachmentId': 'a1', 'size': len(pdf)}},
+            {'mimeType': 'application/pdf', 'filename': 'huge.pdf', 'body': {'attachmentId': 'a2', 'size': 10 ** 9}},
+        ]}
+
+        self.assertEqual([a["filename"] for a in attachments(payload)], ["invoice.pdf"])
+        self.assertIn("Invoice total 40 pounds", pdf_text(pdf))
+        self.assertEqual(pdf_text(b"not a pdf"), "")
+
+    def test_thread_record_includes_full_body_and_attachment(self):
+        """Test the whole body and PDF text are indexed, not the snippet"""
+        body = "Please find the invoice attached. " * 20
+        pdf = make_pdf("Invoice total 40 pounds")
+        record = thread_record({'id': 't1', 'historyId': '1', 'messages': [message([
+            {'mimeType': 'text/plain', 'body': {'data': encode(body)}},
+            {'mimeType': 'application/pdf', 'filename': 'invoice.pdf', 'body': {'data': encode(pdf), 'size': len(pdf)}},
+        ])]})
+
+        self.assertEqual(record["text"].count("Please find the invoice attached."), 20)
+        self.assertIn("Attachment invoice.pdf: Invoice total 40 pounds", record["text"])
+        self.assertNotIn("snippet only", record["text"])
+
+
+class TestThreadPipeline(unittest.TestCase):
+    """Test fetching threads and parsing them in worker processes"""
+
+    def setUp(self):
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pdf = make_pdf("Quarterly report figures")
+        self.service = MagicMock()
+        threads = {
+            f"t{i}": {'id': f"t{i}", 'historyId': str(i), 'messages': [message([
+                {'mimeType': 'text/plain', 'body': {'data': encode(f"Body of thread {i}")}},
+                {'mimeType': 'application/pdf', 'filename': 'report.pdf',
+                 'body': {'attachmentId': 'a1', 'size': len(self.pdf)}},
+            ], message_id=f"m{i}")]}
+            for i in range(3)
+        }
+        self.service.users().threads().get.side_effect = lambda userId, id, format: MagicMock(
+            execute=MagicMock(return_value=threads[id])
+        )
+        self.service.users().messages().attachments().get().execute.return_value = {'data': encode(self.pdf)}
+
+    def test_process_pool_parses_all_threads(self):
+        """Test every thread comes back from the worker pool with its attachment"""
+        records = list(iter_thread_records(self.service, ["t0", "t1", "t2"], workers=2))
+
+        self.assertEqual(sorted(r["metadata"]["id"] for r in records), ["t0", "t1", "t2"])
+        self.assertTrue(all("Quarterly report figures" in r["text"] for r in records))
+
+    def test_failed_fetch_skips_only_that_thread(self):
+        """Test one API error does not stop the other threads"""
+        get = self.service.users().threads().get.side_effect
+        self.service.users().threads().get.side_effect = lambda userId, id, format: (
+            MagicMock(execute=MagicMock(side_effect=RuntimeError("quota"))) if id == "t1" else get(userId, id, format)
+        )
+
+        records = list(iter_thread_records(self.service, ["t0", "t1", "t2"], workers=0))
+
+        self.assertEqual([r["metadata"]["id"] for r in records], ["t0", "t2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
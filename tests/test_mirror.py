@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.mirror import RawMirror, mirrored
+from loaders.records import make_record
+from memory.index_store import IndexStore
+from memory.writeback import MemoryWriter
+
+
+class TestRawMirror(unittest.TestCase):
+    """Test the local raw-data mirror and rebuilding the index from it"""
+
+    def setUp(self):
+        """Point the data directory at a temporary location"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.dict(os.environ, {"MEMORY_DATA_DIR": self.tmp.name, "RAW_MIRROR": "true"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        print_patcher = patch('builtins.print')
+        print_patcher.start()
+        self.addCleanup(print_patcher.stop)
+
+    def _records(self, count, subject="budgets"):
+        return [make_record("gmail", str(i), f"Email {i} about {subject}", timestamp=1700000000 + i)
+                for i in range(count)]
+
+    def test_put_upserts_by_source_and_id(self):
+        """Test refetched records replace their earlier version"""
+        mirror = RawMirror()
+        mirror.put(self._records(3))
+        mirror.put(self._records(2, subject="travel"))
+
+        records = list(mirror.records())
+        mirror.close()
+
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]["text"], "Email 0 about travel")
+        self.assertEqual(records[2]["metadata"], {"source": "gmail", "id": "2", "timestamp": 1700000002})
+
+    def test_records_filter_by_source(self):
+        """Test mirrored records can be read back for selected sources"""
+        mirror = RawMirror()
+        mirror.put(self._records(2) + [make_record("notion", "p1", "Roadmap")])
+
+        self.assertEqual([r["metadata"]["id"] for r in mirror.records(["notion"])], ["p1"])
+        mirror.close()
+
+    def test_records_exclude_sources(self):
+        """Test some sources can be left out when reading the mirror back"""
+        mirror = RawMirror()
+        mirror.put(self._records(2) + [make_record("chat", "c1", "A chat turn")])
+
+        self.assertEqual([r["metadata"]["id"] for r in mirror.records(exclude=("chat",))], ["0", "1"])
+        self.assertEqual([r["metadata"]["id"] for r in mirror.records(["chat", "gmail"], exclude=("gmail",))], ["c1"])
+        mirror.close()
+
+    def test_mirrored_loader_writes_records(self):
+        """Test decorated loaders copy their results into the mirror"""
+        load = mirrored(lambda: self._records(2))
+
+        self.assertEqual(len(load()), 2)
+        with patch.dict(os.environ, {"RAW_MIRROR": "false"}):
+            mirrored(lambda: [make_record("calendar", "e1", "Standup")])()
+
+        mirror = RawMirror()
+        self.assertEqual(len(mirror), 2)
+        mirror.close()
+
+    def test_mirror_errors_do_not_fail_the_loader(self):
+        """Test a data directory that cannot be created only warns"""
+        load = mirrored(lambda: self._records(2))
+
+        with patch('loaders.mirror.get_data_dir', side_effect=FileNotFoundError("mirror")):
+            self.assertEqual(len(load()), 2)
+
+    def test_mirrored_generator_writes_in_batches(self):
+        """Test a streaming loader is mirrored as it is consumed, a batch at a time"""
+        def load():
+            yield from self._records(5)
+
+        with patch('loaders.mirror.MIRROR_BATCH', 2), patch('loaders.mirror.RawMirror.put', autospec=True) as put:
+            records = list(mirrored(load)())
+
+        self.assertEqual(len(records), 5)
+        self.assertEqual([len(call.args[1]) for call in put.call_args_list], [2, 2, 1])
+
+    def test_rebuild_from_mirror_replaces_index(self):
+        """Test an index rebuilt from the mirror swaps in without touching the log"""
+        root = os.path.join(self.tmp.name, "index")
+        old = IndexStore.open(root, HashingEmbeddings(size=16), fsync=False)
+        old.add_records([make_record("notion", "stale", "Old page")])
+        old.close()
+
+        mirror = RawMirror()
+        mirror.put(self._records(5))
+        store = IndexStore.rebuild(root, HashingEmbeddings(size=16), mirror.records(), batch_size=2)
+        mirror.close()
+
+        self.assertEqual(len(store), 5)
+        self.assertNotIn("notion:stale", store)
+        self.assertEqual(store.version, 1)
+        self.assertEqual(os.path.getsize(os.path.join(root, "wal.jsonl")), 0)
+        self.assertFalse(os.path.exists(root + ".rebuild"))
+        store.close()
+
+    def test_remembered_facts_survive_a_rebuild(self):
+        """Test chat records are mirrored by the writer, so a rebuild indexes them again"""
+        root = os.path.join(self.tmp.name, "index")
+        store = IndexStore.open(root, HashingEmbeddings(size=16), fsync=False)
+        writer = MemoryWriter(store, flush_interval=0.05)
+        writer.remember("my locker code is 4412")
+        writer.close()
+        store.close()
+
+        mirror = RawMirror()
+        rebuilt = IndexStore.rebuild(root, HashingEmbeddings(size=16), mirror.records())
+        mirror.close()
+
+        docs = rebuilt.vectorstore.similarity_search("locker code", k=1)
+        self.assertIn("4412", docs[0].page_content)
+        self.assertEqual(docs[0].metadata["source"], "chat")
+        rebuilt.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
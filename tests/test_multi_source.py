@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import threading
+import time
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from loaders.records import make_record
+from memory.multi_source import MultiSourceSearch, build_multi_source_tool
+from memory.structured import StructuredIndex
+
+
+class TestMultiSourceSearch(unittest.TestCase):
+    """Test concurrent per-source retrieval and merging"""
+
+    def setUp(self):
+        """Build a structured index and a fake document retriever"""
+        self.tomorrow = datetime(2024, 5, 21, 10).timestamp()
+        self.index = StructuredIndex([
+            make_record("calendar", "e1", "Event: Design review", timestamp=self.tomorrow, title="Design review"),
+            make_record("gmail", "m1", "...", timestamp=100, sender="Alice", subject="Agenda for design review"),
+            make_record("gmail", "m2", "...", timestamp=200, sender="Bob", subject="Lunch"),
+            make_record("notion", "p1", "...", timestamp=50, title="Design review notes"),
+        ])
+        self.retriever = MagicMock()
+        self.retriever.invoke.return_value = [Document(page_content="Review moved to room 4")]
+
+    def test_plan_skips_calendar_without_time_or_event_words(self):
+        """Test the calendar is only searched when the question is about time or events"""
+        search = MultiSourceSearch(self.index, self.retriever)
+        self.assertEqual(list(search.plan("emails about lunch")), ["gmail", "notion", "documents"])
+        self.assertIn("calendar", search.plan("any email about my next meeting?"))
+
+    def test_merges_every_source(self):
+        """Test one observation carries results from all sources"""
+        search = MultiSourceSearch(self.index, self.retriever)
+        with patch('memory.multi_source.parse_time_range', return_value=(self.tomorrow - 60, self.tomorrow + 60)):
+            answer = search("did anyone email me about tomorrow's design review?")
+
+        self.assertIn("Calendar events:\n- Design review", answer)
+        self.assertIn("Agenda for design review", answer)
+        self.assertNotIn("Lunch", answer)
+        self.assertIn("Design review notes", answer)
+        self.assertIn("Related documents:\n- Review moved to room 4", answer)
+
+    def test_sources_run_concurrently(self):
+        """Test sub-queries overlap instead of running one after another"""
+        barrier = threading.Barrier(2, timeout=5)
+        search = MultiSourceSearch(max_workers=2)
+        search.plan = lambda query: {"a": barrier.wait, "b": barrier.wait}
+
+        start = time.perf_counter()
+        results = search.search("question")
+
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(set(results), {"a", "b"})
+
+    def test_failed_source_does_not_sink_the_rest(self):
+        """Test one failing source is reported while others still answer"""
+        self.retriever.invoke.side_effect = RuntimeError("index offline")
+        answer = MultiSourceSearch(self.index, self.retriever)("emails about lunch")
+
+        self.assertIn("Lunch", answer)
+        self.assertIn("lookup failed: index offline", answer)
+
+    def test_tool_wraps_search(self):
+        """Test the agent tool is named and callable"""
+        tool = build_multi_source_tool(self.index)
+        self.assertEqual(tool.name, "Search_All_Sources")
+        self.assertIn("Lunch", tool.func("lunch with bob"))
+
+
+if __name__ == '__main__':
+    unittest.main()
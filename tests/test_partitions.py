@@ -0,0 +1,174 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.records import make_record
+from memory.partitions import PartitionMap, PartitionedRetriever, plan_sources
+from memory.vectorstore import build_vectorstore
+
+
+class TestPartitionedSearch(unittest.TestCase):
+    """Test per-source partitions and scatter-gather retrieval"""
+
+    def setUp(self):
+        """Build a small multi-source store in a temporary directory"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.march = datetime(2024, 3, 10).timestamp()
+        self.may = datetime(2024, 5, 10).timestamp()
+        records = [
+            make_record("gmail", "m1", "Budget approval for the offsite", self.march),
+            make_record("gmail", "m2", "Lunch on Thursday", self.may),
+            make_record("gmail", "m3", "Budget numbers for the quarter", self.may),
+            make_record("notion", "p1", "Offsite budget planning page", self.may),
+            make_record("calendar", "e1", "Budget review meeting", self.may),
+        ]
+        self.vectorstore = build_vectorstore(
+            records, HashingEmbeddings(size=64), os.path.join(self.tmp.name, "docstore.sqlite")
+        )
+
+    def _retriever(self, k=3, **kwargs):
+        return PartitionedRetriever(vectorstore=self.vectorstore, partitions=PartitionMap(self.vectorstore, **kwargs), k=k)
+
+    def test_plan_sources(self):
+        """Test only questions that name a source are confined to it"""
+        self.assertEqual(plan_sources("notion pages about the offsite"), {"notion"})
+        self.assertEqual(plan_sources("any email about my next meeting?"), {"gmail", "calendar"})
+        self.assertIsNone(plan_sources("what is the budget?"))
+        self.assertIsNone(plan_sources("do you remember what Priya sent me about the offsite?"))
+
+    def test_partitions_group_rows_by_source(self):
+        """Test every live row lands in its source's partition"""
+        partitions = PartitionMap(self.vectorstore).partitions()
+
+        self.assertEqual(
+            {key: count for key, (count, _) in partitions.items()},
+            {("gmail", None): 3, ("notion", None): 1, ("calendar", None): 1},
+        )
+
+    def test_merged_results_match_flat_search(self):
+        """Test scatter-gather over every partition ranks like one flat search"""
+        expected = [doc.metadata["id"] for doc in self.vectorstore.similarity_search("budget offsite", k=3)]
+
+        docs = self._retriever().invoke("budget offsite")
+
+        self.assertEqual([doc.metadata["id"] for doc in docs], expected)
+
+    def test_source_question_searches_only_its_partition(self):
+        """Test a Notion question never scores email or calendar rows"""
+        retriever = self._retriever()
+
+        with patch.object(PartitionedRetriever, '_search', autospec=True, side_effect=PartitionedRetriever._search) as spy:
+            docs = retriever.invoke("notion page about the budget")
+
+        self.assertEqual([call.args[1] for call in spy.call_args_list], [("notion", None)])
+        self.assertEqual([doc.metadata["id"] for doc in docs], ["p1"])
+
+    def test_chat_partition_is_searched_alongside_named_sources(self):
+        """Test chat turns never confine a question, and join every source-restricted plan"""
+        self.vectorstore.add_texts(
+            ["The user asked to remember the notion budget page"],
+            metadatas=[{"source": "chat", "id": "c1", "timestamp": self.may}], ids=["chat:c1"],
+        )
+        partitions = PartitionMap(self.vectorstore)
+
+        self.assertEqual(set(partitions.plan("notion page about the budget")), {("notion", None), ("chat", None)})
+        self.assertEqual(len(partitions.plan("do you remember what Priya sent me about the offsite?")), 4)
+
+    def test_map_follows_deletes_and_appends(self):
+        """Test tombstoned rows drop out and new rows join their partition"""
+        retriever = self._retriever(k=5)
+        retriever.invoke("budget")
+
+        self.vectorstore.delete(["gmail:m3"])
+        self.vectorstore.add_texts(["Notion budget wiki"], metadatas=[{"source": "notion", "id": "p2"}], ids=["notion:p2"])
+        ids = {doc.metadata["id"] for doc in retriever.invoke("budget")}
+
+        self.assertNotIn("m3", ids)
+        self.assertIn("p2", ids)
+        self.assertEqual(retriever.partitions.partitions()[("notion", None)][0], 2)
+
+    def test_appends_and_deletes_update_the_map_in_place(self):
+        """Test changes after the first build flip bits instead of rescanning every row"""
+        partitions = PartitionMap(self.vectorstore)
+        partitions.partitions()
+
+        with patch.object(PartitionMap, '_entries', side_effect=AssertionError("rebuilt")):
+            self.vectorstore.delete(["gmail:m3"])
+            self.vectorstore.add_texts(
+                [f"Notion page {i}" for i in range(20)],
+                metadatas=[{"source": "notion", "id": f"p{i + 2}"} for i in range(20)],
+                ids=[f"notion:p{i + 2}" for i in range(20)],
+            )
+            counts = {key: count for key, (count, _) in partitions.partitions().items()}
+
+        self.assertEqual(counts, {("gmail", None): 2, ("notion", None): 21, ("calendar", None): 1})
+        retriever = PartitionedRetriever(vectorstore=self.vectorstore, partitions=partitions, k=30)
+        ids = [doc.metadata["id"] for doc in retriever.invoke("notion pages")]
+        self.assertEqual(len(ids), 21)
+        self.assertIn("p21", ids)
+
+    def test_compaction_rebuilds_the_map(self):
+        """Test compaction, which shifts row positions, triggers one rebuild"""
+        partitions = PartitionMap(self.vectorstore)
+        partitions.partitions()
+        self.vectorstore.delete(["gmail:m1"])
+        self.vectorstore.compact()
+
+        with patch.object(PartitionMap, '_entries', autospec=True, side_effect=PartitionMap._entries) as entries:
+            counts = {key: count for key, (count, _) in partitions.partitions().items()}
+            partitions.partitions()
+
+        self.assertEqual(entries.call_count, 1)
+        self.assertEqual(counts, {("gmail", None): 2, ("notion", None): 1, ("calendar", None): 1})
+
+    def test_search_holds_off_compaction(self):
+        """Test compaction waits until a partitioned search has mapped its hits to documents"""
+        retriever = self._retriever()
+        self.vectorstore.delete(["gmail:m1"])
+        compactor = []
+        search_partition = PartitionedRetriever._search
+
+        def search(instance, key, vector, params):
+            compactor.append(threading.Thread(target=self.vectorstore.compact))
+            compactor[0].start()
+            compactor[0].join(0.1)
+            self.assertTrue(compactor[0].is_alive())
+            return search_partition(instance, key, vector, params)
+
+        with patch.object(PartitionedRetriever, '_search', autospec=True, side_effect=search):
+            docs = retriever.invoke("notion page about the budget")
+        compactor[0].join()
+
+        self.assertEqual([doc.metadata["id"] for doc in docs], ["p1"])
+        self.assertEqual(self.vectorstore.generation, 1)
+
+    def test_time_partitions_follow_the_question_range(self):
+        """Test monthly partitions outside the question's range are skipped"""
+        partitions = PartitionMap(self.vectorstore, by_time="month")
+        march = (self.march - 86400, self.march + 86400)
+
+        with patch('memory.partitions.parse_time_range', return_value=march):
+            keys = partitions.plan("budget emails in march")
+
+        self.assertEqual(keys, [("gmail", "2024-03")])
+
+    def test_rejects_unknown_time_partitioning(self):
+        """Test PARTITION_BY_TIME must be month or year"""
+        with self.assertRaises(ValueError):
+            PartitionMap(self.vectorstore, by_time="week")
+
+
+if __name__ == '__main__':
+    unittest.main()
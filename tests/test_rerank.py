@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from memory.rerank import AdaptiveCrossEncoderReranker, adaptive_cutoff
+
+
+class KeywordCrossEncoder:
+    """Deterministic stand-in for a CrossEncoder: scores by keyword presence"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, batch_size=8):
+        self.batches.append(len(pairs))
+        return [10.0 if "offsite" in text else -10.0 for _, text in pairs]
+
+
+class TestRerank(unittest.TestCase):
+    """Test the cross-encoder reranking stage"""
+
+    def test_adaptive_cutoff_bounds(self):
+        """Test the kept count follows the score gap within min/max bounds"""
+        self.assertEqual(adaptive_cutoff([]), 0)
+        self.assertEqual(adaptive_cutoff([5.0, 4.5, -2.0]), 2)
+        self.assertEqual(adaptive_cutoff([5.0, 4.9, 4.8, 4.7, 4.6], max_keep=3), 3)
+        self.assertEqual(adaptive_cutoff([5.0, -9.0], min_keep=2), 2)
+
+    def test_rerank_orders_and_truncates(self):
+        """Test reranking promotes relevant candidates and drops the rest"""
+        docs = [Document(page_content=f"note {i}") for i in range(3)]
+        docs.append(Document(page_content="team offsite friday", metadata={"source": "calendar"}))
+        reranker = AdaptiveCrossEncoderReranker(model=KeywordCrossEncoder(), batch_size=4)
+
+        result = reranker.compress_documents(docs, "when is the offsite?")
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].page_content, "team offsite friday")
+        self.assertEqual(result[0].metadata["source"], "calendar")
+        self.assertEqual(result[0].metadata["rerank_score"], 10.0)
+
+    def test_rerank_stops_after_weak_batch(self):
+        """Test later batches are skipped once a batch falls far below the best"""
+        docs = [Document(page_content="offsite plan")]
+        docs += [Document(page_content=f"unrelated {i}") for i in range(11)]
+        model = KeywordCrossEncoder()
+        reranker = AdaptiveCrossEncoderReranker(model=model, batch_size=4)
+
+        reranker.compress_documents(docs, "offsite")
+
+        self.assertEqual(model.batches, [4, 4])
+
+    @patch('memory.rag_chain.Ollama')
+    def test_qa_chain_with_rerank_widens_candidates(self, mock_ollama):
+        """Test build_qa_chain fetches a larger pool when reranking"""
+        from langchain_community.llms.fake import FakeListLLM
+        from memory.rag_chain import build_qa_chain
+
+        mock_ollama.return_value = FakeListLLM(responses=["ok"])
+        vectorstore = MagicMock()
+
+        with patch('memory.rag_chain.ContextualCompressionRetriever') as mock_ccr, \
+             patch('memory.rag_chain.RetrievalQA'):
+            build_qa_chain(vectorstore, rerank=True)
+
+        vectorstore.as_retriever.assert_called_once_with(search_kwargs={"k": 20})
+        mock_ccr.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.records import make_record
+from memory.structured import StructuredIndex, build_structured_tools
+
+
+class TestStructuredIndex(unittest.TestCase):
+    """Test structured calendar, email and Notion lookups"""
+
+    def setUp(self):
+        """Build an index over a few records from each source"""
+        self.monday = datetime(2024, 5, 20, 9).timestamp()
+        self.tuesday = datetime(2024, 5, 21, 14).timestamp()
+        self.index = StructuredIndex([
+            make_record("calendar", "e2", "Event: Retro", timestamp=self.tuesday, title="Retro"),
+            make_record("calendar", "e1", "Event: Standup", timestamp=self.monday, title="Standup",
+                        end_timestamp=self.monday + 900),
+            make_record("gmail", "m1", "...", timestamp=100, sender="Alice <alice@example.com>", subject="Budget"),
+            make_record("gmail", "m2", "...", timestamp=200, sender="Bob <bob@example.com>", subject="Budget v2"),
+            make_record("notion", "p1", "Roadmap", timestamp=50, title="Roadmap 2024"),
+        ])
+
+    def test_events_sorted_and_ranged(self):
+        """Test events are kept in start order and sliced by range"""
+        self.assertEqual([e["title"] for e in self.index.next_events(now=0)], ["Standup", "Retro"])
+        self.assertEqual([e["title"] for e in self.index.events_between(self.tuesday, self.tuesday + 1)], ["Retro"])
+        self.assertEqual(self.index.next_events(now=self.tuesday + 1), [])
+
+    def test_emails_newest_first_by_sender_and_subject(self):
+        """Test email filters combine and return the newest match first"""
+        self.assertEqual([e["id"] for e in self.index.find_emails(subject="budget")], ["m2", "m1"])
+        self.assertEqual([e["id"] for e in self.index.find_emails(sender="alice")], ["m1"])
+        self.assertEqual(self.index.find_emails(sender="alice", subject="v2"), [])
+
+    def test_duplicate_records_are_ignored(self):
+        """Test re-adding the same record does not duplicate it"""
+        self.index.add_records([make_record("notion", "p1", "Roadmap", timestamp=50, title="Roadmap 2024")])
+        self.assertEqual(len(self.index.find_pages()), 1)
+
+    def test_new_version_replaces_the_entry(self):
+        """Test a record whose version changed replaces its stale entry"""
+        self.index.add_records([
+            make_record("calendar", "e1", "Event: Standup", timestamp=self.tuesday + 3600, title="Standup (moved)",
+                        version="2"),
+            make_record("gmail", "m1", "...", timestamp=300, sender="Alice <alice@example.com>",
+                        subject="Budget final", version="h2"),
+        ])
+
+        self.assertEqual([e["title"] for e in self.index.next_events(now=0)], ["Retro", "Standup (moved)"])
+        self.assertEqual([e["subject"] for e in self.index.find_emails(sender="alice")], ["Budget final"])
+        self.assertEqual([e["id"] for e in self.index.find_emails(subject="budget")], ["m1", "m2"])
+
+    def test_calendar_tool_uses_time_phrase(self):
+        """Test the calendar tool answers from the parsed time range"""
+        with patch('memory.structured.parse_time_range', return_value=(self.monday - 60, self.monday + 60)):
+            answer = self.index.lookup_calendar("what's on Monday?")
+
+        self.assertIn("Standup", answer)
+        self.assertIn("until", answer)
+        self.assertNotIn("Retro", answer)
+
+    def test_email_and_notion_tools_parse_fields(self):
+        """Test field syntax and free text both work as tool input"""
+        self.assertIn("Alice", self.index.lookup_email("from:alice subject:budget"))
+        self.assertIn("Bob", self.index.lookup_email("bob"))
+        self.assertEqual(self.index.lookup_email("from:carol"), "No matching emails found.")
+        self.assertIn("Roadmap 2024", self.index.lookup_notion("roadmap"))
+
+    def test_tools_are_named_for_the_agent(self):
+        """Test the agent receives one tool per structured source"""
+        tools = build_structured_tools(self.index)
+        self.assertEqual([t.name for t in tools], ["Calendar_Lookup", "Email_Lookup", "Notion_Lookup"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.records import make_record
+from memory.summaries import SummaryIndex, SummaryRouter, group_keys, is_broad_question
+
+
+def at(day, hour=10):
+    return datetime(2024, 5, day, hour).timestamp()
+
+
+def labelled(label, items):
+    return f"{label} [{len(items)} items]"
+
+
+class TestSummaryIndex(unittest.TestCase):
+    """Test incremental thread, day and week summaries"""
+
+    def setUp(self):
+        """Set up records across two days of one week"""
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.records = [
+            make_record("gmail", "1", "From: alice\nSubject: Budget", timestamp=at(13), thread_id="t1"),
+            make_record("gmail", "2", "From: bob\nSubject: Re: Budget", timestamp=at(14), thread_id="t1"),
+            make_record("calendar", "3", "Event: Planning", timestamp=at(14, 15)),
+        ]
+
+    def test_group_keys(self):
+        """Test a record maps to its thread, day and Monday-based week"""
+        keys = dict(group_keys(self.records[1]))
+        self.assertEqual(keys, {"thread": "gmail:t1", "day": "2024-05-14", "week": "2024-05-13"})
+        self.assertNotIn("thread", dict(group_keys(self.records[2])))
+
+    def test_builds_all_levels(self):
+        """Test threads and days summarize records and weeks summarize days"""
+        summarize = MagicMock(side_effect=labelled)
+        index = SummaryIndex(summarize=summarize)
+        index.add_records(self.records)
+        index.wait()
+
+        self.assertEqual(index.summary("thread", "gmail:t1"), "one email thread [2 items]")
+        self.assertEqual(index.summary("day", "2024-05-14"), "Tuesday 14 May 2024 [2 items]")
+        self.assertEqual(index.summary("week", "2024-05-13"), "the week of 13 May 2024 [2 items]")
+        week_items = summarize.call_args_list[-1][0][1]
+        self.assertIn("Monday 13 May 2024 [1 items]", week_items)
+
+    def test_only_changed_groups_are_resummarized(self):
+        """Test a new record re-summarizes its own day and week, not the others"""
+        summarize = MagicMock(side_effect=labelled)
+        index = SummaryIndex(summarize=summarize)
+        index.add_records(self.records)
+        index.wait()
+        summarize.reset_mock()
+
+        index.add_records(self.records + [make_record("notion", "4", "Retro notes", timestamp=at(13, 16))])
+        index.wait()
+
+        labels = [call[0][0] for call in summarize.call_args_list]
+        self.assertEqual(labels, ["Monday 13 May 2024", "the week of 13 May 2024"])
+
+    def test_new_version_resummarizes_its_groups(self):
+        """Test a thread whose version changed replaces its stale member and leaves its old day"""
+        summarize = MagicMock(side_effect=labelled)
+        index = SummaryIndex(summarize=summarize)
+        index.add_records([make_record("gmail", "t1", "Budget draft", timestamp=at(13), thread_id="t1", version="1")])
+        index.wait()
+        summarize.reset_mock()
+
+        index.add_records([make_record("gmail", "t1", "Budget approved", timestamp=at(15), thread_id="t1", version="2")])
+        index.wait()
+
+        thread_items = [call[0][1] for call in summarize.call_args_list if call[0][0] == "one email thread"]
+        self.assertEqual(thread_items, [["Budget approved"]])
+        self.assertIsNone(index.summary("day", "2024-05-13"))
+        self.assertEqual(index.summary("day", "2024-05-15"), "Wednesday 15 May 2024 [1 items]")
+        self.assertEqual(index.summary("week", "2024-05-13"), "the week of 13 May 2024 [1 items]")
+
+    def test_failed_summary_lists_items(self):
+        """Test an LLM failure falls back to listing first lines"""
+        index = SummaryIndex(summarize=MagicMock(side_effect=RuntimeError("ollama down")))
+        index.add_records(self.records[2:])
+        index.wait()
+
+        self.assertIn("Event: Planning", index.summary("day", "2024-05-14"))
+
+    def test_month_uses_week_summaries(self):
+        """Test long ranges are covered by week summaries and short ones by days"""
+        index = SummaryIndex(summarize=labelled)
+        index.add_records(self.records)
+        index.wait()
+
+        month = index.summaries_between(at(1, 0), at(31, 0))
+        day = index.summaries_between(at(14, 0), at(15, 0))
+
+        self.assertEqual(month, ["the week of 13 May 2024: the week of 13 May 2024 [2 items]"])
+        self.assertEqual(day, ["Tuesday 14 May 2024: Tuesday 14 May 2024 [2 items]"])
+
+    def test_saved_summaries_reload(self):
+        """Test summaries are persisted and not regenerated on open"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "summaries.json")
+            index = SummaryIndex(path, summarize=labelled)
+            index.add_records(self.records)
+            index.wait()
+
+            summarize = MagicMock()
+            reopened = SummaryIndex.open(path, summarize)
+            reopened.add_records(self.records)
+            reopened.wait()
+
+            summarize.assert_not_called()
+            self.assertEqual(len(reopened), len(index))
+
+
+class TestSummaryRouter(unittest.TestCase):
+    """Test routing broad questions to summaries"""
+
+    def setUp(self):
+        """Set up a router over a summary index with one week"""
+        self.index = SummaryIndex(summarize=labelled)
+        self.index.add_records([make_record("calendar", "1", "Event: Planning", timestamp=datetime.now().timestamp())])
+        self.index.wait()
+        self.qa_chain = MagicMock()
+        self.qa_chain.invoke.return_value = {"query": "q", "result": "from documents"}
+        self.llm = MagicMock()
+        self.llm.invoke.return_value = "A quiet week with one planning meeting."
+        self.router = SummaryRouter(self.qa_chain, self.index, llm=self.llm)
+
+    def test_broad_question_detection(self):
+        """Test period questions are broad and item questions are not"""
+        self.assertTrue(is_broad_question("What happened this month?"))
+        self.assertTrue(is_broad_question("Give me a recap of last week"))
+        self.assertFalse(is_broad_question("When is my dentist appointment?"))
+
+    def test_broad_question_uses_one_llm_call_over_summaries(self):
+        """Test a broad question skips retrieval and prompts once with summaries"""
+        result = self.router.invoke("What happened this week?")
+
+        self.qa_chain.invoke.assert_not_called()
+        self.llm.invoke.assert_called_once()
+        self.assertIn("[1 items]", self.llm.invoke.call_args[0][0])
+        self.assertEqual(result["result"], "A quiet week with one planning meeting.")
+
+    def test_specific_question_goes_to_qa_chain(self):
+        """Test specific questions keep using retrieval"""
+        result = self.router.invoke("Who sent the budget email?")
+
+        self.assertEqual(result["result"], "from documents")
+        self.llm.invoke.assert_not_called()
+
+    def test_broad_question_without_summaries_goes_to_qa_chain(self):
+        """Test a period with nothing summarized falls back to retrieval"""
+        self.router.invoke("What happened last month?")
+
+        self.qa_chain.invoke.assert_called_once()
+        self.llm.invoke.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
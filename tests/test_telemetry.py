@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+import urllib.request
+import uuid
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import MetricsCallbackHandler, MetricsRegistry, span, start_metrics_server, timed
+import telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+    """Test stage spans, counters and metric export"""
+
+    def setUp(self):
+        """Use a fresh registry for every test"""
+        self.registry = MetricsRegistry()
+        patcher = patch.object(telemetry, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_span_and_timed_record_observations(self):
+        """Test spans and the decorator both record durations"""
+        with span("embed"):
+            pass
+
+        @timed("loader", source="gmail")
+        def load():
+            return ["email"]
+
+        self.assertEqual(load(), ["email"])
+        stages = {(s["stage"], tuple(s["labels"].items())): s["count"] for s in self.registry.snapshot()["stages"]}
+        self.assertEqual(stages[("embed", ())], 1)
+        self.assertEqual(stages[("loader", (("source", "gmail"),))], 1)
+
+    def test_timed_generator_spans_its_iteration(self):
+        """Test a decorated generator is timed once, when it is exhausted"""
+        @timed("loader", source="gmail")
+        def load():
+            yield "email"
+
+        records = load()
+        self.assertEqual(self.registry.snapshot()["stages"], [])
+        self.assertEqual(list(records), ["email"])
+        self.assertEqual(self.registry.snapshot()["stages"][0]["count"], 1)
+
+    def test_span_records_on_exception(self):
+        """Test a failing stage is still timed"""
+        with self.assertRaises(ValueError):
+            with span("index_build"):
+                raise ValueError("boom")
+
+        self.assertEqual(self.registry.snapshot()["stages"][0]["count"], 1)
+
+    def test_prometheus_rendering(self):
+        """Test histogram and counter lines in the exposition format"""
+        self.registry.observe("retrieval", 0.02)
+        self.registry.increment("cache_hits", cache="llm")
+        self.registry.increment("cache_hits", cache="llm")
+
+        text = self.registry.render_prometheus()
+
+        self.assertIn('memory_stage_duration_seconds_bucket{stage="retrieval",le="0.025"} 1', text)
+        self.assertIn('memory_stage_duration_seconds_bucket{stage="retrieval",le="0.01"} 0', text)
+        self.assertIn('memory_stage_duration_seconds_count{stage="retrieval"} 1', text)
+        self.assertIn('memory_cache_hits_total{cache="llm"} 2', text)
+
+    def test_json_log(self):
+        """Test spans are appended to the JSON log when configured"""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.registry.log_path = os.path.join(tmp, "metrics.jsonl")
+            self.registry.observe("chunk", 0.5, source="notion")
+
+            with open(self.registry.log_path) as f:
+                entry = json.loads(f.readline())
+
+        self.assertEqual(entry["stage"], "chunk")
+        self.assertEqual(entry["source"], "notion")
+
+    def test_callback_records_ttft_and_total(self):
+        """Test the LLM callback records first-token and total latency once"""
+        handler = MetricsCallbackHandler("llama3.2")
+        run_id = uuid.uuid4()
+
+        handler.on_llm_start({}, ["prompt"], run_id=run_id)
+        handler.on_llm_new_token("Hel", run_id=run_id)
+        handler.on_llm_new_token("lo", run_id=run_id)
+        handler.on_llm_end(None, run_id=run_id)
+
+        counts = {s["stage"]: s["count"] for s in self.registry.snapshot()["stages"]}
+        self.assertEqual(counts, {"llm_total": 1, "llm_ttft": 1})
+
+    def test_metrics_server(self):
+        """Test the HTTP endpoint serves Prometheus text"""
+        self.registry.increment("docs_indexed", 3)
+        with patch('builtins.print'):
+            server = start_metrics_server(port=0)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode("utf-8")
+
+        self.assertIn("memory_docs_indexed_total 3", body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+
+from benchmarks.stubs import HashingEmbeddings
+from loaders.records import make_record
+from memory.entities import EntityIndex
+from memory.index_store import IndexStore
+from memory.rag_chain import build_retriever
+from memory.tiered import _MMAP_FLAG, ColdTier, TieredRetriever, TieredStore
+from memory.vectorstore import to_document
+
+
+class TestTieredStore(unittest.TestCase):
+    """Test aging documents from the in-memory index into the memory-mapped archive"""
+
+    def setUp(self):
+        """Create hot and cold roots with a mix of recent and old records"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.embeddings = HashingEmbeddings(size=16)
+        patcher = patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        now = time.time()
+        self.old = now - 90 * 86400
+        self.records = [
+            make_record("gmail", "new", "Budget review with finance", now - 86400),
+            make_record("gmail", "old1", "Budget planning offsite agenda", self.old),
+            make_record("notion", "old2", "Offsite packing list", self.old + 3600),
+        ]
+
+    def _open(self):
+        hot = IndexStore.open(os.path.join(self.tmp.name, "hot"), self.embeddings, fsync=False, snapshot_every=0)
+        cold = ColdTier.open(os.path.join(self.tmp.name, "cold"), self.embeddings)
+        return TieredStore(hot, cold, hot_days=30)
+
+    def test_age_out_moves_old_documents_to_cold(self):
+        """Test old documents leave the hot index and land in a new cold version"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+
+        self.assertEqual(tiers.age_out(), 2)
+
+        self.assertIn("gmail:new", tiers.hot)
+        self.assertNotIn("gmail:old1", tiers.hot)
+        self.assertIn("gmail:old1", tiers.cold)
+        self.assertIn("notion:old2", tiers.cold)
+        self.assertEqual(len(tiers), 3)
+        self.assertEqual(tiers.cold.segments, ["s000001"])
+        self.assertEqual(tiers.age_out(), 0)
+
+    def test_cold_tier_persists_across_open(self):
+        """Test a reopened cold tier maps the archived index and finds its documents"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+
+        cold = ColdTier.open(os.path.join(self.tmp.name, "cold"), self.embeddings)
+
+        self.assertEqual(len(cold), 2)
+        docs = cold.vectorstore.similarity_search("Offsite packing list", k=1)
+        self.assertEqual(docs[0].metadata["id"], "old2")
+
+    def test_append_adds_a_segment_without_rewriting_the_archive(self):
+        """Test a later age-out writes only its own rows and leaves mapped segments untouched"""
+        tiers = self._open()
+        tiers.add_records(self.records[1:])
+        tiers.age_out()
+        first = os.path.join(self.tmp.name, "cold", "s000001", "index.faiss")
+        written = os.stat(first).st_mtime_ns
+        tiers.add_records([make_record("gmail", "old3", "Budget planning retro", self.old + 7200)])
+
+        with patch('memory.tiered.faiss.read_index', wraps=faiss.read_index) as read_index:
+            self.assertEqual(tiers.age_out(), 1)
+
+        self.assertEqual(tiers.cold.segments, ["s000001", "s000002"])
+        self.assertEqual(os.stat(first).st_mtime_ns, written)
+        self.assertTrue(all(call.args[1:] == (_MMAP_FLAG,) for call in read_index.call_args_list))
+        ids = {doc.metadata["id"] for doc in tiers.cold.vectorstore.similarity_search("budget", k=3)}
+        self.assertEqual(ids, {"old1", "old2", "old3"})
+        cold = tiers.cold.retriever(k=1)
+        with patch('memory.time_index.parse_time_range', return_value=(self.old + 7000, self.old + 7300)):
+            self.assertEqual([doc.metadata["id"] for doc in cold.invoke("budget")], ["old3"])
+
+    def test_small_segments_merge(self):
+        """Test a segment merges into earlier ones no larger than it, within the row cap"""
+        tiers = self._open()
+        for i in range(3):
+            tiers.add_records([make_record("notion", f"p{i}", f"Archived page {i}", self.old + i)])
+            tiers.age_out()
+
+        self.assertEqual(len(tiers.cold.segments), 2)
+        self.assertEqual(len(tiers.cold), 3)
+        with patch('memory.tiered.COLD_SEGMENT_ROWS', 3):
+            tiers.add_records([make_record("notion", "p3", "Archived page 3", self.old + 3)])
+            tiers.age_out()
+
+        self.assertEqual(len(tiers.cold.segments), 2)
+        reopened = ColdTier.open(os.path.join(self.tmp.name, "cold"), self.embeddings)
+        self.assertEqual(len(reopened), 4)
+        self.assertEqual(reopened.vectorstore.similarity_search("Archived page 3", k=1)[0].metadata["id"], "p3")
+        self.assertEqual(sorted(n for n in os.listdir(os.path.join(self.tmp.name, "cold")) if n.startswith("s")),
+                         reopened.segments)
+
+    def test_unpublished_rows_are_dropped_on_open(self):
+        """Test docstore rows of an append that crashed before publishing do not count as archived"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+        tiers.cold.docstore.add({"gmail:lost": to_document(make_record("gmail", "lost", "Half archived"))})
+
+        cold = ColdTier.open(os.path.join(self.tmp.name, "cold"), self.embeddings)
+
+        self.assertNotIn("gmail:lost", cold)
+        self.assertIn("gmail:old1", cold)
+
+    def test_aging_repeats_until_closed(self):
+        """Test start_aging keeps aging out on its interval and stops on close"""
+        tiers = self._open()
+        calls = threading.Semaphore(0)
+
+        with patch.object(tiers, 'age_out', side_effect=lambda: calls.release()):
+            tiers.start_aging(interval=0.01)
+            self.assertTrue(calls.acquire(timeout=5))
+            self.assertTrue(calls.acquire(timeout=5))
+            tiers.close()
+
+        self.assertFalse(tiers._ager.is_alive())
+
+    def test_archived_old_records_are_not_reindexed(self):
+        """Test reloading an archived old record does not put it back in the hot tier"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+
+        tiers.add_records(self.records)
+
+        self.assertNotIn("gmail:old1", tiers.hot)
+        self.assertIn("gmail:new", tiers.hot)
+
+    def test_new_version_of_an_archived_document_replaces_it(self):
+        """Test a newer version lands in the hot tier, drops the archived copy and replaces it on aging"""
+        tiers = self._open()
+        tiers.add_records([make_record("gmail", "t1", "budget draft v1", self.old, version="1")])
+        tiers.age_out()
+
+        tiers.add_records([make_record("gmail", "t1", "budget draft v2", self.old + 60, version="2")])
+
+        self.assertNotIn("gmail:t1", tiers.cold)
+        self.assertEqual(len(tiers.cold), 0)
+        self.assertEqual(tiers.age_out(), 1)
+        self.assertNotIn("gmail:t1", tiers.hot)
+        self.assertEqual(tiers.cold.docstore.search("gmail:t1").page_content, "budget draft v2")
+        docs = tiers.cold.vectorstore.similarity_search("budget draft", k=2)
+        self.assertEqual([(doc.page_content, doc.metadata["version"]) for doc in docs], [("budget draft v2", "2")])
+
+    def test_age_out_replaces_a_stale_archived_copy(self):
+        """Test an archived copy left by a crash is replaced, not kept, when a newer version ages out"""
+        tiers = self._open()
+        tiers.add_records([make_record("gmail", "t1", "budget draft v1", self.old, version="1")])
+        tiers.age_out()
+        tiers.hot.add_records([make_record("gmail", "t1", "budget draft v2", self.old + 60, version="2")])
+
+        self.assertEqual(tiers.age_out(), 1)
+
+        self.assertNotIn("gmail:t1", tiers.hot)
+        self.assertEqual(tiers.cold.docstore.search("gmail:t1").metadata["version"], "2")
+        self.assertEqual(len(tiers.cold), 1)
+        reopened = ColdTier.open(os.path.join(self.tmp.name, "cold"), self.embeddings)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(len(reopened.segments), 1)
+        docs = reopened.vectorstore.similarity_search("budget draft", k=2)
+        self.assertEqual([doc.page_content for doc in docs], ["budget draft v2"])
+
+    def test_retriever_skips_cold_for_recent_questions(self):
+        """Test a question the hot tier answers in full never searches the archive"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+        retriever = TieredRetriever(
+            hot_retriever=tiers.hot.vectorstore.as_retriever(search_kwargs={"k": 1}), store=tiers, k=1
+        )
+
+        with patch.object(tiers.cold, 'retriever', side_effect=AssertionError("cold searched")):
+            docs = retriever.invoke("budget review")
+
+        self.assertEqual([doc.metadata["id"] for doc in docs], ["new"])
+
+    def test_retriever_fills_sparse_results_from_cold(self):
+        """Test the archive tops up results when the hot tier has too few documents"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+        retriever = TieredRetriever(
+            hot_retriever=tiers.hot.vectorstore.as_retriever(search_kwargs={"k": 3}), store=tiers, k=3
+        )
+
+        docs = retriever.invoke("budget")
+
+        self.assertEqual(docs[0].metadata["id"], "new")
+        self.assertEqual({doc.metadata["id"] for doc in docs}, {"new", "old1", "old2"})
+
+    def test_retriever_searches_cold_for_archived_people(self):
+        """Test a person whose documents are all archived is found in the cold tier"""
+        recent = time.time() - 3600
+        records = [
+            make_record("notion", f"n{i}", f"Note {i} about the launch plan", recent - i, people=["Tom <tom@acme.com>"])
+            for i in range(4)
+        ] + [make_record("gmail", "p1", "Launch budget numbers", self.old, sender="Priya Sharma <priya@acme.com>")]
+        tiers = self._open()
+        tiers.add_records(records)
+        tiers.age_out()
+        retriever = build_retriever(
+            tiers.hot.vectorstore, k=4, entity_index=EntityIndex(records), tiers=tiers, partitioned=False
+        )
+
+        docs = retriever.invoke("what did priya send me?")
+
+        self.assertEqual(docs[0].metadata["id"], "p1")
+        self.assertEqual(len(docs), 4)
+
+    def test_retriever_uses_cold_only_for_old_ranges(self):
+        """Test a date range entirely before the cutoff is answered from the archive"""
+        tiers = self._open()
+        tiers.add_records(self.records)
+        tiers.age_out()
+        retriever = TieredRetriever(
+            hot_retriever=tiers.hot.vectorstore.as_retriever(search_kwargs={"k": 1}), store=tiers, k=1
+        )
+
+        with patch('memory.tiered.parse_time_range', return_value=(self.old - 86400, self.old + 86400)):
+            docs = retriever.invoke("budget planning")
+
+        self.assertEqual([doc.metadata["id"] for doc in docs], ["old1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from loaders.records import make_record, parse_timestamp
+from memory.time_index import TimeAwareRetriever, TimeIndex, build_time_index, parse_time_range
+from memory.vectorstore import build_vectorstore, to_document
+
+
+class TestTimeParsing(unittest.TestCase):
+    """Test temporal expression parsing"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        # Wednesday
+        self.now = datetime(2024, 5, 15, 10, 30)
+
+    def _dates(self, query):
+        start, end = parse_time_range(query, now=self.now)
+        return datetime.fromtimestamp(start), datetime.fromtimestamp(end)
+
+    def test_no_temporal_expression(self):
+        """Test plain questions produce no range"""
+        self.assertIsNone(parse_time_range("who sent the quarterly report?", now=self.now))
+
+    def test_named_days(self):
+        """Test today, tomorrow and weekday names"""
+        self.assertEqual(self._dates("meetings today"), (datetime(2024, 5, 15), datetime(2024, 5, 16)))
+        self.assertEqual(self._dates("what's tomorrow?"), (datetime(2024, 5, 16), datetime(2024, 5, 17)))
+        self.assertEqual(self._dates("what meetings do I have Friday?"), (datetime(2024, 5, 17), datetime(2024, 5, 18)))
+        self.assertEqual(self._dates("notes from last Monday"), (datetime(2024, 5, 13), datetime(2024, 5, 14)))
+        self.assertEqual(self._dates("anything next wednesday"), (datetime(2024, 5, 22), datetime(2024, 5, 23)))
+
+    def test_named_periods(self):
+        """Test week and month periods"""
+        self.assertEqual(self._dates("emails from last week"), (datetime(2024, 5, 6), datetime(2024, 5, 13)))
+        self.assertEqual(self._dates("this month"), (datetime(2024, 5, 1), datetime(2024, 6, 1)))
+        self.assertEqual(self._dates("last month"), (datetime(2024, 4, 1), datetime(2024, 5, 1)))
+
+    def test_relative_spans(self):
+        """Test "past N days" style spans"""
+        start, end = self._dates("emails in the past 3 days")
+        self.assertEqual(start, datetime(2024, 5, 12, 10, 30))
+        self.assertEqual(end, self.now)
+
+
+class TestTimeIndex(unittest.TestCase):
+    """Test the sorted time index and time-aware retrieval"""
+
+    def test_range_lookup(self):
+        """Test range queries return positions in time order"""
+        index = TimeIndex([(30.0, 3), (10.0, 1), (None, 9)])
+        index.add(20.0, 2)
+
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.range(10.0, 30.0), [1, 2])
+        self.assertEqual(index.range(31.0, 40.0), [])
+
+    def test_parse_timestamp_formats(self):
+        """Test loader timestamps normalize to epoch seconds"""
+        self.assertEqual(parse_timestamp("1700000000000"), 1700000000.0)
+        self.assertEqual(parse_timestamp("2024-01-01T00:00:00Z"), 1704067200.0)
+        self.assertIsNone(parse_timestamp("not a date"))
+        self.assertIsNone(parse_timestamp(None))
+
+    def test_retriever_restricts_to_time_slice(self):
+        """Test temporal queries only return documents inside the range"""
+        friday = datetime(2024, 5, 17, 9).timestamp()
+        monday = datetime(2024, 5, 20, 9).timestamp()
+        records = [
+            make_record("calendar", "1", "Event: Standup", timestamp=friday),
+            make_record("calendar", "2", "Event: Standup", timestamp=monday),
+            make_record("notion", "3", "Standup notes"),
+        ]
+        vectorstore = FAISS.from_documents([to_document(r) for r in records], FakeEmbeddings(size=8))
+        retriever = TimeAwareRetriever(
+            base_retriever=vectorstore.as_retriever(),
+            vectorstore=vectorstore,
+            time_index=build_time_index(vectorstore),
+        )
+
+        with patch('memory.time_index.parse_time_range', return_value=(friday - 3600, friday + 3600)):
+            result = retriever.invoke("standup on Friday")
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["1"])
+
+    @patch('builtins.print')
+    def test_retriever_rebuilds_after_compaction(self, mock_print):
+        """Test the time slice follows rows that moved when the index was compacted"""
+        friday = datetime(2024, 5, 17, 9).timestamp()
+        records = [
+            make_record("calendar", "1", "Event: Standup", timestamp=friday - 86400),
+            make_record("calendar", "2", "Event: Retro", timestamp=friday),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            vectorstore = build_vectorstore(
+                records, FakeEmbeddings(size=8), docstore_path=os.path.join(tmp, "docstore.sqlite")
+            )
+            retriever = TimeAwareRetriever(
+                base_retriever=vectorstore.as_retriever(),
+                vectorstore=vectorstore,
+                time_index=build_time_index(vectorstore),
+            )
+            vectorstore.delete(["calendar:1"])
+            vectorstore.compact()
+
+            with patch('memory.time_index.parse_time_range', return_value=(friday - 3600, friday + 3600)):
+                result = retriever.invoke("what happened on Friday")
+            vectorstore.docstore.close()
+
+        self.assertEqual([doc.metadata["id"] for doc in result], ["2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
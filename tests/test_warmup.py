@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import json
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.warmup import start_warmup, warm_ollama
+
+
+class TestWarmup(unittest.TestCase):
+    """Test startup warm-up of the LLM and embedding model"""
+
+    @patch('memory.warmup.urllib.request.urlopen')
+    def test_warm_ollama_loads_model_with_keep_alive(self, mock_urlopen):
+        """Test warm-up sends an empty generate request carrying keep_alive"""
+        self.assertTrue(warm_ollama("llama3.2", base_url="http://ollama:11434", keep_alive="1h"))
+
+        request = mock_urlopen.call_args[0][0]
+        self.assertEqual(request.full_url, "http://ollama:11434/api/generate")
+        self.assertEqual(json.loads(request.data), {"model": "llama3.2", "prompt": "", "keep_alive": "1h"})
+
+    @patch('builtins.print')
+    @patch('memory.warmup.urllib.request.urlopen', side_effect=OSError("connection refused"))
+    def test_warm_ollama_tolerates_missing_server(self, mock_urlopen, mock_print):
+        """Test an unreachable Ollama only logs a warning"""
+        self.assertFalse(warm_ollama("llama3.2"))
+
+    @patch('memory.warmup.warm_ollama', return_value=True)
+    def test_start_warmup_loads_and_warms_embeddings(self, mock_warm_ollama):
+        """Test the embeddings future returns a model that has already embedded once"""
+        embeddings = MagicMock()
+
+        futures = start_warmup(lambda: embeddings)
+
+        self.assertIs(futures["embeddings"].result(timeout=5), embeddings)
+        self.assertTrue(futures["llm"].result(timeout=5))
+        embeddings.embed_query.assert_called_once()
+
+    @patch('memory.warmup.warm_ollama', return_value=True)
+    def test_start_warmup_without_embeddings(self, mock_warm_ollama):
+        """Test lexical mode only warms the LLM"""
+        futures = start_warmup(None)
+
+        self.assertNotIn("embeddings", futures)
+        self.assertTrue(futures["llm"].result(timeout=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
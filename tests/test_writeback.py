@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import threading
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.conversation import ConversationMemory
+from memory.lexical import LexicalIndex
+from memory.writeback import MemoryWriter, parse_remember
+from ui.chat_terminal import run_chat
+
+
+class RecordingStore:
+    """Store double that records each add_records batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def add_records(self, records):
+        self.batches.append(list(records))
+        return [record["metadata"]["id"] for record in records]
+
+
+class TestParseRemember(unittest.TestCase):
+    """Test recognition of explicit "remember that" statements"""
+
+    def test_remember_statements(self):
+        """Test the fact is extracted from common phrasings"""
+        self.assertEqual(parse_remember("Remember that my locker code is 4412"), "my locker code is 4412")
+        self.assertEqual(parse_remember("please remember: Bob prefers mornings"), "Bob prefers mornings")
+        self.assertEqual(parse_remember("remember, the dentist moved to Tuesday"), "the dentist moved to Tuesday")
+
+    def test_questions_are_not_facts(self):
+        """Test ordinary questions are left for the agent"""
+        self.assertIsNone(parse_remember("What do you remember about the offsite?"))
+        self.assertIsNone(parse_remember("remembering things is hard"))
+
+
+class TestMemoryWriter(unittest.TestCase):
+    """Test background write-back of chat records"""
+
+    def setUp(self):
+        patcher = patch('builtins.print')
+        self.mock_print = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_records_are_batched(self):
+        """Test queued records reach the store in batches, not one call each"""
+        store = RecordingStore()
+        release = threading.Event()
+        original = store.add_records
+        store.add_records = lambda records: (release.wait(5), original(records))[1]
+        writer = MemoryWriter(store, batch_size=4, flush_interval=0.05)
+
+        for i in range(8):
+            writer.record_turn(f"question {i}", f"answer {i}")
+        release.set()
+        writer.close()
+
+        sizes = [len(batch) for batch in store.batches]
+        self.assertEqual(sum(sizes), 8)
+        self.assertLess(len(sizes), 8)
+        self.assertLessEqual(max(sizes), 4)
+
+    def test_records_carry_chat_metadata(self):
+        """Test written records are timestamped chat records of the right kind"""
+        store = RecordingStore()
+        writer = MemoryWriter(store, flush_interval=0.05)
+        writer.remember("my locker code is 4412")
+        writer.record_turn("When is standup?", "At 9:30.")
+        writer.close()
+
+        records = [record for batch in store.batches for record in batch]
+        self.assertEqual([r["metadata"]["kind"] for r in records], ["note", "turn"])
+        self.assertTrue(all(r["metadata"]["source"] == "chat" for r in records))
+        self.assertTrue(all(r["metadata"]["timestamp"] for r in records))
+        self.assertIn("my locker code is 4412", records[0]["text"])
+
+    def test_remembered_fact_is_retrievable(self):
+        """Test a remembered fact can be found once the writer has flushed"""
+        index = LexicalIndex()
+        writer = MemoryWriter(index, flush_interval=0.05)
+        writer.remember("my locker code is 4412")
+        writer.flush()
+
+        results = index.search("what is my locker code", k=1)
+        writer.close()
+
+        self.assertEqual(len(results), 1)
+        self.assertIn("4412", results[0][0].page_content)
+
+    def test_store_failure_only_warns(self):
+        """Test an indexing error is logged and the writer keeps running"""
+        store = MagicMock()
+        store.add_records.side_effect = [RuntimeError("disk full"), ["ok"]]
+        writer = MemoryWriter(store, flush_interval=0.05)
+
+        writer.remember("first")
+        writer.flush()
+        writer.remember("second")
+        writer.close()
+
+        self.assertEqual(store.add_records.call_count, 2)
+        warnings = [str(call) for call in self.mock_print.call_args_list if "WARNING" in str(call)]
+        self.assertEqual(len(warnings), 1)
+
+
+class TestChatWriteBack(unittest.TestCase):
+    """Test the chat loop's use of the memory writer"""
+
+    @patch('builtins.input', side_effect=["Remember that the wifi password is hunter2", "exit"])
+    @patch('builtins.print')
+    def test_remember_skips_the_agent(self, mock_print, mock_input):
+        """Test a remember statement is stored without a model call"""
+        agent = MagicMock()
+        writer = MagicMock()
+
+        run_chat(agent, ConversationMemory(summarize=MagicMock()), writer)
+
+        agent.invoke.assert_not_called()
+        writer.remember.assert_called_once_with("the wifi password is hunter2")
+
+    @patch('builtins.input', side_effect=["When is standup?", "exit"])
+    @patch('builtins.print')
+    def test_answered_turns_are_recorded(self, mock_print, mock_input):
+        """Test each answered turn is queued for indexing"""
+        agent = MagicMock()
+        agent.invoke.return_value = {"output": "At 9:30."}
+        writer = MagicMock()
+
+        run_chat(agent, ConversationMemory(summarize=MagicMock()), writer)
+
+        writer.record_turn.assert_called_once_with("When is standup?", "At 9:30.")
+
+
+if __name__ == '__main__':
+    unittest.main()
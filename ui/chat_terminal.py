@@ -1,13 +1,30 @@
-def run_chat(agent):
+from memory.conversation import ConversationMemory, ollama_summarizer
+from memory.writeback import parse_remember
+from telemetry import span
+
+def run_chat(agent, memory=None, writer=None):
+    if memory is None:
+        memory = ConversationMemory(ollama_summarizer())
     print("📥 AI Personal Memory Assistant ready. Ask anything or type 'exit'.\n")
     while True:
         query = input("You: ")
         if query.lower() in ["exit", "quit"]:
             print("Goodbye!")
             break
+        fact = parse_remember(query) if writer is not None else None
+        if fact:
+            # Indexed in the background; searchable within a second or so
+            writer.remember(fact)
+            print("AI: Got it, I'll remember that.")
+            continue
         try:
-            response = agent.invoke({"input": query})
+            with span("turn"):
+                response = agent.invoke({"input": memory.format_input(query)})
             print("AI:", response["output"])
+            # Older turns are summarized in the background while the user types
+            memory.add_turn(query, response["output"])
+            if writer is not None:
+                writer.record_turn(query, response["output"])
         except Exception as e:
             print(f"Error: {e}")
             print("Please try again or type 'exit' to quit.")